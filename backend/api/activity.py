@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from api.async_mongodb import async_mongodb
+from api.metrics import registry
+from config import config
+from map import DATABASE, COLLECTION, ActivityEntity, ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_DATABASE = DATABASE.ACTIVITY.value
+ACTIVITY_COLLECTION = COLLECTION.ACTIVITY_BUCKET.value
+EVENT_TYPES = [event.value for event in ActivityEvent]
+
+def hour_of(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+def period_start(day: datetime, period: str) -> datetime:
+    """
+    日或週 (ISO 週，週一開始) 的起始時間
+    """
+    day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday()) if period == "week" else day
+
+class ActivityLog:
+    def __init__(self, db=async_mongodb):
+        """
+        只會新增的活動紀錄 (瀏覽、提交、評論、登入)，以時間分桶儲存
+
+        每個使用者與題目每小時一份文件:
+            {"entity_type", "entity_id", "hour", "n": 事件數, "counts": {事件類型: 數量},
+             "events": [[該小時內的秒數, 事件類型, 相關的題目或使用者 ID], ...], "expires_at"}
+        同一事件會同時記在使用者與題目的文件中。事件先放在記憶體的緩衝中，
+        每 ACTIVITY_FLUSH_INTERVAL 秒或累積 ACTIVITY_FLUSH_SIZE 筆時以一次 bulk 寫入，
+        同一份文件在一次寫入中只需一個 upsert。文件的事件數達到 ACTIVITY_BUCKET_EVENTS
+        後改寫入同一小時的新文件 (上限為近似值，可能多出一次寫入的事件數)。
+
+        彙總只讀取 counts，查詢 30 天的活動最多讀取 720 份文件，不需掃描每個事件
+
+        Args:
+            db: AsyncMongoDB 實例
+        """
+        self.db = db
+        self._buffer: List[Tuple[str, Optional[str], Optional[str], datetime]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def record(self, event: ActivityEvent, user_id: Optional[str] = None, question_id: Optional[str] = None,
+            at: Optional[datetime] = None
+        ) -> None:
+        """
+        記錄一個事件 (只放入緩衝，不等待寫入)，須在事件迴圈中呼叫
+
+        Args:
+            event: 事件類型
+            user_id: 使用者 ID，可選 (例如未登入的瀏覽)
+            question_id: 題目 ID，可選 (例如登入)
+            at: 發生時間，預設為現在
+        """
+        if not config.ACTIVITY_LOG or not (user_id or question_id):
+            return
+        self._buffer.append((event.value, user_id, question_id, at or datetime.utcnow()))
+        if len(self._buffer) >= config.ACTIVITY_FLUSH_SIZE and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    def _bucket_operations(self, events: List[Tuple[str, Optional[str], Optional[str], datetime]]) -> List[Dict[str, Any]]:
+        """
+        將事件依 (實體, 小時) 分組，每組一個 upsert
+        """
+        buckets: Dict[Tuple[str, str, datetime], Dict[str, Any]] = defaultdict(
+            lambda: {"counts": defaultdict(int), "events": []}
+        )
+        for event, user_id, question_id, at in events:
+            hour = hour_of(at)
+            second = int((at - hour).total_seconds())
+            for entity_type, entity_id, related_id in (
+                (ActivityEntity.USER.value, user_id, question_id),
+                (ActivityEntity.QUESTION.value, question_id, user_id),
+            ):
+                if not entity_id:
+                    continue
+                bucket = buckets[(entity_type, entity_id, hour)]
+                bucket["counts"][event] += 1
+                bucket["events"].append([second, event, related_id])
+
+        retention = timedelta(days=config.ACTIVITY_RETENTION_DAYS)
+        return [{
+            "op": "upsert",
+            "filter": {
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "hour": hour,
+                "n": {"$lt": config.ACTIVITY_BUCKET_EVENTS},
+            },
+            "update": {
+                "$inc": {"n": len(bucket["events"]), **{f"counts.{event}": count for event, count in bucket["counts"].items()}},
+                "$push": {"events": {"$each": bucket["events"]}},
+                "$setOnInsert": {"expires_at": hour + retention},
+            },
+        } for (entity_type, entity_id, hour), bucket in buckets.items()]
+
+    async def flush(self) -> int:
+        """
+        將緩衝中的事件寫入；失敗時放回緩衝，超過 ACTIVITY_MAX_BUFFER 的最舊事件會被丟棄
+
+        Returns:
+            寫入的事件數
+        """
+        async with self._flush_lock:
+            events, self._buffer = self._buffer, []
+            if not events:
+                return 0
+            try:
+                await self.db.bulk(ACTIVITY_DATABASE, ACTIVITY_COLLECTION, self._bucket_operations(events), ordered=False)
+            except Exception as e:
+                self._buffer = events + self._buffer
+                dropped = len(self._buffer) - config.ACTIVITY_MAX_BUFFER
+                if dropped > 0:
+                    del self._buffer[:dropped]
+                    registry.inc(
+                        "codingweb_activity_events_dropped_total",
+                        "Activity events dropped because the buffer was full while writes failed",
+                        {},
+                        dropped
+                    )
+                logger.error(f"Failed to write {len(events)} activity event(s): {str(e)}")
+                return 0
+            return len(events)
+
+    async def run_flush(self, interval: float) -> None:
+        """
+        定期寫入緩衝中的事件，由 app 的 lifespan 啟動；結束時由 lifespan 再呼叫一次 flush()
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def rollup(self, entity_type: ActivityEntity, entity_id: str, period: str = "day", span: int = 30) -> Dict[str, Any]:
+        """
+        每日或每週的活動彙總
+
+        Args:
+            entity_type: 使用者或題目
+            entity_id: 使用者或題目 ID
+            period: day 或 week
+            span: 包含目前這一期在內的期數
+
+        Returns:
+            {"period", "items": [{"start", 各事件類型的數量}, ...] (由舊到新，沒有活動的期數為 0),
+             "total": {各事件類型的數量}}
+        """
+        current = period_start(datetime.utcnow(), period)
+        step = timedelta(weeks=1) if period == "week" else timedelta(days=1)
+        since = current - step * (span - 1)
+
+        # 在伺服器上先彙總為每日的數量，每週的數量再由每日的數量相加
+        pipeline = (
+            self.db.pipeline(ACTIVITY_DATABASE, ACTIVITY_COLLECTION)
+            .match(entity_type=entity_type.value, entity_id=entity_id, hour__gte=since)
+            .group(
+                {"$dateToString": {"format": "%Y-%m-%d", "date": "$hour"}},
+                **{event: {"$sum": f"$counts.{event}"} for event in EVENT_TYPES}
+            )
+        )
+        days = await self.db.aggregate(ACTIVITY_DATABASE, ACTIVITY_COLLECTION, pipeline, convert_id=False)
+
+        items = {since + step * index: {"start": since + step * index, **{event: 0 for event in EVENT_TYPES}} for index in range(span)}
+        total = {event: 0 for event in EVENT_TYPES}
+        for day in days:
+            item = items.get(period_start(datetime.strptime(day["_id"], "%Y-%m-%d"), period))
+            if item is None:
+                continue
+            for event in EVENT_TYPES:
+                item[event] += day.get(event) or 0
+                total[event] += day.get(event) or 0
+        return {"period": period, "items": list(items.values()), "total": total}
+
+activity_log = ActivityLog()
@@ -0,0 +1,714 @@
+import asyncio
+import logging
+import threading
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from typing import List, Dict, Any, AsyncIterator, Optional, Union
+from api.mongodb import BaseMongoDB, InvalidCursorError
+from api.metrics import instrument
+from api.pipeline import Pipeline
+from api.pool import PoolMonitor, client_options, database_options, resolve_read_preference
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class AsyncMongoDB(BaseMongoDB):
+    def __init__(self):
+        """
+        Initialize the async MongoDB access layer; the client is created on first use
+        """
+        self.pool_monitor = PoolMonitor("async")
+        self._databases: Dict[str, AsyncIOMotorDatabase] = {}
+        self._connect_lock = threading.Lock()
+        self._cache = None
+
+    def _create_client(self) -> AsyncIOMotorClient:
+        self.pool_monitor.max_pool_size = config.MONGODB_MAX_POOL_SIZE
+        try:
+            return AsyncIOMotorClient(
+                config.MONGODB_URL,
+                **client_options(config.MONGODB_MAX_POOL_SIZE, self.pool_monitor)
+            )
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to MongoDB: {str(e)}")
+
+    async def warm_up(self, connections: int = None) -> int:
+        """
+        建立 client 並以同時進行的 ping 預先開啟連線，讓第一批請求不需等待連線建立
+        (TCP、TLS 與驗證)；之後由 pymongo 維持 minPoolSize
+
+        Args:
+            connections: 同時進行的 ping 數，預設為 MONGODB_MIN_POOL_SIZE (不超過連線池上限)
+
+        Returns:
+            目前開啟的連線數
+        """
+        connections = max(min(connections or config.MONGODB_MIN_POOL_SIZE, config.MONGODB_MAX_POOL_SIZE), 1)
+        await asyncio.gather(*[self.command("admin", {"ping": 1}) for _ in range(connections)])
+        return sum(pool["open"] for pool in self.pool_monitor.snapshot().values())
+
+    @property
+    def cache(self):
+        """
+        目前啟用的讀取快取，未啟用時為 None
+        """
+        return self._cache
+
+    def enable_cache(self, cache) -> None:
+        """
+        啟用讀取快取，只有傳入 cache=True 的讀取會使用快取，寫入則一律使該集合的快取失效
+
+        快取後端為非同步 (redis.asyncio)，因此只有非同步存取層支援讀取快取
+
+        Args:
+            cache: api.cache.QueryCache 實例，None 代表停用
+        """
+        self._cache = cache
+
+    async def _cache_key(self, use_cache: bool, database_name: str, collection_name: str, operation: str, **parts) -> Optional[str]:
+        """
+        建立快取鍵，未啟用快取或此次讀取不使用快取時回傳 None
+        """
+        if not (use_cache and self._cache):
+            return None
+        return await self._cache.make_key(database_name, collection_name, operation, **parts)
+
+    async def _invalidate_cache(self, database_name: str, collection_name: str) -> None:
+        if self._cache:
+            await self._cache.invalidate(database_name, collection_name)
+
+    def get_database(self, database_name: str) -> AsyncIOMotorDatabase:
+        """
+        Get a database with its configured read preference and write concern
+        """
+        database = self._databases.get(database_name)
+        if database is None:
+            database = self._databases[database_name] = self.client.get_database(
+                database_name, **database_options(database_name)
+            )
+        return database
+
+    def get_collection(self, database_name: str, collection_name: str, read_preference: Optional[str] = None) -> AsyncIOMotorCollection:
+        """
+        Get a collection, optionally overriding the read preference for one operation
+        """
+        collection = self.get_database(database_name)[collection_name]
+        if read_preference:
+            collection = collection.with_options(read_preference=resolve_read_preference(read_preference))
+        return collection
+
+    @instrument("find")
+    async def get_data(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any] = {}, projection: Dict[str, Any] = {},
+            sort_list: List[tuple] = None, limit: int = None, skip: int = None,
+            after: str = None, cache: bool = False, convert_id: bool = True, read_preference: Optional[str] = None, **conditions
+        ) -> List[Dict[str, Any]]:
+        """
+        查詢多個文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件 (MongoDB 原生格式)，可選
+            projection: 欄位投影，可選
+            sort_list: 排序條件列表 [("field", 1), ("field2", -1)]，可選
+            limit: 限制返回數量，可選
+            skip: 跳過數量，可選
+            after: keyset 分頁 token，只取排序在該 token 之後的文件，可選
+            cache: 是否使用讀取快取 (需先 enable_cache)
+            convert_id: 是否將 _id 轉為字串；直接交給 api.responses 編碼時可設為 False 省去逐筆轉換
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+                        例如: email__eq="test@example.com", age__gt=18
+
+        Returns:
+            文件列表
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            filter_dict = self._merge_conditions(filter_dict, conditions)
+            if after:
+                filter_dict, sort_list = self._apply_keyset(filter_dict, sort_list, after)
+
+            cache_key = await self._cache_key(
+                cache, database_name, collection_name, "find",
+                filter=filter_dict, projection=projection, sort=sort_list, skip=skip, limit=limit,
+                convert_id=convert_id
+            )
+            if cache_key:
+                hit, documents = await self._cache.get(cache_key)
+                if hit:
+                    return documents
+
+            cursor = collection.find(filter_dict, projection)
+
+            if sort_list:
+                cursor = cursor.sort(sort_list)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit:
+                cursor = cursor.limit(limit)
+
+            documents = await cursor.to_list(None)
+            if convert_id:
+                for doc in documents:
+                    if "_id" in doc:
+                        doc["_id"] = str(doc["_id"])
+
+            if cache_key:
+                await self._cache.set(cache_key, documents)
+            return documents
+        except InvalidCursorError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error finding documents in {database_name}.{collection_name}: {str(e)}")
+
+    async def get_page(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any] = {}, projection: Dict[str, Any] = {},
+            sort_list: List[tuple] = None, limit: int = 20, cursor: str = None,
+            cache: bool = False, convert_id: bool = True, read_preference: Optional[str] = None, **conditions
+        ) -> Dict[str, Any]:
+        """
+        以 keyset 分頁查詢一頁文件，每頁的查詢成本與頁數深度無關
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件 (MongoDB 原生格式)，可選
+            projection: 欄位投影，可選
+            sort_list: 排序條件列表，會自動以 _id 作為最後的排序鍵
+            limit: 每頁數量
+            cursor: 上一頁回傳的 next_cursor，None 代表第一頁
+            cache: 是否使用讀取快取 (需先 enable_cache)
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Returns:
+            {"items": 文件列表, "next_cursor": 下一頁 token，沒有下一頁時為 None}
+        """
+        sort_list = self._normalize_sort(sort_list)
+        projection = self._include_sort_fields(projection, sort_list)
+
+        documents = await self.get_data(
+            database_name, collection_name, filter_dict, projection,
+            sort_list, limit=limit + 1, after=cursor, cache=cache,
+            convert_id=convert_id, read_preference=read_preference, **conditions
+        )
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = self.encode_cursor(documents[-1], sort_list)
+
+        return {"items": documents, "next_cursor": next_cursor}
+
+    @instrument("find")
+    async def iter_data(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any] = {}, projection: Dict[str, Any] = {},
+            sort_list: List[tuple] = None, limit: int = None, skip: int = None,
+            after: str = None, batch_size: int = 100, convert_id: bool = True, read_preference: Optional[str] = None, **conditions
+        ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以串流方式逐筆查詢文件，不將整個結果集載入記憶體
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件 (MongoDB 原生格式)，可選
+            projection: 欄位投影，可選
+            sort_list: 排序條件列表 [("field", 1), ("field2", -1)]，可選
+            limit: 限制返回數量，可選
+            skip: 跳過數量，可選
+            after: keyset 分頁 token，只取排序在該 token 之後的文件，可選
+            batch_size: 每次向伺服器取回的文件數量
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Yields:
+            文件
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            filter_dict = self._merge_conditions(filter_dict, conditions)
+            if after:
+                filter_dict, sort_list = self._apply_keyset(filter_dict, sort_list, after)
+
+            cursor = collection.find(filter_dict, projection, batch_size=batch_size)
+
+            if sort_list:
+                cursor = cursor.sort(sort_list)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit:
+                cursor = cursor.limit(limit)
+        except InvalidCursorError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error finding documents in {database_name}.{collection_name}: {str(e)}")
+
+        try:
+            async for doc in cursor:
+                if convert_id and "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+                yield doc
+        finally:
+            await cursor.close()
+
+    @instrument("aggregate")
+    async def aggregate(self, database_name: str, collection_name: str, pipeline: Union[List[Dict[str, Any]], Pipeline], convert_id: bool = True, read_preference: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        聚合查詢
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            pipeline: 聚合管道 (階段列表或 Pipeline)
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+
+        Returns:
+            聚合結果列表
+
+        Raises:
+            UnindexedQueryError: Pipeline 開頭的 $match/$sort 無法使用已宣告的索引
+        """
+        if isinstance(pipeline, Pipeline):
+            pipeline = pipeline.build()
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            results = await collection.aggregate(pipeline).to_list(length=None)
+
+            if convert_id:
+                for doc in results:
+                    if "_id" in doc:
+                        doc["_id"] = str(doc["_id"])
+
+            return results
+        except Exception as e:
+            raise Exception(f"Error aggregating data in {database_name}.{collection_name}: {str(e)}")
+
+    async def aggregate_page(self, pipeline: Pipeline, convert_id: bool = True, read_preference: Optional[str] = None) -> Dict[str, Any]:
+        """
+        執行以 paginate 結尾的 Pipeline，一次查詢取得一頁結果與總數
+
+        Args:
+            pipeline: 以 paginate 結尾的 Pipeline
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好，None 代表使用資料庫的設定
+
+        Returns:
+            {"items": 文件列表, "next_cursor": 下一頁 token, "total": 符合條件的總數}
+        """
+        results = await self.aggregate(pipeline.database_name, pipeline.collection_name, pipeline, convert_id=False, read_preference=read_preference)
+        return pipeline.parse_page(results, convert_id)
+
+    @instrument("aggregate")
+    async def iter_aggregate(self, database_name: str, collection_name: str, pipeline: Union[List[Dict[str, Any]], Pipeline], batch_size: int = 100, read_preference: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以串流方式逐筆取得聚合結果
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            pipeline: 聚合管道 (階段列表或 Pipeline)
+            batch_size: 每次向伺服器取回的文件數量
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+
+        Yields:
+            聚合結果文件
+        """
+        if isinstance(pipeline, Pipeline):
+            pipeline = pipeline.build()
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            cursor = collection.aggregate(pipeline, batchSize=batch_size)
+        except Exception as e:
+            raise Exception(f"Error aggregating data in {database_name}.{collection_name}: {str(e)}")
+
+        try:
+            async for doc in cursor:
+                if "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+                yield doc
+        finally:
+            await cursor.close()
+
+    async def _affected_ids(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], multi: bool = True) -> List[Any]:
+        """
+        寫入前查出會受影響的文件 _id，集合沒有監聽器時不查詢
+        """
+        if not self._listening(database_name, collection_name):
+            return []
+        filter_dict = dict(filter_dict)
+        self._convert_id_to_objectid(filter_dict)
+        cursor = self.get_collection(database_name, collection_name).find(filter_dict, {"_id": 1})
+        if not multi:
+            cursor = cursor.limit(1)
+        return [doc["_id"] async for doc in cursor]
+
+    async def _publish(self, database_name: str, collection_name: str, ids: List[Any]) -> None:
+        """
+        寫入後重新讀取受影響的文件並通知監聽器；寫入已完成，失敗時只記錄錯誤
+        """
+        if not (ids and self._listening(database_name, collection_name)):
+            return
+        ids = self._object_ids(ids)
+        try:
+            cursor = self.get_collection(database_name, collection_name).find(
+                {"_id": {"$in": ids}}, self._publish_projection(database_name, collection_name)
+            )
+            documents = await cursor.to_list(None)
+        except Exception as e:
+            logger.error(f"Failed to notify write listeners for {database_name}.{collection_name}: {str(e)}")
+            return
+        for result in self._notify(database_name, collection_name, ids, documents):
+            try:
+                await result
+            except Exception as e:
+                logger.error(f"Write listener failed for {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("insert")
+    async def add_data(self, database_name: str, collection_name: str, document: Dict[str, Any]) -> str:
+        """
+        插入單一文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            document: 要插入的文件
+
+        Returns:
+            插入的文件 ID
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+            result = await collection.insert_one(document)
+            await self._invalidate_cache(database_name, collection_name)
+            await self._publish(database_name, collection_name, [result.inserted_id])
+            return str(result.inserted_id)
+        except DuplicateKeyError:
+            # 唯一索引衝突交由呼叫端處理 (例如重複註冊的 email)
+            raise
+        except Exception as e:
+            raise Exception(f"Error inserting document in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("insert_many")
+    async def add_datas(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]]) -> List[str]:
+        """
+        插入多個文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            documents: 要插入的文件列表
+
+        Returns:
+            插入的文件 ID 列表
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+            result = await collection.insert_many(documents)
+            await self._invalidate_cache(database_name, collection_name)
+            await self._publish(database_name, collection_name, result.inserted_ids)
+            return [str(id) for id in result.inserted_ids]
+        except Exception as e:
+            raise Exception(f"Error inserting documents in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("update")
+    async def update_data(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any], upsert: bool = False) -> bool:
+        """
+        更新單一文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
+            upsert: 如果不存在是否插入
+
+        Returns:
+            是否成功更新
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+
+            # Convert string _id to ObjectId if present in filter
+            self._convert_id_to_objectid(filter_dict)
+
+            ids = await self._affected_ids(database_name, collection_name, filter_dict, multi=False)
+            result = await collection.update_one(filter_dict, self._to_update_document(update_dict), upsert=upsert)
+            await self._invalidate_cache(database_name, collection_name)
+            await self._publish(database_name, collection_name, ids + [result.upserted_id] if result.upserted_id else ids)
+            return result.modified_count > 0 or result.upserted_id is not None
+        except Exception as e:
+            raise Exception(f"Error updating document in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("update_many")
+    async def update_datas(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any], array_filters: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        更新多個文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
+            array_filters: 陣列元素的篩選條件，對應更新內容中的 $[<identifier>]，可選
+
+        Returns:
+            更新的文件數量
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+
+            # Convert string _id to ObjectId if present in filter
+            self._convert_id_to_objectid(filter_dict)
+
+            ids = await self._affected_ids(database_name, collection_name, filter_dict)
+            result = await collection.update_many(filter_dict, self._to_update_document(update_dict), array_filters=array_filters)
+            await self._invalidate_cache(database_name, collection_name)
+            await self._publish(database_name, collection_name, ids)
+            return result.modified_count
+        except Exception as e:
+            raise Exception(f"Error updating documents in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("delete")
+    async def delete_data(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any]) -> bool:
+        """
+        刪除單一文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+
+        Returns:
+            是否成功刪除
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+
+            # Convert string _id to ObjectId if present in filter
+            self._convert_id_to_objectid(filter_dict)
+
+            ids = await self._affected_ids(database_name, collection_name, filter_dict, multi=False)
+            result = await collection.delete_one(filter_dict)
+            await self._invalidate_cache(database_name, collection_name)
+            await self._publish(database_name, collection_name, ids)
+            return result.deleted_count > 0
+        except Exception as e:
+            raise Exception(f"Error deleting document in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("delete_many")
+    async def delete_datas(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any]) -> int:
+        """
+        刪除多個文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+
+        Returns:
+            刪除的文件數量
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+
+            # Convert string _id to ObjectId if present in filter
+            self._convert_id_to_objectid(filter_dict)
+
+            ids = await self._affected_ids(database_name, collection_name, filter_dict)
+            result = await collection.delete_many(filter_dict)
+            await self._invalidate_cache(database_name, collection_name)
+            await self._publish(database_name, collection_name, ids)
+            return result.deleted_count
+        except Exception as e:
+            raise Exception(f"Error deleting documents in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("find_one_and_update")
+    async def find_one_and_update(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any], update_dict: Dict[str, Any],
+            sort_list: List[tuple] = None, projection: Dict[str, Any] = None,
+            upsert: bool = False, return_new: bool = True
+        ) -> Optional[Dict[str, Any]]:
+        """
+        原子性地查詢並更新單一文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
+            sort_list: 符合多筆時依此排序選擇第一筆，可選
+            projection: 欄位投影，可選
+            upsert: 如果不存在是否插入
+            return_new: 回傳更新後 (True) 或更新前 (False) 的文件
+
+        Returns:
+            文件，沒有符合的文件時為 None
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+
+            # Convert string _id to ObjectId if present in filter
+            self._convert_id_to_objectid(filter_dict)
+
+            doc = await collection.find_one_and_update(
+                filter_dict,
+                self._to_update_document(update_dict),
+                projection=projection,
+                sort=sort_list,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER if return_new else ReturnDocument.BEFORE
+            )
+            await self._invalidate_cache(database_name, collection_name)
+            if doc and "_id" in doc:
+                await self._publish(database_name, collection_name, [doc["_id"]])
+                doc["_id"] = str(doc["_id"])
+            return doc
+        except DuplicateKeyError:
+            # upsert 與唯一索引衝突交由呼叫端處理
+            raise
+        except Exception as e:
+            raise Exception(f"Error updating document in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("bulk")
+    async def bulk(self, database_name: str, collection_name: str, operations: List[Dict[str, Any]],
+            ordered: bool = True, batch_size: int = 1000
+        ) -> Dict[str, Any]:
+        """
+        批次執行混合的插入/更新/upsert/刪除操作，每個批次只需一次往返
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            operations: 操作列表，格式見 _build_bulk_request，例如
+                        [{"op": "insert", "document": {...}},
+                         {"op": "update", "filter": {"_id": "..."}, "update": {"$inc": {"score": 1}}},
+                         {"op": "delete", "filter": {"status": "resolved"}, "multi": True}]
+            ordered: 有序執行時遇到第一個錯誤即停止；無序執行時伺服器可平行處理並繼續執行其餘操作
+            batch_size: 每個批次的操作數量
+
+        Returns:
+            結果摘要，ID 與錯誤以原始 operations 的索引為鍵:
+            {"inserted_count", "matched_count", "modified_count", "deleted_count",
+             "upserted_count", "inserted_ids", "upserted_ids", "skipped_count", "errors"}
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+            requests = [self._build_bulk_request(operation) for operation in operations]
+            summary = self._new_bulk_summary()
+            ids, affected = self._bulk_affected(database_name, collection_name, operations)
+            if affected is not None:
+                ids += [doc["_id"] async for doc in collection.find(affected, {"_id": 1})]
+
+            try:
+                for offset in range(0, len(requests), batch_size):
+                    chunk = operations[offset:offset + batch_size]
+                    try:
+                        result = await collection.bulk_write(requests[offset:offset + batch_size], ordered=ordered)
+                        self._merge_bulk_result(summary, chunk, offset, result.bulk_api_result, ordered)
+                    except BulkWriteError as e:
+                        self._merge_bulk_result(summary, chunk, offset, e.details, ordered)
+                        if ordered:
+                            summary["skipped_count"] += max(len(requests) - offset - batch_size, 0)
+                            break
+            finally:
+                await self._invalidate_cache(database_name, collection_name)
+                await self._publish(database_name, collection_name, ids + list(summary["upserted_ids"].values()))
+
+            return summary
+        except Exception as e:
+            raise Exception(f"Error executing bulk write in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("count")
+    async def count_documents(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any] = {}, cache: bool = False, read_preference: Optional[str] = None, **conditions) -> int:
+        """
+        計算文件數量
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+            cache: 是否使用讀取快取 (需先 enable_cache)
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Returns:
+            文件數量
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            filter_dict = self._merge_conditions(filter_dict, conditions)
+
+            cache_key = await self._cache_key(cache, database_name, collection_name, "count", filter=filter_dict)
+            if cache_key:
+                hit, result = await self._cache.get(cache_key)
+                if hit:
+                    return result
+
+            result = await collection.count_documents(filter_dict)
+            if cache_key:
+                await self._cache.set(cache_key, result)
+            return result
+        except Exception as e:
+            raise Exception(f"Error counting documents in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("distinct")
+    async def distinct(self, database_name: str, collection_name: str, field: str, filter_dict: Dict[str, Any] = {}, cache: bool = False, read_preference: Optional[str] = None, **conditions) -> List[Any]:
+        """
+        獲取欄位的唯一值
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            field: 欄位名稱
+            filter_dict: 查詢條件
+            cache: 是否使用讀取快取 (需先 enable_cache)
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Returns:
+            唯一值列表
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            filter_dict = self._merge_conditions(filter_dict, conditions)
+
+            cache_key = await self._cache_key(cache, database_name, collection_name, "distinct", filter=filter_dict, field=field)
+            if cache_key:
+                hit, result = await self._cache.get(cache_key)
+                if hit:
+                    return result
+
+            result = await collection.distinct(field, filter_dict)
+            if cache_key:
+                await self._cache.set(cache_key, result)
+            return result
+        except Exception as e:
+            raise Exception(f"Error getting distinct values in {database_name}.{collection_name}: {str(e)}")
+
+    async def command(self, database_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        執行資料庫指令，例如 {"hello": 1}
+        """
+        return await self.get_database(database_name).command(command)
+
+    def watch(self, pipeline: List[Dict[str, Any]], **kwargs):
+        """
+        開啟整個叢集的 change stream (需要 replica set 或 sharded cluster)
+
+        Args:
+            pipeline: 篩選事件的聚合管道
+            **kwargs: 傳給 AsyncIOMotorClient.watch，例如 resume_after、full_document
+
+        Returns:
+            AsyncIOMotorChangeStream，以 async with 使用
+        """
+        return self.client.watch(pipeline, **kwargs)
+
+async_mongodb = AsyncMongoDB()
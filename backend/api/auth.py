@@ -0,0 +1,336 @@
+import asyncio
+import heapq
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from fastapi import Depends, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from typing import Any, Dict, List, Optional, Tuple
+import pyseto
+from pyseto import Key
+from api.async_mongodb import async_mongodb
+from api.ratelimit import TOKEN_CLAIMS_STATE
+from config import config
+from errorhandler import InvalidCredentials, PermissionDenied
+from map import DATABASE, COLLECTION, UserRole
+
+logger = logging.getLogger(__name__)
+
+# 同步撤銷紀錄時往前重疊的秒數
+REVOCATION_SYNC_OVERLAP = 5
+# 撤銷使用者所有 token 的紀錄與單一 token 的紀錄存在同一集合，jti 為此前綴加使用者 ID
+USER_REVOCATION_PREFIX = "user:"
+
+class RevocationList:
+    def __init__(self):
+        """
+        已撤銷 (登出) 的 token ID，依到期時間排序
+
+        token 到期後本來就無法通過驗證，因此撤銷紀錄只需保存到 token 到期為止；
+        以 heap 依到期時間排序，每次操作時移除已到期的紀錄，大小只與
+        「尚未到期且已登出」的 token 數量有關。
+
+        另外記錄每位使用者的 not_before (例如被封鎖時)：在此之前簽發的 token 全部無效，
+        紀錄保存到該時間點之前簽發的 token 都已到期為止
+        """
+        self._expiry: Dict[str, float] = {}
+        self._users: Dict[str, Tuple[float, float]] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            if jti not in self._expiry:
+                self._expiry[jti] = expires_at
+                heapq.heappush(self._heap, (expires_at, jti))
+            self._prune()
+
+    def revoke_user(self, user_id: str, not_before: float, expires_at: float) -> None:
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None or current[0] < not_before:
+                self._users[user_id] = (not_before, expires_at)
+                heapq.heappush(self._heap, (expires_at, USER_REVOCATION_PREFIX + user_id))
+            self._prune()
+
+    def revoked_user(self, user_id: str, issued_at: float) -> bool:
+        """
+        token 是否在使用者的 not_before 之前簽發
+        """
+        with self._lock:
+            self._prune()
+            entry = self._users.get(user_id)
+            return entry is not None and issued_at < entry[0]
+
+    def __contains__(self, jti: str) -> bool:
+        with self._lock:
+            self._prune()
+            return jti in self._expiry
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _prune(self) -> None:
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, key = heapq.heappop(self._heap)
+            if key.startswith(USER_REVOCATION_PREFIX):
+                user_id = key[len(USER_REVOCATION_PREFIX):]
+                # 較新的 not_before 會延長到期時間
+                if user_id in self._users and self._users[user_id][1] <= now:
+                    del self._users[user_id]
+            else:
+                self._expiry.pop(key, None)
+
+class TokenService:
+    def __init__(self, secret_key: Optional[str] = None, ttl: Optional[int] = None, cache_size: Optional[int] = None):
+        """
+        PASETO v4.local token 的簽發與驗證
+
+        驗證不需查詢資料庫：解密通過且未到期、未被撤銷即視為有效。
+        已驗證過的 token 保存在 LRU 中，重複的請求只需一次字典查詢。
+        撤銷紀錄寫入 MongoDB 並由各 process 定期同步到記憶體中的 RevocationList。
+        未指定的參數在第一次使用時才讀取 Config，匯入模組時不需要完整的環境
+
+        Args:
+            secret_key: 對稱金鑰，None 代表 PASETO_SECRET_KEY
+            ttl: token 有效秒數，None 代表 TOKEN_TTL
+            cache_size: 已驗證 token 的 LRU 大小，None 代表 TOKEN_CACHE_SIZE
+        """
+        self._secret_key = secret_key
+        self._key: Optional[Key] = None
+        self._ttl = ttl
+        self._cache_size = cache_size
+        self._verified: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.revoked = RevocationList()
+        self._synced_at: Optional[datetime] = None
+
+    @property
+    def key(self) -> Key:
+        if self._key is None:
+            self._key = Key.new(version=4, purpose="local", key=(self._secret_key or config.PASETO_SECRET_KEY).encode())
+        return self._key
+
+    @property
+    def ttl(self) -> int:
+        return config.TOKEN_TTL if self._ttl is None else self._ttl
+
+    @property
+    def cache_size(self) -> int:
+        return config.TOKEN_CACHE_SIZE if self._cache_size is None else self._cache_size
+
+    def issue(self, user_id: str, role: str) -> Tuple[str, datetime]:
+        """
+        簽發 token
+
+        Args:
+            user_id: 使用者 ID
+            role: 使用者角色
+
+        Returns:
+            (token, 到期時間)
+        """
+        payload = {"sub": user_id, "role": role, "jti": uuid.uuid4().hex, "iat": time.time()}
+        token = pyseto.encode(self.key, payload, serializer=json, exp=self.ttl).decode()
+        expires_at = datetime.fromtimestamp(int(time.time()) + self.ttl, tz=timezone.utc)
+        return token, expires_at
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        驗證 token
+
+        Returns:
+            {"user_id", "role", "jti", "exp", "iat"}，exp 與 iat 為 Unix 時間
+
+        Raises:
+            InvalidCredentials: token 無效、已到期、已撤銷或使用者的 token 已全部撤銷
+        """
+        claims, error = self._check(token)
+        if claims is None:
+            raise InvalidCredentials(error)
+        return claims
+
+    def try_verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        驗證 token，無效時回傳 None 而不拋出例外也不記錄錯誤 (供 middleware 辨識使用者)
+
+        Returns:
+            同 verify，token 無效時為 None
+        """
+        return self._check(token)[0]
+
+    def _check(self, token: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        with self._lock:
+            claims = self._verified.get(token)
+            if claims is not None:
+                self._verified.move_to_end(token)
+
+        if claims is None:
+            try:
+                payload = pyseto.decode(self.key, token, deserializer=json).payload
+                claims = {
+                    "user_id": payload["sub"],
+                    "role": payload["role"],
+                    "jti": payload["jti"],
+                    "exp": datetime.fromisoformat(payload["exp"]).timestamp(),
+                    # 沒有 iat 的 token 視為最早簽發
+                    "iat": payload.get("iat", 0),
+                }
+            except Exception:
+                return None, "Invalid or expired token"
+            with self._lock:
+                self._verified[token] = claims
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+
+        if claims["exp"] <= time.time():
+            self._forget(token)
+            return None, "Invalid or expired token"
+        if claims["jti"] in self.revoked or self.revoked.revoked_user(claims["user_id"], claims["iat"]):
+            self._forget(token)
+            return None, "Token has been revoked"
+        return claims, None
+
+    def _forget(self, token: str) -> None:
+        with self._lock:
+            self._verified.pop(token, None)
+
+    async def revoke(self, token: str, claims: Dict[str, Any]) -> None:
+        """
+        撤銷 token (登出)，並寫入資料庫讓其他 process 同步
+        """
+        self.revoked.add(claims["jti"], claims["exp"])
+        self._forget(token)
+        await async_mongodb.update_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.REVOKED_TOKEN.value,
+            {"jti": claims["jti"]},
+            {
+                "jti": claims["jti"],
+                "user_id": claims["user_id"],
+                "expires_at": datetime.utcfromtimestamp(claims["exp"]),
+                "revoked_at": datetime.utcnow(),
+            },
+            upsert=True
+        )
+
+    async def revoke_users(self, user_ids: List[str]) -> None:
+        """
+        撤銷使用者目前所有的 token (例如被封鎖時)，並寫入資料庫讓其他 process 同步
+        """
+        if not user_ids:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        for user_id in user_ids:
+            self.revoked.revoke_user(user_id, now, expires_at)
+        await async_mongodb.bulk(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.REVOKED_TOKEN.value,
+            [{
+                "op": "upsert",
+                "filter": {"jti": USER_REVOCATION_PREFIX + user_id},
+                "update": {"$set": {
+                    "user_id": user_id,
+                    "not_before": now,
+                    "expires_at": datetime.utcfromtimestamp(expires_at),
+                    "revoked_at": datetime.utcfromtimestamp(now),
+                }},
+            } for user_id in user_ids],
+            ordered=False
+        )
+
+    def _load(self, document: Dict[str, Any]) -> None:
+        expires_at = document["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+        if "not_before" in document:
+            self.revoked.revoke_user(document["user_id"], document["not_before"], expires_at)
+        else:
+            self.revoked.add(document["jti"], expires_at)
+
+    async def sync_revocations(self) -> int:
+        """
+        載入其他 process 新增的撤銷紀錄
+
+        Returns:
+            載入的筆數
+        """
+        now = datetime.utcnow()
+        conditions = {"expires_at__gt": now}
+        if self._synced_at is not None:
+            # 與上次同步的時間重疊一段，容許各節點時鐘的誤差
+            conditions["revoked_at__gte"] = self._synced_at - timedelta(seconds=REVOCATION_SYNC_OVERLAP)
+        self._synced_at = now
+        documents = await async_mongodb.get_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.REVOKED_TOKEN.value,
+            projection={"jti": 1, "user_id": 1, "not_before": 1, "expires_at": 1, "_id": 0},
+            **conditions
+        )
+        for document in documents:
+            self._load(document)
+        return len(documents)
+
+    def on_change(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        """
+        change feed 的訂閱者：其他 process 登出的 token 與封鎖的使用者立即生效 (到期刪除的紀錄不需處理)
+        """
+        for document in documents:
+            self._load(document)
+
+    async def resync(self, db) -> None:
+        self._synced_at = None
+        await self.sync_revocations()
+
+    async def run_revocation_sync(self, interval: float) -> None:
+        """
+        沒有 change feed 時定期同步撤銷紀錄，由 app 的 lifespan 啟動
+        """
+        while True:
+            try:
+                await self.sync_revocations()
+            except Exception as e:
+                logger.error(f"Failed to sync revoked tokens: {str(e)}")
+            await asyncio.sleep(interval)
+
+token_service = TokenService()
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> str:
+    if credentials is None:
+        raise InvalidCredentials("Not authenticated")
+    return credentials.credentials
+
+async def get_current_user(request: Request, token: str = Depends(get_token)) -> Dict[str, Any]:
+    """
+    FastAPI dependency：驗證 Authorization: Bearer <token> 並回傳 token 中的使用者資訊
+
+    定義為 async 以在 event loop 中直接執行，省去 thread pool 的切換。
+    RateLimitMiddleware 已驗證過同一個 token 時直接使用它存放在 request.state 的結果
+
+    Returns:
+        {"user_id", "role", "jti", "exp"}
+    """
+    verified = getattr(request.state, TOKEN_CLAIMS_STATE, None)
+    if verified is not None and verified[0] == token:
+        return verified[1]
+    return token_service.verify(token)
+
+def require_roles(*roles: UserRole):
+    """
+    建立只允許指定角色的 dependency
+
+    例如: Depends(require_roles(UserRole.ADMIN, UserRole.STAFF))
+    """
+    allowed = {role.value for role in roles}
+
+    async def dependency(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+        if user["role"] not in allowed:
+            raise PermissionDenied("Insufficient permissions")
+        return user
+    return dependency
@@ -0,0 +1,268 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from bson import json_util
+from typing import Any, Dict, List, Optional, Tuple
+from config import config
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis 為選用套件，只有 CACHE_BACKEND=redis 時需要
+    redis_asyncio = None
+
+class CacheBackend:
+    """
+    快取儲存後端介面
+
+    值一律以 pickle 後的 bytes 儲存，取出時會得到新的物件，
+    呼叫端修改查詢結果不會影響快取內容。方法皆為 coroutine，只能在事件迴圈中使用
+    """
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        一次讀取多個鍵，後端可覆寫為單次往返
+        """
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        """
+        一次寫入多個鍵，後端可覆寫為單次往返
+        """
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def generation(self, namespace: str) -> int:
+        """
+        取得命名空間 (database.collection) 目前的版本號，版本號是快取鍵的一部分
+        """
+        raise NotImplementedError
+
+    async def bump(self, namespace: str) -> None:
+        """
+        遞增命名空間的版本號，使該集合所有舊的快取鍵失效
+        """
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        """
+        單一 process 內的 LRU + TTL 快取
+
+        Args:
+            max_entries: 最多保存的項目數
+            max_bytes: 所有值的總大小上限
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    async def generation(self, namespace: str) -> int:
+        return self._generations[namespace]
+
+    async def bump(self, namespace: str) -> None:
+        with self._lock:
+            self._generations[namespace] += 1
+
+class RedisCacheBackend(CacheBackend):
+    def __init__(self, url: str, prefix: str = "codingweb:cache:"):
+        """
+        Redis 相容伺服器 (Redis、KeyDB、Valkey 等) 上的共享快取，多個 uvicorn worker 可共用
+
+        淘汰策略由伺服器的 maxmemory-policy (建議 allkeys-lru) 與每個鍵的 TTL 負責
+
+        Args:
+            url: 連線字串，例如 redis://localhost:6379/0
+            prefix: 鍵的前綴
+        """
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis_asyncio.Redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(self._prefix + key, value, px=int(ttl * 1000))
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self._client.mget([self._prefix + key for key in keys])
+
+    async def set_many(self, items: Dict[str, bytes], ttl: float) -> None:
+        if not items:
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._prefix + key, value, px=int(ttl * 1000))
+            await pipe.execute()
+
+    async def generation(self, namespace: str) -> int:
+        return int(await self._client.get(f"{self._prefix}gen:{namespace}") or 0)
+
+    async def bump(self, namespace: str) -> None:
+        await self._client.incr(f"{self._prefix}gen:{namespace}")
+
+class QueryCache:
+    def __init__(self, backend: CacheBackend, ttl: float = 30):
+        """
+        MongoDB 讀取結果的快取 (僅供 AsyncMongoDB 使用)
+
+        Args:
+            backend: 儲存後端
+            ttl: 快取存活秒數
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+
+    async def make_key(self, database_name: str, collection_name: str, operation: str, **parts) -> str:
+        """
+        建立快取鍵
+
+        鍵由集合、集合版本號、操作名稱以及正規化後的查詢參數
+        (filter、projection、sort、skip、limit 等) 的雜湊組成
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            operation: 操作名稱，例如 find、count、distinct
+            **parts: 查詢參數
+
+        Returns:
+            快取鍵
+        """
+        generation = await self.generation(database_name, collection_name)
+        return self.build_key(database_name, collection_name, generation, operation, **parts)
+
+    async def generation(self, database_name: str, collection_name: str) -> int:
+        """
+        集合目前的版本號；需要建立多個鍵時先取得一次再以 build_key 建立
+        """
+        return await self.backend.generation(f"{database_name}.{collection_name}")
+
+    def build_key(self, database_name: str, collection_name: str, generation: int, operation: str, **parts) -> str:
+        """
+        以已取得的版本號建立快取鍵，參數同 make_key
+        """
+        normalized = json_util.dumps(parts, sort_keys=True)
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f"{database_name}.{collection_name}:{generation}:{operation}:{digest}"
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        讀取快取
+
+        Returns:
+            (是否命中, 快取的值)
+        """
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Tuple[bool, Any]]:
+        """
+        一次讀取多個快取鍵 (Redis 後端為一次 MGET)
+
+        Returns:
+            與 keys 相同順序的 (是否命中, 快取的值)
+        """
+        results = []
+        for key, value in zip(keys, await self.backend.get_many(keys)):
+            namespace = key.split(":", 1)[0]
+            if value is None:
+                self._misses[namespace] += 1
+                results.append((False, None))
+            else:
+                self._hits[namespace] += 1
+                results.append((True, pickle.loads(value)))
+        return results
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        寫入快取
+
+        Args:
+            key: 快取鍵
+            value: 值
+            ttl: 存活秒數，None 代表使用預設的 ttl
+        """
+        await self.set_many({key: value}, ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        """
+        一次寫入多個快取鍵 (Redis 後端為一次 pipeline)
+
+        Args:
+            items: {快取鍵: 值}
+            ttl: 存活秒數，None 代表使用預設的 ttl
+        """
+        await self.backend.set_many(
+            {key: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) for key, value in items.items()},
+            self.ttl if ttl is None else ttl
+        )
+
+    async def invalidate(self, database_name: str, collection_name: str) -> None:
+        """
+        使集合所有的快取失效
+        """
+        await self.backend.bump(f"{database_name}.{collection_name}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        各集合的命中/未命中次數 (此 process)
+        """
+        namespaces = set(self._hits) | set(self._misses)
+        return {
+            namespace: {"hits": self._hits[namespace], "misses": self._misses[namespace]}
+            for namespace in sorted(namespaces)
+        }
+
+def build_cache() -> Optional[QueryCache]:
+    """
+    依照 Config 建立快取，CACHE_BACKEND 為 none 時回傳 None
+    """
+    if config.CACHE_BACKEND == "memory":
+        backend = MemoryCacheBackend(config.CACHE_MAX_ENTRIES, config.CACHE_MAX_BYTES)
+    elif config.CACHE_BACKEND == "redis":
+        backend = RedisCacheBackend(config.CACHE_URL)
+    else:
+        return None
+    return QueryCache(backend, ttl=config.CACHE_TTL)
@@ -0,0 +1,354 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo.errors import OperationFailure
+from api.async_mongodb import async_mongodb
+from api.metrics import registry
+from config import config
+from map import DATABASE, COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# 其他 process 的寫入需要通知的集合；輪詢模式下只有這些集合會寫入 change_log
+WATCHED_NAMESPACES: List[Tuple[DATABASE, COLLECTION]] = [
+    (DATABASE.ACCOUNT, COLLECTION.USER),
+    (DATABASE.ACCOUNT, COLLECTION.REVOKED_TOKEN),
+    (DATABASE.QUESTION, COLLECTION.QUESTION),
+    (DATABASE.ANSWER, COLLECTION.ANSWER),
+    (DATABASE.STATS, COLLECTION.USER_STATS),
+]
+# 輪詢時往前重疊的時間，容許各 process 的時鐘誤差與較晚提交的寫入
+POLL_OVERLAP = timedelta(seconds=5)
+# 續傳位置已失效 (InvalidResumeToken、ChangeStreamFatalError、ChangeStreamHistoryLost)
+RESUME_FAILED_CODES = {260, 280, 286}
+# 改寫整個集合的事件，訂閱者需要重新同步
+RESYNC_OPERATIONS = {"drop", "rename", "dropDatabase", "invalidate"}
+REFETCH_BATCH_SIZE = 500
+
+def supports_change_streams(hello: Dict[str, Any]) -> bool:
+    """
+    依 hello 指令的回應判斷是否支援 change stream (replica set 或 mongos)
+    """
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+def resolve_mode(hello: Dict[str, Any], mode: str = None) -> str:
+    """
+    將 CHANGE_FEED_MODE 的 auto 解析為 change_stream 或 polling
+    """
+    mode = mode or config.CHANGE_FEED_MODE
+    if mode == "auto":
+        return "change_stream" if supports_change_streams(hello) else "polling"
+    return mode
+
+class ChangeLogWriter:
+    # 只記錄文件 ID，寫入後的重新讀取不需要完整文件
+    ids_only = True
+
+    def __init__(self, db, ttl: int = None):
+        """
+        寫入監聽器：將監看集合的寫入記錄到 system.change_log，供沒有 change stream 的
+        standalone mongod 輪詢。每個會寫入監看集合的 process (API、worker、manage.py)
+        都需要安裝
+
+        Args:
+            db: MongoDB 或 AsyncMongoDB 實例
+            ttl: 紀錄保存秒數
+        """
+        self.db = db
+        self.ttl = timedelta(seconds=ttl if ttl is not None else config.CHANGE_LOG_TTL)
+
+    def install(self) -> None:
+        for database, collection in WATCHED_NAMESPACES:
+            self.db.add_listener(database.value, collection.value, self)
+
+    def on_change(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]):
+        now = datetime.utcnow()
+        entries = [
+            {"ns": f"{database_name}.{collection_name}", "doc_id": doc_id, "ts": now, "expires_at": now + self.ttl}
+            for doc_id in [doc["_id"] for doc in documents] + list(deleted_ids)
+        ]
+        if not entries:
+            return None
+        # 直接寫入集合，不經過存取層以免再次觸發監聽器；motor 回傳的 awaitable 由非同步存取層等待
+        result = self.db.get_collection(DATABASE.SYSTEM.value, COLLECTION.CHANGE_LOG.value).insert_many(entries, ordered=False)
+        return result if inspect.isawaitable(result) else None
+
+def install_change_log(db, mode: str = None) -> bool:
+    """
+    在同步存取層 (worker、manage.py 等) 依 CHANGE_FEED_MODE 安裝 ChangeLogWriter
+
+    Args:
+        db: MongoDB 實例
+        mode: 已解析的模式，None 時查詢伺服器判斷
+
+    Returns:
+        是否已安裝
+    """
+    mode = mode or config.CHANGE_FEED_MODE
+    if mode == "auto":
+        mode = resolve_mode(db.command("admin", {"hello": 1}), mode)
+    if mode != "polling":
+        return False
+    ChangeLogWriter(db).install()
+    return True
+
+class CacheInvalidator:
+    def __init__(self, db):
+        """
+        其他 process 寫入時使此 process 的讀取快取失效 (memory 後端各 process 各自保存版本號)
+
+        Args:
+            db: 啟用快取的存取層
+        """
+        self.db = db
+
+    async def on_change(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        if self.db.cache:
+            await self.db.cache.invalidate(database_name, collection_name)
+
+    async def resync(self, db) -> None:
+        if self.db.cache:
+            for database, collection in WATCHED_NAMESPACES:
+                await self.db.cache.invalidate(database.value, collection.value)
+
+class ChangeFeed:
+    def __init__(self, db, name: str = None):
+        """
+        跨 process 的變更通知
+
+        replica set 上以 change stream 監看整個叢集，standalone mongod 上輪詢
+        ChangeLogWriter 寫入的 system.change_log。事件以與寫入監聽器相同的
+        on_change(database_name, collection_name, documents, deleted_ids) 傳給訂閱者，
+        訂閱者必須可重複套用同一事件。
+
+        續傳位置 (resume token 或輪詢時間) 定期儲存於 system.feed_checkpoint，重新啟動時
+        從該位置補上期間的變更；位置失效時才呼叫訂閱者的 resync(db) 重新同步
+
+        Args:
+            db: AsyncMongoDB 實例
+            name: 儲存續傳位置的名稱，None 代表 CHANGE_FEED_NAME (第一次使用時讀取)
+        """
+        self.db = db
+        self._name = name
+        self.mode: Optional[str] = None
+        self._consumers: Dict[Tuple[str, str], List[Any]] = defaultdict(list)
+        self._position: Any = None
+        self._checkpointed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def name(self) -> str:
+        return self._name or config.CHANGE_FEED_NAME
+
+    def subscribe(self, database_name: str, collection_name: str, consumer) -> None:
+        """
+        訂閱集合的變更，需在 start 之前呼叫
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            consumer: 具有 on_change 方法 (可為 async) 的物件，可選擇實作 async resync(db)
+        """
+        self._consumers[(database_name, collection_name)].append(consumer)
+
+    async def start(self, mode: str = None) -> Optional[str]:
+        """
+        開始接收變更
+
+        Returns:
+            使用的模式 (change_stream / polling)，停用時為 None
+        """
+        mode = mode or config.CHANGE_FEED_MODE
+        if mode == "off" or not self._consumers:
+            return None
+        if mode == "auto":
+            mode = resolve_mode(await self.db.command("admin", {"hello": 1}), mode)
+        self.mode = mode
+        self._position = await self._load_checkpoint()
+        if mode == "polling":
+            ChangeLogWriter(self.db).install()
+            if self._position is not None and self._position < datetime.utcnow() - timedelta(seconds=config.CHANGE_LOG_TTL):
+                # 停止的時間超過紀錄保存期限
+                await self._resync()
+                self._position = None
+            runner = self._poll
+        else:
+            runner = self._watch
+        self._task = asyncio.create_task(self._run(runner))
+        logger.info(f"Change feed started ({mode}, {'resuming' if self._position is not None else 'from now'})")
+        return mode
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._save_checkpoint()
+
+    async def _run(self, runner) -> None:
+        while True:
+            try:
+                await runner()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change feed failed, retrying: {str(e)}")
+                await asyncio.sleep(config.CHANGE_FEED_POLL_INTERVAL)
+
+    async def _watch(self) -> None:
+        pipeline = [{"$match": {"$or": [
+            {"ns": {"db": database_name, "coll": collection_name}}
+            for database_name, collection_name in self._consumers
+        ]}}]
+        try:
+            async with self.db.watch(pipeline, full_document="updateLookup", resume_after=self._position) as stream:
+                while True:
+                    change = await stream.try_next()
+                    if change is not None:
+                        await self._dispatch_change(change)
+                    self._position = stream.resume_token
+                    await self._maybe_checkpoint()
+        except OperationFailure as e:
+            if self._position is None or e.code not in RESUME_FAILED_CODES:
+                raise
+            logger.warning(f"Change stream cannot resume, resyncing consumers: {str(e)}")
+            self._position = None
+            await self._resync()
+
+    async def _dispatch_change(self, change: Dict[str, Any]) -> None:
+        namespace = change.get("ns", {})
+        key = (namespace.get("db"), namespace.get("coll"))
+        operation = change["operationType"]
+        if operation in RESYNC_OPERATIONS:
+            await self._resync(key)
+            return
+        doc_id = str(change["documentKey"]["_id"])
+        document = change.get("fullDocument")
+        if operation in ("insert", "update", "replace") and document is not None:
+            document["_id"] = doc_id
+            await self._deliver(key, [document], [])
+        else:
+            # 刪除，或更新後查詢完整文件前已被刪除
+            await self._deliver(key, [], [doc_id])
+        if "clusterTime" in change:
+            self._record_lag(change["clusterTime"].time)
+
+    async def _poll(self) -> None:
+        namespaces = [f"{database_name}.{collection_name}" for database_name, collection_name in self._consumers]
+        since = self._position or datetime.utcnow()
+        seen: Dict[str, datetime] = {}
+        while True:
+            changed: Dict[str, List[str]] = defaultdict(list)
+            latest = since
+            async for entry in self.db.iter_data(
+                DATABASE.SYSTEM.value,
+                COLLECTION.CHANGE_LOG.value,
+                {"ns": {"$in": namespaces}},
+                projection={"ns": 1, "doc_id": 1, "ts": 1},
+                sort_list=[("ts", 1)],
+                batch_size=1000,
+                ts__gte=since - POLL_OVERLAP
+            ):
+                if entry["_id"] in seen:
+                    continue
+                seen[entry["_id"]] = entry["ts"]
+                if entry["doc_id"] not in changed[entry["ns"]]:
+                    changed[entry["ns"]].append(entry["doc_id"])
+                latest = max(latest, entry["ts"])
+
+            for namespace, doc_ids in changed.items():
+                database_name, collection_name = namespace.split(".", 1)
+                await self._refetch((database_name, collection_name), doc_ids)
+            if changed:
+                self._record_lag(latest.replace(tzinfo=timezone.utc).timestamp())
+
+            since = latest
+            seen = {entry_id: ts for entry_id, ts in seen.items() if ts >= since - POLL_OVERLAP}
+            self._position = since
+            await self._maybe_checkpoint()
+            await asyncio.sleep(config.CHANGE_FEED_POLL_INTERVAL)
+
+    async def _refetch(self, key: Tuple[str, str], doc_ids: List[str]) -> None:
+        """
+        change_log 只記錄 ID：重新讀取文件，讀不到的視為已刪除
+        """
+        for start in range(0, len(doc_ids), REFETCH_BATCH_SIZE):
+            chunk = doc_ids[start:start + REFETCH_BATCH_SIZE]
+            documents = await self.db.get_data(key[0], key[1], {"_id": {"$in": self.db._object_ids(chunk)}})
+            found = {document["_id"] for document in documents}
+            await self._deliver(key, documents, [doc_id for doc_id in chunk if doc_id not in found])
+
+    async def _deliver(self, key: Tuple[str, str], documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        registry.inc(
+            "codingweb_change_feed_events_total",
+            "Changes from other processes delivered to in-process consumers",
+            {"namespace": f"{key[0]}.{key[1]}"},
+            len(documents) + len(deleted_ids)
+        )
+        for consumer in self._consumers.get(key, []):
+            try:
+                result = consumer.on_change(key[0], key[1], documents, deleted_ids)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Change feed consumer failed for {key[0]}.{key[1]}: {str(e)}")
+
+    async def _resync(self, key: Tuple[str, str] = None) -> None:
+        consumers = self._consumers.get(key, []) if key else [c for group in self._consumers.values() for c in group]
+        done = set()
+        for consumer in consumers:
+            if id(consumer) in done or not hasattr(consumer, "resync"):
+                continue
+            done.add(id(consumer))
+            try:
+                await consumer.resync(self.db)
+            except Exception as e:
+                logger.error(f"Change feed consumer resync failed: {str(e)}")
+
+    def _record_lag(self, event_time: float) -> None:
+        registry.set(
+            "codingweb_change_feed_lag_seconds",
+            "Seconds between a write and its delivery through the change feed",
+            {"mode": self.mode},
+            max(time.time() - event_time, 0.0)
+        )
+
+    async def _load_checkpoint(self) -> Any:
+        checkpoints = await self.db.get_data(
+            DATABASE.SYSTEM.value,
+            COLLECTION.FEED_CHECKPOINT.value,
+            {"name": self.name},
+            limit=1
+        )
+        if not checkpoints or checkpoints[0].get("mode") != self.mode:
+            return None
+        return checkpoints[0].get("position")
+
+    async def _maybe_checkpoint(self) -> None:
+        if time.monotonic() - self._checkpointed_at >= config.CHANGE_FEED_CHECKPOINT_INTERVAL:
+            await self._save_checkpoint()
+
+    async def _save_checkpoint(self) -> None:
+        self._checkpointed_at = time.monotonic()
+        if self._position is None:
+            return
+        try:
+            await self.db.update_data(
+                DATABASE.SYSTEM.value,
+                COLLECTION.FEED_CHECKPOINT.value,
+                {"name": self.name},
+                {"name": self.name, "mode": self.mode, "position": self._position, "updated_at": datetime.utcnow()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to save change feed checkpoint: {str(e)}")
+
+change_feed = ChangeFeed(async_mongodb)
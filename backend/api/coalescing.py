@@ -0,0 +1,105 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+from urllib.parse import parse_qs
+from api.metrics import current_route, registry
+from config import config
+
+class SingleFlight:
+    def __init__(self):
+        """
+        合併同時進行的相同呼叫：同一個 key 在執行期間只會執行一次，其餘呼叫等待並共用結果 (或例外)
+        """
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Args:
+            key: 呼叫的鍵
+            factory: 沒有進行中的呼叫時用來建立 coroutine
+
+        Returns:
+            (結果, 是否共用了其他呼叫的結果)
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = asyncio.ensure_future(factory())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finish(key, done))
+        # 其中一個等待者被取消 (例如用戶端斷線) 時，共用的呼叫繼續執行
+        return await asyncio.shield(call), shared
+
+    def _finish(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            # 所有等待者都已取消時避免 "exception was never retrieved"
+            call.exception()
+
+class CoalescingMiddleware:
+    def __init__(self, app, routes: Iterable[str], skip_params: Iterable[str] = ("stream",),
+            on_shared: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+        ):
+        """
+        合併同時進行、路徑與查詢字串完全相同的 GET 請求：只有第一個請求執行路由
+        (與其中的資料庫查詢)，其餘請求收到相同的回應
+
+        只適用於回應與呼叫者無關的公開路由；需安裝在 MetricsMiddleware 之內以取得路由樣板
+
+        Args:
+            app: 下一層 ASGI app
+            routes: 要合併的路由樣板，例如 /question/{question_id}
+            skip_params: 帶有這些查詢參數的請求不合併 (例如串流匯出，不應整個保存在記憶體中)
+            on_shared: {路由樣板: callback(scope)}，共用到成功回應 (2xx) 的請求沒有執行路由，
+                       由此補上路由中每個請求的副作用 (例如記錄瀏覽次數)
+        """
+        self.app = app
+        self.routes = set(routes)
+        self.skip_params = set(skip_params)
+        self.on_shared = dict(on_shared)
+        self.flight = SingleFlight()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or current_route.get() not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        query_string = scope["query_string"]
+        if self.skip_params & parse_qs(query_string.decode("latin-1")).keys():
+            await self.app(scope, receive, send)
+            return
+
+        messages, shared = await self.flight.do(
+            (scope["path"], query_string),
+            lambda: self._capture(scope, receive)
+        )
+        registry.inc(
+            "codingweb_coalesced_requests_total",
+            "GET requests answered by an identical request already in flight",
+            {"route": current_route.get(), "result": "shared" if shared else "executed"}
+        )
+        callback = self.on_shared.get(current_route.get()) if shared else None
+        if callback is not None and messages and 200 <= messages[0].get("status", 0) < 300:
+            callback(scope)
+        for message in messages:
+            await send(message)
+
+    async def _capture(self, scope, receive) -> List[Dict[str, Any]]:
+        messages = []
+
+        async def collect(message):
+            messages.append(message)
+
+        await self.app(scope, receive, collect)
+        return messages
+
+def coalescing_middleware(app, routes: Iterable[str], **options):
+    """
+    COALESCE_REQUESTS 啟用時建立 CoalescingMiddleware，否則直接回傳下一層 app；
+    交給 app.add_middleware 時在建立 middleware stack 時才讀取設定
+    """
+    if not config.COALESCE_REQUESTS:
+        return app
+    return CoalescingMiddleware(app, routes, **options)
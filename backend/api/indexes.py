@@ -0,0 +1,204 @@
+import logging
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Tuple, Any
+from map import DATABASE, COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# 宣告式索引定義，鍵為 (DATABASE, COLLECTION)
+# 列表路由皆以 [("created_at", -1), ("_id", -1)] 做 keyset 分頁，
+# 因此複合索引以篩選欄位開頭、以 created_at/_id 結尾
+INDEXES: Dict[Tuple[DATABASE, COLLECTION], List[IndexModel]] = {
+    (DATABASE.ACCOUNT, COLLECTION.USER): [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    # 登出的 token 只需保存到 token 到期，由 TTL 索引自動刪除
+    (DATABASE.ACCOUNT, COLLECTION.REVOKED_TOKEN): [
+        IndexModel([("jti", ASCENDING)], name="jti_unique", unique=True),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    # 輪詢模式的變更紀錄: 依時間讀取，保存 CHANGE_LOG_TTL 後由 TTL 索引刪除
+    (DATABASE.SYSTEM, COLLECTION.CHANGE_LOG): [
+        IndexModel([("ts", ASCENDING)], name="ts"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    (DATABASE.SYSTEM, COLLECTION.FEED_CHECKPOINT): [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    ],
+    (DATABASE.QUESTION, COLLECTION.QUESTION): [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at"),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="author_created_at"),
+        IndexModel([("tags", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="tags_created_at"),
+        IndexModel(
+            [("title", TEXT), ("description", TEXT), ("tags", TEXT)],
+            name="text_search",
+            weights={"title": 10, "tags": 5, "description": 1},
+            default_language="none"
+        ),
+    ],
+    # 題目頁面的讀取模型 (api.question_detail): 以 _id 讀取，作者的顯示資訊變更時以作者查詢
+    (DATABASE.QUESTION, COLLECTION.QUESTION_DETAIL): [
+        IndexModel([("author_id", ASCENDING)], name="author_id"),
+        IndexModel([("answers.author_id", ASCENDING)], name="answers_author_id"),
+    ],
+    (DATABASE.ANSWER, COLLECTION.ANSWER): [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at"),
+        IndexModel([("question_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="question_created_at"),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="author_created_at"),
+        # 相同提交的評測結果重用
+        IndexModel([("submission_hash", ASCENDING), ("verdict", ASCENDING)], name="submission_hash", sparse=True),
+    ],
+    # 工作佇列: 領取時以 status/visible_at 篩選、依 priority desc, created_at asc 排序
+    (DATABASE.ANSWER, COLLECTION.JOB): [
+        IndexModel(
+            [("status", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING), ("visible_at", ASCENDING)],
+            name="status_priority_created_at"
+        ),
+    ],
+    # 排行榜以 updated_at 增量同步
+    (DATABASE.STATS, COLLECTION.USER_STATS): [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    # 活動紀錄: 每個使用者/題目每小時一份 (或數份) 文件，彙總時以實體與時間範圍查詢；
+    # 超過 ACTIVITY_RETENTION_DAYS 的文件由 TTL 索引刪除
+    (DATABASE.ACTIVITY, COLLECTION.ACTIVITY_BUCKET): [
+        IndexModel([("entity_type", ASCENDING), ("entity_id", ASCENDING), ("hour", ASCENDING)], name="entity_hour"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    (DATABASE.REVIEW, COLLECTION.REVIEW): [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at"),
+        IndexModel([("answer_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="answer_created_at"),
+        IndexModel([("reviewer_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="reviewer_created_at"),
+        # 每位使用者對同一份答案只能評論一次，重複的評論不會計入統計
+        IndexModel([("answer_id", ASCENDING), ("reviewer_id", ASCENDING)], name="answer_reviewer_unique", unique=True),
+    ],
+    (DATABASE.REPORT, COLLECTION.REPORT): [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="status_created_at"),
+        IndexModel([("target_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="target_created_at"),
+        # 審核佇列: 待處理的檢舉依權重由高到低、同權重先到先處理
+        IndexModel(
+            [("status", ASCENDING), ("weight", DESCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="status_weight_created_at"
+        ),
+        # 同一目標與原因的待處理檢舉只有一份，重複的檢舉以 upsert 累加
+        IndexModel(
+            [("target_type", ASCENDING), ("target_id", ASCENDING), ("reason", ASCENDING)],
+            name="pending_target_reason_unique",
+            unique=True,
+            partialFilterExpression={"status": "pending"}
+        ),
+    ],
+}
+
+# 影響查詢結果或資料保存的索引選項；未宣告的布林選項視為 False
+COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "collation")
+BOOLEAN_OPTIONS = {"unique", "sparse"}
+
+def _server_key(key: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """
+    宣告的索引鍵在 index_information() 中的形式：text 欄位合併為 _fts/_ftsx
+    """
+    server_key = []
+    for field, direction in key.items():
+        if direction == TEXT:
+            if ("_fts", TEXT) not in server_key:
+                server_key += [("_fts", TEXT), ("_ftsx", 1)]
+        else:
+            server_key.append((field, direction))
+    return server_key
+
+def index_differences(model: IndexModel, info: Dict[str, Any]) -> List[str]:
+    """
+    比對宣告的索引與伺服器上同名索引的鍵與選項
+
+    Args:
+        model: 宣告的索引
+        info: index_information() 中該索引的資訊
+
+    Returns:
+        不一致之處的說明，一致時為空列表
+    """
+    document = model.document
+    differences = []
+    declared_key = _server_key(document["key"])
+    existing_key = [(field, direction) for field, direction in info.get("key", [])]
+    if declared_key != existing_key:
+        differences.append(f"key {declared_key} != {existing_key}")
+    for option in COMPARED_OPTIONS:
+        declared = document.get(option, False if option in BOOLEAN_OPTIONS else None)
+        existing = info.get(option, False if option in BOOLEAN_OPTIONS else None)
+        if declared != existing:
+            differences.append(f"{option} {declared!r} != {existing!r}")
+    text_fields = [field for field, direction in document["key"].items() if direction == TEXT]
+    if text_fields:
+        declared_weights = {field: document.get("weights", {}).get(field, 1) for field in text_fields}
+        if declared_weights != dict(info.get("weights", {})):
+            differences.append(f"weights {declared_weights} != {dict(info.get('weights', {}))}")
+        # 未宣告時由伺服器決定預設語言
+        if "default_language" in document and document["default_language"] != info.get("default_language"):
+            differences.append(f"default_language {document['default_language']!r} != {info.get('default_language')!r}")
+    return differences
+
+async def sync_indexes(db, drop_undeclared: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    將 INDEXES 中宣告的索引與伺服器上的索引進行比對並建立缺少的索引
+
+    同名但鍵或選項 (unique、partialFilterExpression、expireAfterSeconds 等) 不同的索引
+    不會被修改，只列為衝突，需手動刪除後重新同步
+
+    Args:
+        db: AsyncMongoDB 實例
+        drop_undeclared: 是否刪除伺服器上存在但未宣告的索引
+
+    Returns:
+        每個 "database.collection" 的報告:
+        {"created": 新建立的索引, "undeclared": 未宣告的索引,
+         "unused": 自伺服器啟動以來未被使用的索引, "conflicts": 定義衝突的錯誤訊息}
+    """
+    report = {}
+    for (database, collection_enum), models in INDEXES.items():
+        collection = db.get_collection(database.value, collection_enum.value)
+        declared = {model.document["name"] for model in models}
+        entry = {"created": [], "undeclared": [], "unused": [], "conflicts": []}
+
+        information = await collection.index_information()
+        existing = set(information.keys())
+        missing = [model for model in models if model.document["name"] not in existing]
+        for model in models:
+            if model.document["name"] in existing:
+                differences = index_differences(model, information[model.document["name"]])
+                if differences:
+                    entry["conflicts"].append(f"{model.document['name']}: {'; '.join(differences)}")
+        for model in missing:
+            try:
+                await collection.create_indexes([model])
+                entry["created"].append(model.document["name"])
+            except OperationFailure as e:
+                entry["conflicts"].append(f"{model.document['name']}: {str(e)}")
+
+        for name in existing - declared - {"_id_"}:
+            if drop_undeclared:
+                await collection.drop_index(name)
+            entry["undeclared"].append(name)
+
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                    entry["unused"].append(stats["name"])
+        except OperationFailure:
+            # 部分部署 (例如權限受限的使用者) 無法執行 $indexStats
+            pass
+
+        key = f"{database.value}.{collection_enum.value}"
+        report[key] = entry
+        if entry["created"]:
+            logger.warning(f"Created missing indexes on {key}: {', '.join(entry['created'])}")
+        if entry["undeclared"]:
+            logger.warning(f"Undeclared indexes on {key}: {', '.join(entry['undeclared'])}")
+        if entry["conflicts"]:
+            logger.error(f"Conflicting index definitions on {key}: {'; '.join(entry['conflicts'])}")
+
+    return report
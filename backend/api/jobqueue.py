@@ -0,0 +1,189 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from api.async_mongodb import async_mongodb
+from api.mongodb import mongodb
+from config import config
+from map import DATABASE, COLLECTION, JobStatus
+
+JOB_DATABASE = DATABASE.ANSWER.value
+JOB_COLLECTION = COLLECTION.JOB.value
+
+# 數字越大越先被領取：使用者正在等待的新提交優先於批次重新評測
+PRIORITY_SUBMISSION = 10
+PRIORITY_REJUDGE = 0
+
+TERMINAL_STATUSES = (JobStatus.DONE.value, JobStatus.FAILED.value)
+# 回傳給前端的欄位，不包含 payload 與租約資訊
+PUBLIC_FIELDS = ("_id", "kind", "status", "attempts", "result", "error", "created_at", "updated_at")
+
+def new_job(kind: str, payload: Dict[str, Any], priority: int = PRIORITY_SUBMISSION,
+        max_attempts: int = None
+    ) -> Dict[str, Any]:
+    """
+    建立新工作的文件
+
+    Args:
+        kind: 工作種類，對應 worker 的處理函式，例如 judge
+        payload: 處理函式的參數
+        priority: 優先順序，數字越大越先執行
+        max_attempts: 最多嘗試次數，預設為 Config.JOB_MAX_ATTEMPTS
+
+    Returns:
+        工作文件
+    """
+    current_time = datetime.utcnow()
+    return {
+        "kind": kind,
+        "payload": payload,
+        "status": JobStatus.QUEUED.value,
+        "priority": priority,
+        "attempts": 0,
+        "max_attempts": max_attempts or config.JOB_MAX_ATTEMPTS,
+        "visible_at": current_time,
+        "lease_owner": None,
+        "result": None,
+        "error": None,
+        "created_at": current_time,
+        "updated_at": current_time,
+    }
+
+def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: job.get(field) for field in PUBLIC_FIELDS}
+
+async def enqueue(kind: str, payload: Dict[str, Any], priority: int = PRIORITY_SUBMISSION,
+        max_attempts: int = None
+    ) -> str:
+    """
+    將工作放入佇列
+
+    Returns:
+        工作 ID
+    """
+    return await async_mongodb.add_data(JOB_DATABASE, JOB_COLLECTION, new_job(kind, payload, priority, max_attempts))
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    查詢工作目前的狀態，不存在時回傳 None
+    """
+    jobs = await async_mongodb.get_data(
+        JOB_DATABASE,
+        JOB_COLLECTION,
+        {"_id": job_id},
+        projection={field: 1 for field in PUBLIC_FIELDS},
+        limit=1
+    )
+    return jobs[0] if jobs else None
+
+class JobQueue:
+    def __init__(self, db=mongodb, worker_id: str = None, visibility_timeout: float = None):
+        """
+        worker 端的佇列操作
+
+        工作以 find_one_and_update 原子性地領取：排隊中、或租約已過期 (執行中的 worker
+        當機或失聯) 的工作都可被領取，領取時將 visible_at 延後 visibility_timeout 秒作為租約。
+        完成、失敗與延長租約都以 lease_owner 為條件，租約已被其他 worker 取走時不會覆寫結果。
+
+        Args:
+            db: MongoDB 實例
+            worker_id: worker 識別碼，預設為 主機名稱:pid:隨機碼
+            visibility_timeout: 租約秒數，預設為 Config.JOB_VISIBILITY_TIMEOUT
+        """
+        self.db = db
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.visibility_timeout = visibility_timeout or config.JOB_VISIBILITY_TIMEOUT
+
+    def claim(self, kinds: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        領取優先順序最高、最早建立的可執行工作
+
+        嘗試次數已用完的過期工作會直接標記為失敗並繼續領取下一個
+
+        Args:
+            kinds: 此 worker 能處理的工作種類
+
+        Returns:
+            工作文件，沒有可執行的工作時為 None
+        """
+        while True:
+            now = datetime.utcnow()
+            job = self.db.find_one_and_update(
+                JOB_DATABASE,
+                JOB_COLLECTION,
+                {
+                    "status": {"$in": [JobStatus.QUEUED.value, JobStatus.RUNNING.value]},
+                    "visible_at": {"$lte": now},
+                    "kind": {"$in": kinds},
+                },
+                {
+                    "$set": {
+                        "status": JobStatus.RUNNING.value,
+                        "lease_owner": self.worker_id,
+                        "visible_at": now + timedelta(seconds=self.visibility_timeout),
+                        "updated_at": now,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort_list=[("priority", -1), ("created_at", 1)]
+            )
+            if job is None or job["attempts"] <= job["max_attempts"]:
+                return job
+            self._finish(job, JobStatus.FAILED, error=job.get("error") or "Lease expired too many times")
+
+    def extend(self, job: Dict[str, Any]) -> bool:
+        """
+        延長租約，長時間執行的工作應定期呼叫
+
+        Returns:
+            租約是否仍屬於此 worker
+        """
+        now = datetime.utcnow()
+        return self.db.update_data(
+            JOB_DATABASE,
+            JOB_COLLECTION,
+            {"_id": job["_id"], "lease_owner": self.worker_id, "status": JobStatus.RUNNING.value},
+            {"visible_at": now + timedelta(seconds=self.visibility_timeout), "updated_at": now}
+        )
+
+    def complete(self, job: Dict[str, Any], result: Any = None) -> bool:
+        """
+        標記工作完成
+        """
+        return self._finish(job, JobStatus.DONE, result=result)
+
+    def fail(self, job: Dict[str, Any], error: str) -> bool:
+        """
+        工作執行失敗：還有嘗試次數時以指數退避重新排隊，否則標記為失敗
+        """
+        if job["attempts"] >= job["max_attempts"]:
+            return self._finish(job, JobStatus.FAILED, error=error)
+        now = datetime.utcnow()
+        delay = config.JOB_RETRY_DELAY * 2 ** (job["attempts"] - 1)
+        return self.db.update_data(
+            JOB_DATABASE,
+            JOB_COLLECTION,
+            {"_id": job["_id"], "lease_owner": self.worker_id},
+            {
+                "status": JobStatus.QUEUED.value,
+                "lease_owner": None,
+                "visible_at": now + timedelta(seconds=delay),
+                "error": error,
+                "updated_at": now,
+            }
+        )
+
+    def _finish(self, job: Dict[str, Any], job_status: JobStatus, result: Any = None, error: str = None) -> bool:
+        return self.db.update_data(
+            JOB_DATABASE,
+            JOB_COLLECTION,
+            {"_id": job["_id"], "lease_owner": self.worker_id},
+            {
+                "status": job_status.value,
+                "lease_owner": None,
+                "result": result,
+                "error": error,
+                "updated_at": datetime.utcnow(),
+            }
+        )
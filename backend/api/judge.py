@@ -0,0 +1,350 @@
+import ctypes
+import logging
+import math
+import os
+import pwd
+import resource
+import shlex
+import select
+import selectors
+import signal
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional, Tuple
+from api.submission_cache import ArtifactCache, UNCOMPILABLE_ERRORS, compile_python
+from config import config
+from map import Verdict
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_LANGUAGES = ("python",)
+# 回傳結果中保留的輸出長度
+OUTPUT_PREVIEW = 1024
+# 標準輸出最多讀取預期輸出長度再加上此位元組數 (容許行尾空白等差異)，超過即終止子行程
+OUTPUT_LIMIT_MARGIN = 64 * 1024
+# 標準錯誤只保留最後這麼多位元組
+STDERR_LIMIT = 64 * 1024
+# unshare(2) 旗標: 新的 network namespace (只有未啟用的 loopback) 與 IPC namespace
+CLONE_NEWNET = 0x40000000
+CLONE_NEWIPC = 0x08000000
+_libc = ctypes.CDLL(None, use_errno=True)
+
+def normalize_output(output: str) -> str:
+    """
+    比對前正規化輸出：統一換行、去除每行結尾空白與結尾空行
+    """
+    lines = output.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip("\n")
+
+def sandbox_ids(user: str) -> Tuple[int, int]:
+    """
+    以使用者名稱或 uid 取得 (uid, gid)
+    """
+    if user.isdigit():
+        try:
+            entry = pwd.getpwuid(int(user))
+        except KeyError:
+            return int(user), int(user)
+    else:
+        entry = pwd.getpwnam(user)
+    return entry.pw_uid, entry.pw_gid
+
+def _limit_resources(cpu_seconds: int, memory_bytes: int, ids: Optional[Tuple[int, int]] = None):
+    """
+    產生在子行程 exec 前執行的函式：切換到 sandbox 使用者並設定 rlimit
+
+    切換使用者前先建立新的 network 與 IPC namespace，提交的程式無法連線到資料庫或其他服務；
+    不同 uid 也無法讀取 worker 的 /proc/<pid>/environ 與編譯結果快取
+    """
+    def apply():
+        if ids is not None:
+            if _libc.unshare(CLONE_NEWNET | CLONE_NEWIPC) != 0:
+                raise OSError(ctypes.get_errno(), "unshare(CLONE_NEWNET) failed")
+            os.setgroups([])
+            os.setgid(ids[1])
+            os.setuid(ids[0])
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, 1024 * 1024))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # 禁止提交的程式再建立子行程 (fork bomb)；須在切換使用者之後設定，
+        # 否則同一 uid 的其他評測子行程會使 execve 失敗
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    return apply
+
+def _kill_group(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _communicate(process: subprocess.Popen, data: bytes, deadline: float, stdout_limit: int) -> Tuple[bytes, bytes, Optional[str]]:
+    """
+    寫入標準輸入並讀取輸出，輸出或時間超過上限時終止整個行程群組
+
+    RLIMIT_FSIZE 不限制 pipe，不能像 capture_output 一樣把輸出全部留在 worker 的記憶體中
+
+    Returns:
+        (標準輸出, 標準錯誤的最後 STDERR_LIMIT 位元組, 終止原因: None、"timeout" 或 "output")
+    """
+    stdout, stderr = bytearray(), bytearray()
+    reason = None
+    with selectors.DefaultSelector() as selector:
+        selector.register(process.stdout, selectors.EVENT_READ)
+        selector.register(process.stderr, selectors.EVENT_READ)
+        if data:
+            selector.register(process.stdin, selectors.EVENT_WRITE)
+        else:
+            process.stdin.close()
+        offset = 0
+        while selector.get_map():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                reason = "timeout"
+                break
+            for key, _ in selector.select(remaining):
+                if key.fileobj is process.stdin:
+                    try:
+                        # 可寫入時至少能寫入 PIPE_BUF 位元組而不阻塞
+                        offset += os.write(key.fd, data[offset:offset + select.PIPE_BUF])
+                    except BrokenPipeError:
+                        offset = len(data)
+                    if offset >= len(data):
+                        selector.unregister(process.stdin)
+                        process.stdin.close()
+                    continue
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                if key.fileobj is process.stdout:
+                    stdout += chunk
+                    if len(stdout) > stdout_limit:
+                        reason = "output"
+                        break
+                else:
+                    stderr += chunk
+                    del stderr[:-STDERR_LIMIT]
+            if reason:
+                break
+    if not reason:
+        # 關閉輸出後仍可能繼續執行
+        try:
+            process.wait(max(deadline - time.perf_counter(), 0))
+        except subprocess.TimeoutExpired:
+            reason = "timeout"
+    if reason:
+        _kill_group(process)
+    process.wait()
+    for pipe in (process.stdin, process.stdout, process.stderr):
+        if not pipe.closed:
+            pipe.close()
+    return bytes(stdout), bytes(stderr), reason
+
+class Judge:
+    def __init__(self, workers: int = None, python: str = None, artifacts: ArtifactCache = None,
+            sandbox_user: str = None, sandbox_command: str = None, allow_unsandboxed: bool = None
+        ):
+        """
+        在獨立子行程中執行提交的程式並比對測資
+
+        每個測資是一個設有 CPU 時間、記憶體與輸出檔大小 rlimit 的子行程，
+        並另有牆鐘時間上限；標準輸出超過預期輸出長度加 OUTPUT_LIMIT_MARGIN 時終止子行程。同一次提交的測資在 thread pool 中平行執行
+        (thread 只負責等待子行程)，pool 大小預設為 CPU 核心數。
+        原始碼只編譯一次，各測資的子行程直接執行 .pyc。
+
+        子行程以 sandbox_user 執行並位於沒有網路的 namespace (需以 root 執行 worker)，
+        或交由 sandbox_command (例如 nsjail) 隔離；兩者皆未設定時拒絕評測，除非 allow_unsandboxed。
+        未指定的參數在第一次評測時讀取 Config (JUDGE_*)
+
+        Args:
+            workers: 同時執行的子行程數量
+            python: 執行提交程式的直譯器，None 代表 JUDGE_PYTHON
+            artifacts: 編譯結果快取，可選
+            sandbox_user: 執行提交程式的使用者 (名稱或 uid)，None 代表 JUDGE_SANDBOX_USER，空字串代表不切換
+            sandbox_command: 外部 sandbox 指令前綴，None 代表 JUDGE_SANDBOX_COMMAND
+            allow_unsandboxed: 沒有任何隔離時是否仍評測，None 代表 JUDGE_ALLOW_UNSANDBOXED
+        """
+        self._workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="judge")
+        self._python = python
+        self._artifacts = artifacts
+        self._sandbox_user = sandbox_user
+        self._sandbox_command = sandbox_command
+        self._allow_unsandboxed = allow_unsandboxed
+        self._sandbox: Optional[Tuple[List[str], Optional[Tuple[int, int]]]] = None
+
+    def _resolve_sandbox(self) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """
+        (子行程的指令前綴, 切換的 (uid, gid))；沒有任何隔離且不允許時拋出 RuntimeError
+        """
+        if self._sandbox is None:
+            command = config.JUDGE_SANDBOX_COMMAND if self._sandbox_command is None else self._sandbox_command
+            user = config.JUDGE_SANDBOX_USER if self._sandbox_user is None else self._sandbox_user
+            allow = config.JUDGE_ALLOW_UNSANDBOXED if self._allow_unsandboxed is None else self._allow_unsandboxed
+            prefix = shlex.split(command)
+            # 外部 sandbox 自行處理使用者與 namespace
+            ids = sandbox_ids(user) if user and not prefix else None
+            if not prefix and ids is None:
+                if not allow:
+                    raise RuntimeError(
+                        "Refusing to judge without a sandbox: run the worker as root with JUDGE_SANDBOX_USER, "
+                        "set JUDGE_SANDBOX_COMMAND, or set JUDGE_ALLOW_UNSANDBOXED=true for development"
+                    )
+                logger.warning("Judging without a sandbox: submissions run as the worker user")
+            self._sandbox = (prefix, ids)
+        return self._sandbox
+
+    def run_case(self, source_path: str, case: Dict[str, Any], time_limit: float, memory_limit: int) -> Dict[str, Any]:
+        """
+        執行單一測資
+
+        Args:
+            source_path: 提交程式的路徑
+            case: {"input": 標準輸入, "output": 預期輸出, "sample": 是否為公開的範例測資}
+            time_limit: CPU 時間上限 (秒)
+            memory_limit: 記憶體上限 (MB)
+
+        Returns:
+            {"verdict", "time", "output", "error"}，非範例測資的 output 與 error 為空字串
+        """
+        cpu_seconds = max(1, math.ceil(time_limit))
+        wall_limit = time_limit * 3 + 1
+        expected = case.get("output", "")
+        prefix, ids = self._resolve_sandbox()
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            prefix + [self._python or config.JUDGE_PYTHON, "-I", "-B", source_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=os.path.dirname(source_path),
+            env={"PATH": "/usr/bin:/bin", "PYTHONIOENCODING": "utf-8"},
+            start_new_session=True,
+            preexec_fn=_limit_resources(cpu_seconds, memory_limit * 1024 * 1024, ids)
+        )
+        stdout, stderr, reason = _communicate(
+            process,
+            case.get("input", "").encode(),
+            start + wall_limit,
+            len(expected.encode()) + OUTPUT_LIMIT_MARGIN
+        )
+        elapsed = time.perf_counter() - start
+        if reason == "timeout":
+            return {"verdict": Verdict.TIME_LIMIT_EXCEEDED.value, "time": wall_limit, "output": "", "error": "Wall time limit exceeded"}
+        stdout = stdout.decode("utf-8", errors="replace")
+        stderr = stderr.decode("utf-8", errors="replace")
+
+        result = {"time": round(elapsed, 4), "output": stdout[:OUTPUT_PREVIEW], "error": stderr[-OUTPUT_PREVIEW:]}
+        if reason == "output":
+            result["verdict"] = Verdict.OUTPUT_LIMIT_EXCEEDED.value
+            result["error"] = "Output limit exceeded"
+        elif process.returncode in (-signal.SIGXCPU, -signal.SIGKILL) or elapsed > wall_limit:
+            result["verdict"] = Verdict.TIME_LIMIT_EXCEEDED.value
+        elif process.returncode != 0:
+            memory_error = "MemoryError" in stderr
+            result["verdict"] = (Verdict.MEMORY_LIMIT_EXCEEDED if memory_error else Verdict.RUNTIME_ERROR).value
+        elif normalize_output(stdout) != normalize_output(expected):
+            result["verdict"] = Verdict.WRONG_ANSWER.value
+        else:
+            result["verdict"] = Verdict.ACCEPTED.value
+        if not case.get("sample"):
+            # 隱藏測資不回傳程式的輸出，提交者無法藉由輸出取得測資內容
+            result["output"] = ""
+            if reason != "output":
+                result["error"] = ""
+        return result
+
+    def judge(self, code: str, test_cases: List[Dict[str, Any]], language: str = "python",
+            time_limit: float = 2.0, memory_limit: int = 256, short_circuit: bool = True
+        ) -> Dict[str, Any]:
+        """
+        評測一次提交
+
+        Args:
+            code: 原始碼
+            test_cases: 測資列表 [{"input": ..., "output": ...}]
+            language: 程式語言
+            time_limit: 每個測資的 CPU 時間上限 (秒)
+            memory_limit: 每個測資的記憶體上限 (MB)
+            short_circuit: 第一個測資失敗時是否取消尚未開始的測資
+
+        Returns:
+            {"verdict": 整體結果, "passed": 通過數, "total": 測資數,
+             "time": 最長執行時間, "results": 各測資結果 (未執行者為 None)}
+        """
+        if language not in SUPPORTED_LANGUAGES:
+            return self._summary(Verdict.COMPILE_ERROR, [], len(test_cases), f"Unsupported language: {language}")
+        key = ArtifactCache.key(code, language)
+        bytecode = self._artifacts.get(key) if self._artifacts else None
+        if bytecode is None:
+            try:
+                bytecode = compile_python(code)
+            except UNCOMPILABLE_ERRORS as e:
+                return self._summary(Verdict.COMPILE_ERROR, [None] * len(test_cases), len(test_cases), str(e) or type(e).__name__)
+            if self._artifacts:
+                self._artifacts.put(key, bytecode)
+
+        with tempfile.TemporaryDirectory(prefix="judge-") as workdir:
+            bytecode_path = os.path.join(workdir, "solution.pyc")
+            with open(bytecode_path, "wb") as f:
+                f.write(bytecode)
+            # sandbox 使用者只能讀取 (不能修改) 這次提交的 .pyc
+            os.chmod(bytecode_path, 0o444)
+            os.chmod(workdir, 0o711)
+            return self.judge_file(bytecode_path, test_cases, time_limit, memory_limit, short_circuit)
+
+    def judge_file(self, source_path: str, test_cases: List[Dict[str, Any]],
+            time_limit: float = 2.0, memory_limit: int = 256, short_circuit: bool = True
+        ) -> Dict[str, Any]:
+        """
+        以已寫入磁碟的程式 (原始碼或 .pyc) 評測所有測資，參數同 judge
+        """
+        results: List[Any] = [None] * len(test_cases)
+        futures = {
+            self._executor.submit(self.run_case, source_path, case, time_limit, memory_limit): index
+            for index, case in enumerate(test_cases)
+        }
+        pending = set(futures)
+        failed = False
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[futures[future]] = result
+                failed = failed or result["verdict"] != Verdict.ACCEPTED.value
+            if failed and short_circuit:
+                for future in pending:
+                    future.cancel()
+                # 已開始的測資仍需等待結束，暫存目錄才能安全刪除
+                for future in wait(pending).done:
+                    if not future.cancelled():
+                        results[futures[future]] = future.result()
+                break
+
+        first_failure = next(
+            (result for result in results if result and result["verdict"] != Verdict.ACCEPTED.value),
+            None
+        )
+        verdict = Verdict(first_failure["verdict"]) if first_failure else Verdict.ACCEPTED
+        return self._summary(verdict, results, len(test_cases))
+
+    def _summary(self, verdict: Verdict, results: List[Any], total: int, error: str = None) -> Dict[str, Any]:
+        finished = [result for result in results if result]
+        summary = {
+            "verdict": verdict.value,
+            "passed": sum(1 for result in finished if result["verdict"] == Verdict.ACCEPTED.value),
+            "total": total,
+            "time": max((result["time"] for result in finished), default=0),
+            "results": results,
+        }
+        if error:
+            summary["error"] = error
+        return summary
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+judge = Judge(artifacts=ArtifactCache())
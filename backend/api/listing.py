@@ -0,0 +1,91 @@
+from fastapi import HTTPException, status
+from typing import Any, Dict, List, Optional
+from api.async_mongodb import async_mongodb
+from api.loaders import UserLoader
+from api.mongodb import InvalidCursorError
+from api.responses import BSONJSONResponse
+from api.streaming import ndjson_response
+from config import config
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+async def list_documents(database_name: str, collection_name: str, sort_list: List[tuple],
+        limit: Optional[int] = None, cursor: Optional[str] = None, stream: bool = False,
+        cache: bool = False, projection: Dict[str, Any] = {}, total: bool = False,
+        users: Optional[UserLoader] = None, user_fields: Dict[str, str] = {}, **conditions
+    ):
+    """
+    列表路由共用的查詢流程
+
+    一般模式以 keyset 分頁回傳 {"items": [...], "next_cursor": ...}；
+    stream 模式則從 cursor 之後開始以 NDJSON 串流輸出，limit 可省略以匯出全部文件。
+    兩種模式都直接以 orjson 編碼查詢結果 (含 ObjectId)，不經過 jsonable_encoder。
+    讀取偏好為 MONGODB_LISTING_READ_PREFERENCE (例如將列表查詢分散到 secondary)。
+
+    Args:
+        database_name: 資料庫名稱
+        collection_name: 集合名稱
+        sort_list: 排序條件列表
+        limit: 每頁數量，可選
+        cursor: 上一頁回傳的 next_cursor，可選
+        stream: 是否以 NDJSON 串流輸出
+        cache: 一般模式是否使用讀取快取
+        projection: 欄位投影，通常為 projection_for(回應模型)
+        total: 一般模式是否同時回傳符合條件的總數 (以 $facet 在同一次查詢中計算，不使用快取)
+        users: 請求範圍的 UserLoader，與 user_fields 一起使用
+        user_fields: 要附加使用者顯示資訊的欄位 {使用者 ID 欄位: 輸出欄位}，例如 {"author_id": "author"}；
+                     一頁只查詢一次使用者集合，串流模式則每 STREAM_BATCH_SIZE 份文件查詢一次
+        **conditions: 簡化查詢條件，格式為 field__operator=value
+
+    Returns:
+        BSONJSONResponse 或 StreamingResponse
+    """
+    read_preference = config.MONGODB_LISTING_READ_PREFERENCE or None
+    try:
+        if stream:
+            if cursor:
+                # 在開始串流之前先驗證 token，錯誤才能以 400 回應
+                async_mongodb.decode_cursor(cursor, async_mongodb._normalize_sort(sort_list))
+            documents = async_mongodb.iter_data(
+                database_name,
+                collection_name,
+                projection=projection,
+                sort_list=sort_list,
+                limit=limit,
+                after=cursor,
+                convert_id=False,
+                read_preference=read_preference,
+                **conditions
+            )
+            if users is not None and user_fields:
+                documents = users.attach_stream(documents, user_fields)
+            return ndjson_response(documents)
+
+        if total:
+            pipeline = async_mongodb.pipeline(database_name, collection_name).match(**conditions)
+            if projection:
+                pipeline.project(projection)
+            pipeline.paginate(sort_list, limit or DEFAULT_PAGE_SIZE, cursor)
+            page = await async_mongodb.aggregate_page(
+                pipeline, convert_id=False, read_preference=read_preference
+            )
+        else:
+            page = await async_mongodb.get_page(
+                database_name,
+                collection_name,
+                projection=projection,
+                sort_list=sort_list,
+                limit=limit or DEFAULT_PAGE_SIZE,
+                cursor=cursor,
+                cache=cache,
+                convert_id=False,
+                read_preference=read_preference,
+                **conditions
+            )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if users is not None and user_fields:
+        await users.attach(page["items"], user_fields)
+    return BSONJSONResponse(page)
@@ -0,0 +1,158 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from api.async_mongodb import async_mongodb
+from api.responses import projection_for
+from config import config
+from map import DATABASE, COLLECTION
+from models.users import UserDisplay
+
+USER_DISPLAY_PROJECTION = projection_for(UserDisplay)
+USER_DISPLAY_FIELDS = tuple(USER_DISPLAY_PROJECTION)
+# 串流模式每累積多少份文件查詢一次使用者
+STREAM_BATCH_SIZE = 100
+
+class UserLoader:
+    def __init__(self, db=async_mongodb, cache_ttl: Optional[float] = None):
+        """
+        以請求為範圍的使用者顯示資訊載入器 (DataLoader)
+
+        同一個事件迴圈週期內的 load() 會合併為一次 _id $in 查詢，只投影顯示欄位；
+        結果在請求內記住，不會重複查詢。啟用讀取快取 (CACHE_BACKEND) 且
+        USER_LOADER_CACHE_TTL 大於 0 時，另以較短的 TTL 存入共享快取，
+        使用者集合的寫入會使其失效 (集合版本號)
+
+        Args:
+            db: AsyncMongoDB 實例
+            cache_ttl: 共享快取的存活秒數，None 代表使用 USER_LOADER_CACHE_TTL
+        """
+        self.db = db
+        self.cache_ttl = config.USER_LOADER_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.queries = 0
+        self._loaded: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def load(self, user_id: str) -> "asyncio.Future":
+        """
+        載入一位使用者的顯示資訊
+
+        Args:
+            user_id: 使用者 ID
+
+        Returns:
+            完成時為 {"name", "avatar"} 的 future，使用者不存在時為 None
+        """
+        loop = asyncio.get_running_loop()
+        if user_id in self._loaded:
+            future = loop.create_future()
+            future.set_result(self._loaded[user_id])
+            return future
+        future = self._pending.get(user_id)
+        if future is None:
+            if not self._pending:
+                # 等目前這輪的其他 load() 都排入後再查詢
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+            future = self._pending[user_id] = loop.create_future()
+        return future
+
+    async def load_many(self, user_ids: Iterable[Optional[str]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        載入多位使用者的顯示資訊 (略過空值與重複)
+
+        Returns:
+            {使用者 ID: {"name", "avatar"} 或 None}
+        """
+        user_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+        users = await asyncio.gather(*[self.load(user_id) for user_id in user_ids])
+        return dict(zip(user_ids, users))
+
+    async def attach(self, documents: List[Dict[str, Any]], fields: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        將使用者的顯示資訊加到文件上
+
+        Args:
+            documents: 文件列表
+            fields: {使用者 ID 欄位: 輸出欄位}，例如 {"author_id": "author"}
+
+        Returns:
+            同一個文件列表
+        """
+        users = await self.load_many(
+            str(document[field]) for document in documents for field in fields if document.get(field)
+        )
+        for document in documents:
+            for field, output in fields.items():
+                user_id = document.get(field)
+                document[output] = users.get(str(user_id)) if user_id else None
+        return documents
+
+    async def attach_stream(self, documents: AsyncIterator[Dict[str, Any]], fields: Dict[str, str],
+            batch_size: int = STREAM_BATCH_SIZE
+        ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        串流版本的 attach: 每 batch_size 份文件查詢一次
+        """
+        batch = []
+        async for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                for document in await self.attach(batch, fields):
+                    yield document
+                batch = []
+        if batch:
+            for document in await self.attach(batch, fields):
+                yield document
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        try:
+            users = await self._fetch(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for user_id, future in pending.items():
+            self._loaded[user_id] = users.get(user_id)
+            if not future.done():
+                future.set_result(self._loaded[user_id])
+
+    async def _fetch(self, user_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        cache = self.db.cache if self.cache_ttl > 0 else None
+        users = {}
+        missing = user_ids
+        if cache is not None:
+            # 版本號只取一次，所有鍵以一次 MGET 讀取
+            generation = await cache.generation(DATABASE.ACCOUNT.value, COLLECTION.USER.value)
+            keys = {
+                user_id: cache.build_key(DATABASE.ACCOUNT.value, COLLECTION.USER.value, generation, "user_display", _id=user_id)
+                for user_id in user_ids
+            }
+            missing = []
+            for user_id, (hit, user) in zip(user_ids, await cache.get_many(list(keys.values()))):
+                if hit:
+                    users[user_id] = user
+                else:
+                    missing.append(user_id)
+        if not missing:
+            return users
+
+        self.queries += 1
+        found = await self.db.get_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.USER.value,
+            projection=USER_DISPLAY_PROJECTION,
+            _id__in=self.db._object_ids(missing)
+        )
+        found = {user["_id"]: {field: user.get(field) for field in USER_DISPLAY_FIELDS} for user in found}
+        for user_id in missing:
+            # 不存在的使用者也記住，避免重複查詢
+            users[user_id] = found.get(user_id)
+        if cache is not None:
+            await cache.set_many({keys[user_id]: users[user_id] for user_id in missing}, ttl=self.cache_ttl)
+        return users
+
+def user_loader() -> UserLoader:
+    """
+    FastAPI 依賴: 每個請求建立一個 UserLoader
+    """
+    return UserLoader()
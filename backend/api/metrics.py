@@ -0,0 +1,356 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from starlette.routing import Match
+from typing import Any, Dict, List, Set, Tuple
+from config import config
+
+slow_query_logger = logging.getLogger("slow_query")
+slow_query_logger.setLevel(logging.WARNING)
+
+# 目前請求所對應的路由樣板 (例如 /question/{question_id})，由 MetricsMiddleware 設定
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DOCUMENT_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000, 5000)
+READ_OPERATIONS = ("find", "aggregate", "distinct")
+# 執行中的慢查詢 explain()，保留參考避免 task 在完成前被回收
+_explain_tasks: Set[asyncio.Task] = set()
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        """
+        Prometheus 風格的累積直方圖
+        """
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        儲存各路由的 HTTP 與資料庫操作統計
+        """
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = defaultdict(dict)
+        self._values: Dict[str, Dict[Tuple, float]] = defaultdict(dict)
+        self._types: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+
+    def observe(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Dict[str, str], value: float) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help[name] = help_text
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, help_text: str, labels: Dict[str, str], value: float = 1) -> None:
+        """
+        遞增計數器
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help[name] = help_text
+            self._types[name] = "counter"
+            self._values[name][key] = self._values[name].get(key, 0) + value
+
+    def set(self, name: str, help_text: str, labels: Dict[str, str], value: float) -> None:
+        """
+        設定量表 (gauge) 的值
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help[name] = help_text
+            self._types[name] = "gauge"
+            self._values[name][key] = value
+
+    def render(self) -> List[str]:
+        """
+        輸出 Prometheus text format 的各行
+        """
+        lines = []
+        with self._lock:
+            for name, series in self._histograms.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    labels = ",".join(f'{label}="{_escape(value)}"' for label, value in key)
+                    separator = "," if labels else ""
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+            for name, series in self._values.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+                for key, total in series.items():
+                    labels = ",".join(f'{label}="{_escape(value)}"' for label, value in key)
+                    lines.append(f"{name}{{{labels}}} {total}" if labels else f"{name} {total}")
+        return lines
+
+registry = MetricsRegistry()
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def query_shape(value: Any) -> Any:
+    """
+    將查詢條件正規化為形狀：保留欄位與運算子，值以 ? 取代
+
+    例如 {"email": "a@b.c", "age": {"$gt": 18}} -> {"email": "?", "age": {"$gt": "?"}}
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+def render_metrics(cache=None) -> str:
+    """
+    輸出 /metrics 的內容
+
+    Args:
+        cache: api.cache.QueryCache 實例，提供時一併輸出命中/未命中次數
+    """
+    lines = registry.render()
+    if cache is not None:
+        lines.append("# HELP codingweb_cache_requests_total Read-through cache lookups")
+        lines.append("# TYPE codingweb_cache_requests_total counter")
+        for namespace, stats in cache.stats().items():
+            lines.append(f'codingweb_cache_requests_total{{namespace="{namespace}",result="hit"}} {stats["hits"]}')
+            lines.append(f'codingweb_cache_requests_total{{namespace="{namespace}",result="miss"}} {stats["misses"]}')
+    return "\n".join(lines) + "\n"
+
+def _record_db(operation: str, database_name: str, collection_name: str, duration: float, shape: Any, returned: int, status: str = "ok") -> None:
+    labels = {
+        "route": current_route.get(),
+        "database": database_name,
+        "collection": collection_name,
+        "operation": operation,
+        "status": status,
+    }
+    registry.observe("codingweb_db_operation_seconds", "MongoDB operation duration", LATENCY_BUCKETS, labels, duration)
+    if operation in READ_OPERATIONS and status == "ok":
+        registry.observe("codingweb_db_documents_returned", "Documents returned per MongoDB read", DOCUMENT_BUCKETS, labels, returned)
+
+    if duration * 1000 >= config.SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            f"Slow {operation} on {database_name}.{collection_name} "
+            f"({duration * 1000:.1f}ms, {returned} documents, {status}, route {labels['route']}): "
+            f"{json.dumps(shape, sort_keys=True, default=str)}"
+        )
+
+def _call_shape(arguments: Dict[str, Any]) -> Any:
+    if "pipeline" in arguments:
+        # Pipeline 物件或階段列表
+        stages = getattr(arguments["pipeline"], "stages", arguments["pipeline"])
+        return [query_shape(stage) for stage in stages]
+    if "operations" in arguments:
+        return sorted({operation.get("op", "?") for operation in arguments["operations"]})
+    shape = query_shape(arguments.get("filter_dict") or {})
+    for key in arguments.get("conditions") or {}:
+        shape[key] = "?"
+    return shape
+
+def _returned(result: Any) -> int:
+    if isinstance(result, list):
+        return len(result)
+    return 0
+
+def _status(error: BaseException) -> str:
+    # 產生器被提前關閉 (呼叫端不再迭代) 不算失敗
+    return "ok" if isinstance(error, GeneratorExit) else "error"
+
+def _explain_filter(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return self._merge_conditions(dict(arguments.get("filter_dict") or {}), arguments.get("conditions") or {})
+
+def _log_collscan(plan: Dict[str, Any], operation: str, database_name: str, collection_name: str, shape: Any) -> None:
+    if "COLLSCAN" in json.dumps(plan.get("queryPlanner", {}).get("winningPlan", {}), default=str):
+        slow_query_logger.warning(
+            f"COLLSCAN for slow {operation} on {database_name}.{collection_name}: "
+            f"{json.dumps(shape, sort_keys=True, default=str)} "
+            f"(examined {plan.get('executionStats', {}).get('totalDocsExamined', '?')} documents)"
+        )
+
+def instrument(operation: str):
+    """
+    記錄 MongoDB 方法的耗時、集合、操作、查詢形狀與回傳文件數
+
+    支援同步/非同步函式以及同步/非同步產生器 (在迭代結束時記錄)。拋出例外的操作同樣會記錄，
+    status 標籤為 error (產生器被提前關閉不算錯誤)。
+    查詢超過 Config.SLOW_QUERY_MS 時寫入慢查詢日誌；若 Config.SLOW_QUERY_EXPLAIN
+    啟用，會對慢的 find 類查詢執行 explain() 並記錄 COLLSCAN。
+
+    Args:
+        operation: 操作名稱，例如 find、aggregate、insert
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def bind(self, args, kwargs) -> Dict[str, Any]:
+            bound = signature.bind(self, *args, **kwargs)
+            return bound.arguments
+
+        def should_explain(duration: float) -> bool:
+            return (
+                config.SLOW_QUERY_EXPLAIN
+                and operation in ("find", "count", "distinct")
+                and duration * 1000 >= config.SLOW_QUERY_MS
+            )
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(self, *args, **kwargs):
+                arguments = bind(self, args, kwargs)
+                start = time.perf_counter()
+                returned = 0
+                status = "ok"
+                try:
+                    async for item in func(self, *args, **kwargs):
+                        returned += 1
+                        yield item
+                except BaseException as e:
+                    status = _status(e)
+                    raise
+                finally:
+                    _record_db(operation, arguments["database_name"], arguments["collection_name"],
+                               time.perf_counter() - start, _call_shape(arguments), returned, status)
+            return async_gen_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(self, *args, **kwargs):
+                arguments = bind(self, args, kwargs)
+                start = time.perf_counter()
+                returned = 0
+                status = "ok"
+                try:
+                    for item in func(self, *args, **kwargs):
+                        returned += 1
+                        yield item
+                except BaseException as e:
+                    status = _status(e)
+                    raise
+                finally:
+                    _record_db(operation, arguments["database_name"], arguments["collection_name"],
+                               time.perf_counter() - start, _call_shape(arguments), returned, status)
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                arguments = bind(self, args, kwargs)
+                start = time.perf_counter()
+                try:
+                    result = await func(self, *args, **kwargs)
+                except BaseException:
+                    _record_db(operation, arguments["database_name"], arguments["collection_name"],
+                               time.perf_counter() - start, _call_shape(arguments), 0, "error")
+                    raise
+                duration = time.perf_counter() - start
+                shape = _call_shape(arguments)
+                _record_db(operation, arguments["database_name"], arguments["collection_name"],
+                           duration, shape, _returned(result))
+                if should_explain(duration):
+                    task = asyncio.create_task(_explain_async(self, operation, arguments, shape))
+                    _explain_tasks.add(task)
+                    task.add_done_callback(_explain_tasks.discard)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            arguments = bind(self, args, kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+            except BaseException:
+                _record_db(operation, arguments["database_name"], arguments["collection_name"],
+                           time.perf_counter() - start, _call_shape(arguments), 0, "error")
+                raise
+            duration = time.perf_counter() - start
+            shape = _call_shape(arguments)
+            _record_db(operation, arguments["database_name"], arguments["collection_name"],
+                       duration, shape, _returned(result))
+            if should_explain(duration):
+                try:
+                    collection = self.get_collection(arguments["database_name"], arguments["collection_name"])
+                    plan = collection.find(_explain_filter(self, arguments)).explain()
+                    _log_collscan(plan, operation, arguments["database_name"], arguments["collection_name"], shape)
+                except Exception as e:
+                    slow_query_logger.warning(f"explain() failed: {str(e)}")
+            return result
+        return wrapper
+    return decorator
+
+async def _explain_async(db, operation: str, arguments: Dict[str, Any], shape: Any) -> None:
+    try:
+        collection = db.get_collection(arguments["database_name"], arguments["collection_name"])
+        plan = await collection.find(_explain_filter(db, arguments)).explain()
+        _log_collscan(plan, operation, arguments["database_name"], arguments["collection_name"], shape)
+    except Exception as e:
+        slow_query_logger.warning(f"explain() failed: {str(e)}")
+
+def _route_template(app, scope) -> str:
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+class MetricsMiddleware:
+    def __init__(self, app, fastapi_app):
+        """
+        設定 current_route 並記錄每個路由的 HTTP 延遲
+
+        Args:
+            app: 下一層 ASGI app
+            fastapi_app: 用來比對路由樣板的 FastAPI 實例
+        """
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = _route_template(self.fastapi_app, scope)
+        token = current_route.set(route)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.observe(
+                "codingweb_http_request_seconds",
+                "HTTP request duration",
+                LATENCY_BUCKETS,
+                {"route": route, "method": scope["method"], "status": str(status_code)},
+                time.perf_counter() - start
+            )
+            current_route.reset(token)
@@ -1,40 +1,165 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, InsertOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany
 from pymongo.database import Database
 from pymongo.collection import Collection
-from bson import ObjectId
-from typing import List, Dict, Any
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from bson import ObjectId, json_util
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple, Union
+import base64
+import inspect
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from api.metrics import instrument
+from api.pipeline import Pipeline
+from api.pool import PoolMonitor, client_options, database_options, resolve_read_preference
 from config import config
 
-class MongoDB:
-    def __init__(self):
+logger = logging.getLogger(__name__)
+
+# build_query 支援的操作符
+QUERY_OPERATORS: Dict[str, Callable[[Any], Any]] = {
+    'eq': lambda v: v,
+    'ne': lambda v: {'$ne': v},
+    'gt': lambda v: {'$gt': v},
+    'gte': lambda v: {'$gte': v},
+    'lt': lambda v: {'$lt': v},
+    'lte': lambda v: {'$lte': v},
+    'in': lambda v: {'$in': v if isinstance(v, list) else [v]},
+    'nin': lambda v: {'$nin': v if isinstance(v, list) else [v]},
+    'exists': lambda v: {'$exists': v},
+    'regex': lambda v: {'$regex': v, '$options': 'i'},
+    'contains': lambda v: {'$regex': v, '$options': 'i'},
+    'starts_with': lambda v: {'$regex': f'^{v}', '$options': 'i'},
+    'ends_with': lambda v: {'$regex': f'{v}$', '$options': 'i'},
+    'all': lambda v: {'$all': v if isinstance(v, list) else [v]},
+    'size': lambda v: {'$size': v}
+}
+
+@lru_cache(maxsize=1024)
+def compile_query_shape(keys: Tuple[str, ...]) -> Tuple[Tuple[str, Optional[Callable[[Any], Any]]], ...]:
+    """
+    將簡化查詢條件的鍵 (查詢的形狀) 解析為 (欄位, 操作符函式)，相同形狀的查詢只解析一次
+
+    Args:
+        keys: 條件的鍵，例如 ("email__eq", "age__gt")
+
+    Returns:
+        與 keys 對應的 (欄位, 操作符函式)，不支援的操作符為 None (該條件會被忽略)
+    """
+    compiled = []
+    for key in keys:
+        if '__' in key:
+            field, operator = key.split('__', 1)
+            compiled.append((field, QUERY_OPERATORS.get(operator)))
+        else:
+            # 沒有操作符，預設為等於
+            compiled.append((key, QUERY_OPERATORS['eq']))
+    return tuple(compiled)
+
+class InvalidCursorError(ValueError):
+    """
+    分頁 token 無法解碼或與查詢的排序條件不符
+    """
+
+class BaseMongoDB:
+    """
+    同步與非同步 MongoDB 存取層共用的查詢邏輯
+    """
+    _listeners = None
+    _client = None
+
+    @property
+    def client(self):
         """
-        Initialize the MongoDB client
+        MongoDB client，第一次使用時才依 Config 建立，匯入模組不需要設定也不會連線
         """
-        try:
-            self._client = MongoClient(
-                config.MONGODB_URL,
-                maxPoolSize=10,
-                minPoolSize=1,
-                maxIdleTimeMS=30000,
-                serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=5000,
-                socketTimeoutMS=5000
-            )
-        except Exception as e:
-            raise ConnectionError(f"Failed to connect to MongoDB: {str(e)}")
+        if self._client is None:
+            with self._connect_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
 
-    def get_database(self, database_name: str) -> Database:
+    def _create_client(self):
+        raise NotImplementedError
+
+    def close(self) -> None:
         """
-        Get a database
+        關閉 client 與連線池；之後再次使用時會重新建立
         """
-        return self._client[database_name]
-    
-    def get_collection(self, database_name: str, collection_name: str) -> Collection:
+        client, self._client = self._client, None
+        self._databases = {}
+        if client is not None:
+            client.close()
+
+    def add_listener(self, database_name: str, collection_name: str, listener) -> None:
         """
-        Get a collection
+        註冊集合的寫入監聽器
+
+        每次透過此存取層寫入該集合後 (含 bulk)，會以寫入後的文件呼叫
+        listener.on_change(database_name, collection_name, documents, deleted_ids)，
+        documents 為新增或更新後的完整文件，deleted_ids 為已刪除的文件 ID。
+        只會收到此 process 經由此實例的寫入；其他 process 的寫入請使用 api.changefeed。
+        非同步存取層的監聽器可回傳 awaitable，寫入會等待其完成。
+        只需要文件 ID 的監聽器可設定 ids_only = True；集合的監聽器皆為 ids_only 時，
+        寫入後的重新讀取只投影 _id，documents 中的文件只有 _id。
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            listener: 具有 on_change 方法的物件
         """
-        return self.get_database(database_name)[collection_name]
-    
+        if self._listeners is None:
+            self._listeners = defaultdict(list)
+        self._listeners[(database_name, collection_name)].append(listener)
+
+    def _listening(self, database_name: str, collection_name: str) -> bool:
+        return bool(self._listeners and self._listeners.get((database_name, collection_name)))
+
+    def _publish_projection(self, database_name: str, collection_name: str) -> Optional[Dict[str, Any]]:
+        """
+        寫入後重新讀取的投影：監聽器皆只需要 ID 時只讀取 _id，否則讀取完整文件 (None)
+        """
+        if all(getattr(listener, "ids_only", False) for listener in self._listeners[(database_name, collection_name)]):
+            return {"_id": 1}
+        return None
+
+    def _object_ids(self, ids: List[Any]) -> List[Any]:
+        """
+        將 ID 轉為 ObjectId (可轉換者) 並去除重複
+        """
+        converted = []
+        for _id in ids:
+            if isinstance(_id, str) and ObjectId.is_valid(_id):
+                _id = ObjectId(_id)
+            if _id not in converted:
+                converted.append(_id)
+        return converted
+
+    def _notify(self, database_name: str, collection_name: str, ids: List[Any], documents: List[Dict[str, Any]]) -> List[Any]:
+        """
+        通知監聽器：ids 中重新讀取得到的文件為新增/更新，讀不到的為已刪除
+
+        Returns:
+            非同步監聽器回傳的 awaitable，由非同步存取層等待
+        """
+        found = set()
+        for doc in documents:
+            doc["_id"] = str(doc["_id"])
+            found.add(doc["_id"])
+        deleted_ids = [str(_id) for _id in ids if str(_id) not in found]
+        pending = []
+        for listener in self._listeners[(database_name, collection_name)]:
+            try:
+                result = listener.on_change(database_name, collection_name, documents, deleted_ids)
+                if inspect.isawaitable(result):
+                    pending.append(result)
+            except Exception as e:
+                # 監聽器的錯誤不影響已完成的寫入
+                logger.error(f"Write listener failed for {database_name}.{collection_name}: {str(e)}")
+        return pending
+
     def _convert_id_to_objectid(self, filter_dict: Dict[str, Any]) -> None:
         """
         將 filter_dict 中的字串 _id 轉換為 ObjectId
@@ -60,39 +185,348 @@ class MongoDB:
         Returns:
             查詢條件字典
         """
-        operators = {
-            'eq': lambda v: v,
-            'ne': lambda v: {'$ne': v},
-            'gt': lambda v: {'$gt': v},
-            'gte': lambda v: {'$gte': v},
-            'lt': lambda v: {'$lt': v},
-            'lte': lambda v: {'$lte': v},
-            'in': lambda v: {'$in': v if isinstance(v, list) else [v]},
-            'nin': lambda v: {'$nin': v if isinstance(v, list) else [v]},
-            'exists': lambda v: {'$exists': v},
-            'regex': lambda v: {'$regex': v, '$options': 'i'},
-            'contains': lambda v: {'$regex': v, '$options': 'i'},
-            'starts_with': lambda v: {'$regex': f'^{v}', '$options': 'i'},
-            'ends_with': lambda v: {'$regex': f'{v}$', '$options': 'i'},
-            'all': lambda v: {'$all': v if isinstance(v, list) else [v]},
-            'size': lambda v: {'$size': v}
-        }
-        
         query = {}
-        for key, value in conditions.items():
-            if '__' in key:
-                field, operator = key.split('__', 1)
-                if operator in operators:
-                    query[field] = operators[operator](value)
-            else:
-                # 沒有操作符，預設為等於
-                query[key] = value
+        for (key, value), (field, operator) in zip(conditions.items(), compile_query_shape(tuple(conditions))):
+            if operator is not None:
+                query[field] = operator(value)
         return query
 
+    def _merge_conditions(self, filter_dict: Dict[str, Any], conditions: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        合併原生查詢條件與簡化查詢條件，並轉換 _id
+
+        Args:
+            filter_dict: 查詢條件 (MongoDB 原生格式)
+            conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Returns:
+            合併後的查詢條件字典
+        """
+        # 如果有簡化查詢條件，先轉換為 MongoDB 格式
+        if conditions:
+            query_conditions = self.build_query(**conditions)
+            # 合併 filter_dict 和 conditions
+            filter_dict = {**filter_dict, **query_conditions}
+
+        self._convert_id_to_objectid(filter_dict)
+        return filter_dict
+
+    def pipeline(self, database_name: str, collection_name: str, require_index: bool = True) -> Pipeline:
+        """
+        建立聚合管道，以 aggregate 或 aggregate_page 執行
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            require_index: 開頭的 $match/$sort 是否必須能使用已宣告的索引
+
+        Returns:
+            Pipeline
+        """
+        return Pipeline(self, database_name, collection_name, require_index)
+
+    def _normalize_sort(self, sort_list: List[tuple] = None) -> List[tuple]:
+        """
+        確保排序條件以 _id 作為最後的排序鍵，使排序結果唯一且可用於分頁
+
+        Args:
+            sort_list: 排序條件列表 [("field", 1), ("field2", -1)]
+
+        Returns:
+            包含 _id 的排序條件列表
+        """
+        sort_list = [tuple(item) for item in (sort_list or [])]
+        if not any(field == "_id" for field, _ in sort_list):
+            direction = sort_list[-1][1] if sort_list else 1
+            sort_list.append(("_id", direction))
+        return sort_list
+
+    def encode_cursor(self, document: Dict[str, Any], sort_list: List[tuple]) -> str:
+        """
+        將最後一筆文件的 (排序鍵, _id) 編碼為不透明的分頁 token
+
+        Args:
+            document: 目前頁面的最後一筆文件
+            sort_list: 已正規化 (包含 _id) 的排序條件列表
+
+        Returns:
+            分頁 token
+        """
+        values = []
+        for field, _ in sort_list:
+            value = document.get(field)
+            if field == "_id" and isinstance(value, str) and ObjectId.is_valid(value):
+                value = ObjectId(value)
+            values.append(value)
+        payload = json_util.dumps({"s": [list(item) for item in sort_list], "v": values})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str, sort_list: List[tuple]) -> List[Any]:
+        """
+        解碼分頁 token
+
+        Args:
+            cursor: encode_cursor 產生的分頁 token
+            sort_list: 已正規化 (包含 _id) 的排序條件列表
+
+        Returns:
+            最後一筆文件的排序鍵值列表
+
+        Raises:
+            InvalidCursorError: token 格式錯誤或與目前的排序條件不符
+        """
+        try:
+            padding = "=" * (-len(cursor) % 4)
+            payload = json_util.loads(base64.urlsafe_b64decode(cursor + padding).decode())
+            token_sort = [tuple(item) for item in payload["s"]]
+            values = payload["v"]
+        except Exception:
+            raise InvalidCursorError("Invalid pagination cursor")
+        if token_sort != list(sort_list) or len(values) != len(sort_list):
+            raise InvalidCursorError("Pagination cursor does not match the requested sort order")
+        return values
+
+    def build_keyset_query(self, sort_list: List[tuple], values: List[Any]) -> Dict[str, Any]:
+        """
+        建立 keyset 分頁查詢條件，取得排序在 values 之後的文件
+
+        例如排序 [("created_at", -1), ("_id", -1)] 會產生
+        {"$or": [{"created_at": {"$lt": t}}, {"created_at": t, "_id": {"$lt": id}}]}
+
+        Args:
+            sort_list: 已正規化 (包含 _id) 的排序條件列表
+            values: 最後一筆文件的排序鍵值列表
+
+        Returns:
+            查詢條件字典
+        """
+        branches = []
+        for index, (field, direction) in enumerate(sort_list):
+            branch = {prev_field: values[i] for i, (prev_field, _) in enumerate(sort_list[:index])}
+            operator = "$gt" if direction == 1 else "$lt"
+            branch.update(self.build_query(**{f"{field}__{operator[1:]}": values[index]}))
+            branches.append(branch)
+        return branches[0] if len(branches) == 1 else {"$or": branches}
+
+    def _include_sort_fields(self, projection: Dict[str, Any], sort_list: List[tuple]) -> Dict[str, Any]:
+        """
+        包含式投影必須帶上排序欄位，才能產生下一頁的分頁 token
+
+        Args:
+            projection: 欄位投影
+            sort_list: 排序條件列表
+
+        Returns:
+            欄位投影
+        """
+        if projection and any(value for field, value in projection.items() if field != "_id"):
+            projection = {**projection, **{field: 1 for field, _ in sort_list if field != "_id"}}
+        return projection
+
+    def _apply_keyset(self, filter_dict: Dict[str, Any], sort_list: List[tuple], after: str) -> Tuple[Dict[str, Any], List[tuple]]:
+        """
+        將分頁 token 套用到查詢條件與排序條件
+
+        Args:
+            filter_dict: 已合併的查詢條件
+            sort_list: 排序條件列表
+            after: 分頁 token
+
+        Returns:
+            (查詢條件, 已正規化的排序條件)
+        """
+        sort_list = self._normalize_sort(sort_list)
+        keyset = self.build_keyset_query(sort_list, self.decode_cursor(after, sort_list))
+        filter_dict = {"$and": [filter_dict, keyset]} if filter_dict else keyset
+        return filter_dict, sort_list
+
+    def _to_update_document(self, update_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        將更新內容轉為 MongoDB 更新文件
+
+        已包含更新運算子 (例如 $inc、$addToSet) 時原樣使用，否則視為 $set 的欄位
+
+        Args:
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
+
+        Returns:
+            更新文件
+        """
+        if update_dict and all(key.startswith("$") for key in update_dict):
+            return update_dict
+        return {"$set": update_dict}
+
+    def _build_bulk_request(self, operation: Dict[str, Any]):
+        """
+        將 bulk 操作字典轉為 pymongo 寫入請求
+
+        支援的格式:
+            {"op": "insert", "document": {...}}
+            {"op": "update", "filter": {...}, "update": {...}, "upsert": False, "multi": False}
+            {"op": "upsert", "filter": {...}, "update": {...}}
+            {"op": "delete", "filter": {...}, "multi": False}
+
+        Args:
+            operation: bulk 操作字典
+
+        Returns:
+            pymongo 寫入請求
+        """
+        op = operation.get("op")
+        if op == "insert":
+            document = operation["document"]
+            # 預先產生 _id，才能在結果中回報每個插入操作的 ID
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            return InsertOne(document)
+
+        filter_dict = dict(operation.get("filter", {}))
+        self._convert_id_to_objectid(filter_dict)
+        if op in ("update", "upsert"):
+            update = self._to_update_document(operation["update"])
+            upsert = op == "upsert" or operation.get("upsert", False)
+            if operation.get("multi", False):
+                return UpdateMany(filter_dict, update, upsert=upsert)
+            return UpdateOne(filter_dict, update, upsert=upsert)
+        if op == "delete":
+            if operation.get("multi", False):
+                return DeleteMany(filter_dict)
+            return DeleteOne(filter_dict)
+        raise ValueError(f"Unsupported bulk operation: {op}")
+
+    def _bulk_affected(self, database_name: str, collection_name: str, operations: List[Dict[str, Any]]) -> Tuple[List[Any], Optional[Dict[str, Any]]]:
+        """
+        bulk 寫入前需要通知監聽器的文件: 插入操作的 _id，以及其餘操作的 filter 合併成的單一 $or 查詢
+
+        非 multi 的操作也會查出所有符合 filter 的文件，只會多通知未變更的文件，
+        監聽器本來就必須可重複套用同一事件。集合沒有監聽器時兩者皆為空
+
+        Returns:
+            (插入的 _id 列表, 查詢受影響文件的 filter 或 None)
+        """
+        if not self._listening(database_name, collection_name):
+            return [], None
+        ids, filters = [], []
+        for operation in operations:
+            if operation.get("op") == "insert":
+                ids.append(operation["document"]["_id"])
+                continue
+            filter_dict = dict(operation.get("filter", {}))
+            self._convert_id_to_objectid(filter_dict)
+            filters.append(filter_dict)
+        if not filters:
+            return ids, None
+        return ids, filters[0] if len(filters) == 1 else {"$or": filters}
+
+    def _new_bulk_summary(self) -> Dict[str, Any]:
+        return {
+            "inserted_count": 0,
+            "matched_count": 0,
+            "modified_count": 0,
+            "deleted_count": 0,
+            "upserted_count": 0,
+            "inserted_ids": {},
+            "upserted_ids": {},
+            "skipped_count": 0,
+            "errors": [],
+        }
+
+    def _merge_bulk_result(self, summary: Dict[str, Any], operations: List[Dict[str, Any]], offset: int,
+            result: Dict[str, Any], ordered: bool
+        ) -> None:
+        """
+        將一個批次的結果合併到 summary，索引轉換為原始 operations 中的位置
+
+        Args:
+            summary: 累計結果
+            operations: 此批次的操作
+            offset: 此批次第一個操作在 operations 中的索引
+            result: BulkWriteResult.bulk_api_result 或 BulkWriteError.details
+            ordered: 是否為有序執行，有序執行時第一個錯誤之後的操作不會被執行
+        """
+        summary["inserted_count"] += result.get("nInserted", 0)
+        summary["matched_count"] += result.get("nMatched", 0)
+        summary["modified_count"] += result.get("nModified", 0)
+        summary["deleted_count"] += result.get("nRemoved", 0)
+        summary["upserted_count"] += result.get("nUpserted", 0)
+        for upsert in result.get("upserted", []):
+            summary["upserted_ids"][offset + upsert["index"]] = str(upsert["_id"])
+
+        errors = result.get("writeErrors", [])
+        for error in errors:
+            summary["errors"].append({
+                "index": offset + error["index"],
+                "code": error.get("code"),
+                "message": error.get("errmsg"),
+            })
+
+        failed = {error["index"] for error in errors}
+        executed = min(failed) if ordered and failed else len(operations)
+        for index, operation in enumerate(operations[:executed]):
+            if operation.get("op") == "insert" and index not in failed:
+                summary["inserted_ids"][offset + index] = str(operation["document"]["_id"])
+        summary["skipped_count"] += len(operations) - executed - (1 if ordered and failed else 0)
+
+class MongoDB(BaseMongoDB):
+    def __init__(self):
+        """
+        Initialize the MongoDB access layer; the client is created on first use
+        """
+        self.pool_monitor = PoolMonitor("sync")
+        self._databases: Dict[str, Database] = {}
+        self._connect_lock = threading.Lock()
+
+    def _create_client(self) -> MongoClient:
+        self.pool_monitor.max_pool_size = config.MONGODB_SYNC_MAX_POOL_SIZE
+        try:
+            return MongoClient(
+                config.MONGODB_URL,
+                **client_options(config.MONGODB_SYNC_MAX_POOL_SIZE, self.pool_monitor)
+            )
+        except Exception as e:
+            raise ConnectionError(f"Failed to connect to MongoDB: {str(e)}")
+
+    def warm_up(self, connections: int = None) -> int:
+        """
+        建立 client 並以同時進行的 ping 預先開啟連線，讓第一批請求不需等待連線建立
+        (TCP、TLS 與驗證)；之後由 pymongo 維持 minPoolSize
+
+        Args:
+            connections: 同時進行的 ping 數，預設為 MONGODB_MIN_POOL_SIZE (不超過連線池上限)
+
+        Returns:
+            目前開啟的連線數
+        """
+        connections = max(min(connections or config.MONGODB_MIN_POOL_SIZE, config.MONGODB_SYNC_MAX_POOL_SIZE), 1)
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="mongo-warm-up") as executor:
+            list(executor.map(lambda _: self.command("admin", {"ping": 1}), range(connections)))
+        return sum(pool["open"] for pool in self.pool_monitor.snapshot().values())
+
+    def get_database(self, database_name: str) -> Database:
+        """
+        Get a database with its configured read preference and write concern
+        """
+        database = self._databases.get(database_name)
+        if database is None:
+            database = self._databases[database_name] = self.client.get_database(
+                database_name, **database_options(database_name)
+            )
+        return database
+
+    def get_collection(self, database_name: str, collection_name: str, read_preference: Optional[str] = None) -> Collection:
+        """
+        Get a collection, optionally overriding the read preference for one operation
+        """
+        collection = self.get_database(database_name)[collection_name]
+        if read_preference:
+            collection = collection.with_options(read_preference=resolve_read_preference(read_preference))
+        return collection
+    
+    @instrument("find")
     def get_data(self, database_name: str, collection_name: str,
             filter_dict: Dict[str, Any] = {}, projection: Dict[str, Any] = {},
             sort_list: List[tuple] = None, limit: int = None, skip: int = None,
-            **conditions
+            after: str = None, convert_id: bool = True, read_preference: Optional[str] = None, **conditions
         ) -> List[Dict[str, Any]]:
         """
         查詢多個文件
@@ -105,6 +539,9 @@ class MongoDB:
             sort_list: 排序條件列表 [("field", 1), ("field2", -1)]，可選
             limit: 限制返回數量，可選
             skip: 跳過數量，可選
+            after: keyset 分頁 token，只取排序在該 token 之後的文件，可選
+            convert_id: 是否將 _id 轉為字串；直接交給 api.responses 編碼時可設為 False 省去逐筆轉換
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
             **conditions: 簡化查詢條件，格式為 field__operator=value
                         例如: email__eq="test@example.com", age__gt=18
         
@@ -112,15 +549,11 @@ class MongoDB:
             文件列表
         """
         try:
-            collection = self.get_collection(database_name, collection_name)
+            collection = self.get_collection(database_name, collection_name, read_preference)
             
-            # 如果有簡化查詢條件，先轉換為 MongoDB 格式
-            if conditions:
-                query_conditions = self.build_query(**conditions)
-                # 合併 filter_dict 和 conditions
-                filter_dict = {**filter_dict, **query_conditions}
-            
-            self._convert_id_to_objectid(filter_dict)
+            filter_dict = self._merge_conditions(filter_dict, conditions)
+            if after:
+                filter_dict, sort_list = self._apply_keyset(filter_dict, sort_list, after)
             
             cursor = collection.find(filter_dict, projection)
             
@@ -131,40 +564,219 @@ class MongoDB:
             if limit:
                 cursor = cursor.limit(limit)
             
-            documents = []
-            for doc in cursor:
-                if "_id" in doc:
-                    doc["_id"] = str(doc["_id"])
-                documents.append(doc)
-                
+            documents = list(cursor)
+            if convert_id:
+                for doc in documents:
+                    if "_id" in doc:
+                        doc["_id"] = str(doc["_id"])
             return documents
+        except InvalidCursorError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error finding documents in {database_name}.{collection_name}: {str(e)}")
+
+    def get_page(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any] = {}, projection: Dict[str, Any] = {},
+            sort_list: List[tuple] = None, limit: int = 20, cursor: str = None,
+            convert_id: bool = True, read_preference: Optional[str] = None, **conditions
+        ) -> Dict[str, Any]:
+        """
+        以 keyset 分頁查詢一頁文件，每頁的查詢成本與頁數深度無關
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件 (MongoDB 原生格式)，可選
+            projection: 欄位投影，可選
+            sort_list: 排序條件列表，會自動以 _id 作為最後的排序鍵
+            limit: 每頁數量
+            cursor: 上一頁回傳的 next_cursor，None 代表第一頁
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Returns:
+            {"items": 文件列表, "next_cursor": 下一頁 token，沒有下一頁時為 None}
+        """
+        sort_list = self._normalize_sort(sort_list)
+        projection = self._include_sort_fields(projection, sort_list)
+
+        documents = self.get_data(
+            database_name, collection_name, filter_dict, projection,
+            sort_list, limit=limit + 1, after=cursor,
+            convert_id=convert_id, read_preference=read_preference, **conditions
+        )
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = self.encode_cursor(documents[-1], sort_list)
+
+        return {"items": documents, "next_cursor": next_cursor}
+
+    @instrument("find")
+    def iter_data(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any] = {}, projection: Dict[str, Any] = {},
+            sort_list: List[tuple] = None, limit: int = None, skip: int = None,
+            after: str = None, batch_size: int = 100, convert_id: bool = True, read_preference: Optional[str] = None, **conditions
+        ) -> Iterator[Dict[str, Any]]:
+        """
+        以串流方式逐筆查詢文件，不將整個結果集載入記憶體
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件 (MongoDB 原生格式)，可選
+            projection: 欄位投影，可選
+            sort_list: 排序條件列表 [("field", 1), ("field2", -1)]，可選
+            limit: 限制返回數量，可選
+            skip: 跳過數量，可選
+            after: keyset 分頁 token，只取排序在該 token 之後的文件，可選
+            batch_size: 每次向伺服器取回的文件數量
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+
+        Yields:
+            文件
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            filter_dict = self._merge_conditions(filter_dict, conditions)
+            if after:
+                filter_dict, sort_list = self._apply_keyset(filter_dict, sort_list, after)
+
+            cursor = collection.find(filter_dict, projection, batch_size=batch_size)
+
+            if sort_list:
+                cursor = cursor.sort(sort_list)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit:
+                cursor = cursor.limit(limit)
+        except InvalidCursorError:
+            raise
         except Exception as e:
             raise Exception(f"Error finding documents in {database_name}.{collection_name}: {str(e)}")
 
-    def aggregate(self, database_name: str, collection_name: str, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        try:
+            for doc in cursor:
+                if convert_id and "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+                yield doc
+        finally:
+            cursor.close()
+
+    @instrument("aggregate")
+    def aggregate(self, database_name: str, collection_name: str, pipeline: Union[List[Dict[str, Any]], Pipeline], convert_id: bool = True, read_preference: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         聚合查詢
         
         Args:
             database_name: 資料庫名稱
             collection_name: 集合名稱
-            pipeline: 聚合管道
+            pipeline: 聚合管道 (階段列表或 Pipeline)
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
             
         Returns:
             聚合結果列表
+
+        Raises:
+            UnindexedQueryError: Pipeline 開頭的 $match/$sort 無法使用已宣告的索引
         """
+        if isinstance(pipeline, Pipeline):
+            pipeline = pipeline.build()
         try:
-            collection = self.get_collection(database_name, collection_name)
+            collection = self.get_collection(database_name, collection_name, read_preference)
             results = list(collection.aggregate(pipeline))
             
-            for doc in results:
-                if "_id" in doc:
-                    doc["_id"] = str(doc["_id"])
+            if convert_id:
+                for doc in results:
+                    if "_id" in doc:
+                        doc["_id"] = str(doc["_id"])
                     
             return results
         except Exception as e:
             raise Exception(f"Error aggregating data in {database_name}.{collection_name}: {str(e)}")
 
+    def aggregate_page(self, pipeline: Pipeline, convert_id: bool = True, read_preference: Optional[str] = None) -> Dict[str, Any]:
+        """
+        執行以 paginate 結尾的 Pipeline，一次查詢取得一頁結果與總數
+
+        Args:
+            pipeline: 以 paginate 結尾的 Pipeline
+            convert_id: 是否將 _id 轉為字串
+            read_preference: 此次讀取的讀取偏好，None 代表使用資料庫的設定
+
+        Returns:
+            {"items": 文件列表, "next_cursor": 下一頁 token, "total": 符合條件的總數}
+        """
+        results = self.aggregate(pipeline.database_name, pipeline.collection_name, pipeline, convert_id=False, read_preference=read_preference)
+        return pipeline.parse_page(results, convert_id)
+
+    @instrument("aggregate")
+    def iter_aggregate(self, database_name: str, collection_name: str, pipeline: Union[List[Dict[str, Any]], Pipeline], batch_size: int = 100, read_preference: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        以串流方式逐筆取得聚合結果
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            pipeline: 聚合管道 (階段列表或 Pipeline)
+            batch_size: 每次向伺服器取回的文件數量
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
+
+        Yields:
+            聚合結果文件
+        """
+        if isinstance(pipeline, Pipeline):
+            pipeline = pipeline.build()
+        try:
+            collection = self.get_collection(database_name, collection_name, read_preference)
+            cursor = collection.aggregate(pipeline, batchSize=batch_size)
+        except Exception as e:
+            raise Exception(f"Error aggregating data in {database_name}.{collection_name}: {str(e)}")
+
+        try:
+            for doc in cursor:
+                if "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+                yield doc
+        finally:
+            cursor.close()
+
+    def _affected_ids(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], multi: bool = True) -> List[Any]:
+        """
+        寫入前查出會受影響的文件 _id，集合沒有監聽器時不查詢
+        """
+        if not self._listening(database_name, collection_name):
+            return []
+        filter_dict = dict(filter_dict)
+        self._convert_id_to_objectid(filter_dict)
+        cursor = self.get_collection(database_name, collection_name).find(filter_dict, {"_id": 1})
+        if not multi:
+            cursor = cursor.limit(1)
+        return [doc["_id"] for doc in cursor]
+
+    def _publish(self, database_name: str, collection_name: str, ids: List[Any]) -> None:
+        """
+        寫入後重新讀取受影響的文件並通知監聽器；寫入已完成，失敗時只記錄錯誤
+        """
+        if not (ids and self._listening(database_name, collection_name)):
+            return
+        ids = self._object_ids(ids)
+        try:
+            cursor = self.get_collection(database_name, collection_name).find(
+                {"_id": {"$in": ids}}, self._publish_projection(database_name, collection_name)
+            )
+            documents = list(cursor)
+        except Exception as e:
+            logger.error(f"Failed to notify write listeners for {database_name}.{collection_name}: {str(e)}")
+            return
+        self._notify(database_name, collection_name, ids, documents)
+
+    @instrument("insert")
     def add_data(self, database_name: str, collection_name: str, document: Dict[str, Any]) -> str:
         """
         插入單一文件
@@ -180,10 +792,15 @@ class MongoDB:
         try:
             collection = self.get_collection(database_name, collection_name)
             result = collection.insert_one(document)
+            self._publish(database_name, collection_name, [result.inserted_id])
             return str(result.inserted_id)
+        except DuplicateKeyError:
+            # 唯一索引衝突交由呼叫端處理 (例如重複註冊的 email)
+            raise
         except Exception as e:
             raise Exception(f"Error inserting document in {database_name}.{collection_name}: {str(e)}")
     
+    @instrument("insert_many")
     def add_datas(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]]) -> List[str]:
         """
         插入多個文件
@@ -199,10 +816,12 @@ class MongoDB:
         try:
             collection = self.get_collection(database_name, collection_name)
             result = collection.insert_many(documents)
+            self._publish(database_name, collection_name, result.inserted_ids)
             return [str(id) for id in result.inserted_ids]
         except Exception as e:
             raise Exception(f"Error inserting documents in {database_name}.{collection_name}: {str(e)}")
 
+    @instrument("update")
     def update_data(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any], upsert: bool = False) -> bool:
         """
         更新單一文件
@@ -211,7 +830,7 @@ class MongoDB:
             database_name: 資料庫名稱
             collection_name: 集合名稱
             filter_dict: 查詢條件
-            update_dict: 更新內容
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
             upsert: 如果不存在是否插入
             
         Returns:
@@ -223,12 +842,15 @@ class MongoDB:
             # Convert string _id to ObjectId if present in filter
             self._convert_id_to_objectid(filter_dict)
             
-            result = collection.update_one(filter_dict, {"$set": update_dict}, upsert=upsert)
+            ids = self._affected_ids(database_name, collection_name, filter_dict, multi=False)
+            result = collection.update_one(filter_dict, self._to_update_document(update_dict), upsert=upsert)
+            self._publish(database_name, collection_name, ids + [result.upserted_id] if result.upserted_id else ids)
             return result.modified_count > 0 or result.upserted_id is not None
         except Exception as e:
             raise Exception(f"Error updating document in {database_name}.{collection_name}: {str(e)}")
     
-    def update_datas(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any]) -> int:
+    @instrument("update_many")
+    def update_datas(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any], update_dict: Dict[str, Any], array_filters: Optional[List[Dict[str, Any]]] = None) -> int:
         """
         更新多個文件
         
@@ -236,7 +858,8 @@ class MongoDB:
             database_name: 資料庫名稱
             collection_name: 集合名稱
             filter_dict: 查詢條件
-            update_dict: 更新內容
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
+            array_filters: 陣列元素的篩選條件，對應更新內容中的 $[<identifier>]，可選
             
         Returns:
             更新的文件數量
@@ -247,11 +870,14 @@ class MongoDB:
             # Convert string _id to ObjectId if present in filter
             self._convert_id_to_objectid(filter_dict)
             
-            result = collection.update_many(filter_dict, {"$set": update_dict})
+            ids = self._affected_ids(database_name, collection_name, filter_dict)
+            result = collection.update_many(filter_dict, self._to_update_document(update_dict), array_filters=array_filters)
+            self._publish(database_name, collection_name, ids)
             return result.modified_count
         except Exception as e:
             raise Exception(f"Error updating documents in {database_name}.{collection_name}: {str(e)}")
 
+    @instrument("delete")
     def delete_data(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any]) -> bool:
         """
         刪除單一文件
@@ -270,11 +896,14 @@ class MongoDB:
             # Convert string _id to ObjectId if present in filter
             self._convert_id_to_objectid(filter_dict)
             
+            ids = self._affected_ids(database_name, collection_name, filter_dict, multi=False)
             result = collection.delete_one(filter_dict)
+            self._publish(database_name, collection_name, ids)
             return result.deleted_count > 0
         except Exception as e:
             raise Exception(f"Error deleting document in {database_name}.{collection_name}: {str(e)}")
     
+    @instrument("delete_many")
     def delete_datas(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any]) -> int:
         """
         刪除多個文件
@@ -293,12 +922,109 @@ class MongoDB:
             # Convert string _id to ObjectId if present in filter
             self._convert_id_to_objectid(filter_dict)
             
+            ids = self._affected_ids(database_name, collection_name, filter_dict)
             result = collection.delete_many(filter_dict)
+            self._publish(database_name, collection_name, ids)
             return result.deleted_count
         except Exception as e:
             raise Exception(f"Error deleting documents in {database_name}.{collection_name}: {str(e)}")
 
-    def count_documents(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any] = {}, **conditions) -> int:
+    @instrument("find_one_and_update")
+    def find_one_and_update(self, database_name: str, collection_name: str,
+            filter_dict: Dict[str, Any], update_dict: Dict[str, Any],
+            sort_list: List[tuple] = None, projection: Dict[str, Any] = None,
+            upsert: bool = False, return_new: bool = True
+        ) -> Optional[Dict[str, Any]]:
+        """
+        原子性地查詢並更新單一文件
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            filter_dict: 查詢條件
+            update_dict: 更新內容，未包含更新運算子時視為 $set 的欄位
+            sort_list: 符合多筆時依此排序選擇第一筆，可選
+            projection: 欄位投影，可選
+            upsert: 如果不存在是否插入
+            return_new: 回傳更新後 (True) 或更新前 (False) 的文件
+
+        Returns:
+            文件，沒有符合的文件時為 None
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+
+            # Convert string _id to ObjectId if present in filter
+            self._convert_id_to_objectid(filter_dict)
+
+            doc = collection.find_one_and_update(
+                filter_dict,
+                self._to_update_document(update_dict),
+                projection=projection,
+                sort=sort_list,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER if return_new else ReturnDocument.BEFORE
+            )
+            if doc and "_id" in doc:
+                self._publish(database_name, collection_name, [doc["_id"]])
+                doc["_id"] = str(doc["_id"])
+            return doc
+        except DuplicateKeyError:
+            # upsert 與唯一索引衝突交由呼叫端處理
+            raise
+        except Exception as e:
+            raise Exception(f"Error updating document in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("bulk")
+    def bulk(self, database_name: str, collection_name: str, operations: List[Dict[str, Any]],
+            ordered: bool = True, batch_size: int = 1000
+        ) -> Dict[str, Any]:
+        """
+        批次執行混合的插入/更新/upsert/刪除操作，每個批次只需一次往返
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            operations: 操作列表，格式見 _build_bulk_request，例如
+                        [{"op": "insert", "document": {...}},
+                         {"op": "update", "filter": {"_id": "..."}, "update": {"$inc": {"score": 1}}},
+                         {"op": "delete", "filter": {"status": "resolved"}, "multi": True}]
+            ordered: 有序執行時遇到第一個錯誤即停止；無序執行時伺服器可平行處理並繼續執行其餘操作
+            batch_size: 每個批次的操作數量
+
+        Returns:
+            結果摘要，ID 與錯誤以原始 operations 的索引為鍵:
+            {"inserted_count", "matched_count", "modified_count", "deleted_count",
+             "upserted_count", "inserted_ids", "upserted_ids", "skipped_count", "errors"}
+        """
+        try:
+            collection = self.get_collection(database_name, collection_name)
+            requests = [self._build_bulk_request(operation) for operation in operations]
+            summary = self._new_bulk_summary()
+            ids, affected = self._bulk_affected(database_name, collection_name, operations)
+            if affected is not None:
+                ids += [doc["_id"] for doc in collection.find(affected, {"_id": 1})]
+
+            try:
+                for offset in range(0, len(requests), batch_size):
+                    chunk = operations[offset:offset + batch_size]
+                    try:
+                        result = collection.bulk_write(requests[offset:offset + batch_size], ordered=ordered)
+                        self._merge_bulk_result(summary, chunk, offset, result.bulk_api_result, ordered)
+                    except BulkWriteError as e:
+                        self._merge_bulk_result(summary, chunk, offset, e.details, ordered)
+                        if ordered:
+                            summary["skipped_count"] += max(len(requests) - offset - batch_size, 0)
+                            break
+            finally:
+                self._publish(database_name, collection_name, ids + list(summary["upserted_ids"].values()))
+
+            return summary
+        except Exception as e:
+            raise Exception(f"Error executing bulk write in {database_name}.{collection_name}: {str(e)}")
+
+    @instrument("count")
+    def count_documents(self, database_name: str, collection_name: str, filter_dict: Dict[str, Any] = {}, read_preference: Optional[str] = None, **conditions) -> int:
         """
         計算文件數量
         
@@ -306,27 +1032,22 @@ class MongoDB:
             database_name: 資料庫名稱
             collection_name: 集合名稱
             filter_dict: 查詢條件
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
             **conditions: 簡化查詢條件，格式為 field__operator=value
             
         Returns:
             文件數量
         """
         try:
-            collection = self.get_collection(database_name, collection_name)
-            
-            # 如果有簡化查詢條件，先轉換為 MongoDB 格式
-            if conditions:
-                query_conditions = self.build_query(**conditions)
-                # 合併 filter_dict 和 conditions
-                filter_dict = {**filter_dict, **query_conditions}
-            
-            self._convert_id_to_objectid(filter_dict)
+            collection = self.get_collection(database_name, collection_name, read_preference)
             
+            filter_dict = self._merge_conditions(filter_dict, conditions)
             return collection.count_documents(filter_dict)
         except Exception as e:
             raise Exception(f"Error counting documents in {database_name}.{collection_name}: {str(e)}")
     
-    def distinct(self, database_name: str, collection_name: str, field: str, filter_dict: Dict[str, Any] = {}, **conditions) -> List[Any]:
+    @instrument("distinct")
+    def distinct(self, database_name: str, collection_name: str, field: str, filter_dict: Dict[str, Any] = {}, read_preference: Optional[str] = None, **conditions) -> List[Any]:
         """
         獲取欄位的唯一值
         
@@ -335,31 +1056,24 @@ class MongoDB:
             collection_name: 集合名稱
             field: 欄位名稱
             filter_dict: 查詢條件
+            read_preference: 此次讀取的讀取偏好 (例如 secondaryPreferred)，None 代表使用資料庫的設定
             **conditions: 簡化查詢條件，格式為 field__operator=value
             
         Returns:
             唯一值列表
         """
         try:
-            collection = self.get_collection(database_name, collection_name)
-            
-            # 如果有簡化查詢條件，先轉換為 MongoDB 格式
-            if conditions:
-                query_conditions = self.build_query(**conditions)
-                # 合併 filter_dict 和 conditions
-                filter_dict = {**filter_dict, **query_conditions}
-            
-            self._convert_id_to_objectid(filter_dict)
+            collection = self.get_collection(database_name, collection_name, read_preference)
             
+            filter_dict = self._merge_conditions(filter_dict, conditions)
             return collection.distinct(field, filter_dict)
         except Exception as e:
             raise Exception(f"Error getting distinct values in {database_name}.{collection_name}: {str(e)}")
 
-    def close(self):
+    def command(self, database_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Close the MongoDB client
+        執行資料庫指令，例如 {"hello": 1}
         """
-        if self._client:
-            self._client.close()
+        return self.get_database(database_name).command(command)
 
 mongodb = MongoDB()
\ No newline at end of file
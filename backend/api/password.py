@@ -0,0 +1,149 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError, VerificationError, InvalidHashError
+from typing import Dict, Optional, Tuple
+from config import config
+from errorhandler import ServiceBusy
+
+# 每個 worker process 各自持有的 PasswordHasher
+_hasher: PasswordHasher = None
+
+def _init_worker(params: Dict[str, int]) -> None:
+    global _hasher
+    _hasher = PasswordHasher(**params)
+
+def _hash(password: str) -> str:
+    return _hasher.hash(password)
+
+def _verify(password_hash: str, password: str) -> Tuple[bool, bool]:
+    try:
+        _hasher.verify(password_hash, password)
+    except (VerifyMismatchError, VerificationError, InvalidHashError):
+        return False, False
+    return True, _hasher.check_needs_rehash(password_hash)
+
+class PasswordService:
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None, **params):
+        """
+        在有上限的 process pool 中執行 Argon2，避免佔用 event loop 與 GIL
+
+        未指定的參數在第一次使用時才讀取 Config，匯入模組時不需要完整的環境
+
+        Args:
+            workers: process 數量，None 代表 PASSWORD_HASH_WORKERS
+            max_pending: 最多同時進行 (執行中 + 排隊) 的工作數，超過時回應 429；None 代表 PASSWORD_HASH_MAX_PENDING
+            **params: PasswordHasher 參數 (time_cost, memory_cost, parallelism)，未提供時使用 ARGON2_* 設定
+        """
+        self._workers = workers
+        self._max_pending = max_pending
+        self._params = params
+        self._hasher = None
+        self._executor = None
+        self._pending = 0
+        self._dummy_hash: Optional[str] = None
+
+    @property
+    def params(self) -> Dict[str, int]:
+        if not self._params:
+            self._params = {
+                "time_cost": config.ARGON2_TIME_COST,
+                "memory_cost": config.ARGON2_MEMORY_COST,
+                "parallelism": config.ARGON2_PARALLELISM,
+            }
+        return self._params
+
+    @property
+    def hasher(self) -> PasswordHasher:
+        if self._hasher is None:
+            self._hasher = PasswordHasher(**self.params)
+        return self._hasher
+
+    @property
+    def pending(self) -> int:
+        """
+        目前執行中與排隊中的工作數
+        """
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers or config.PASSWORD_HASH_WORKERS,
+                initializer=_init_worker,
+                initargs=(self.params,)
+            )
+        return self._executor
+
+    async def _submit(self, func, *args):
+        max_pending = config.PASSWORD_HASH_MAX_PENDING if self._max_pending is None else self._max_pending
+        if self._pending >= max_pending:
+            raise ServiceBusy("Too many authentication requests, please retry later")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """
+        產生密碼雜湊
+
+        Args:
+            password: 明文密碼
+
+        Returns:
+            Argon2 雜湊字串
+        """
+        return await self._submit(_hash, password)
+
+    async def verify(self, password_hash: str, password: str) -> Tuple[bool, bool]:
+        """
+        驗證密碼，並同時檢查雜湊是否需要以目前的參數重新產生
+
+        Args:
+            password_hash: 資料庫中的雜湊字串
+            password: 明文密碼
+
+        Returns:
+            (密碼是否正確, 是否需要重新雜湊)
+        """
+        return await self._submit(_verify, password_hash, password)
+
+    async def verify_dummy(self, password: str) -> None:
+        """
+        以固定的雜湊驗證密碼並捨棄結果，找不到帳號時仍花費與驗證一樣的時間，
+        避免由回應時間判斷 email 是否已註冊
+
+        Args:
+            password: 明文密碼
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash("dummy-password")
+        await self._submit(_verify, self._dummy_hash, password)
+
+    def check_needs_rehash(self, password_hash: str) -> bool:
+        """
+        檢查雜湊參數是否與目前設定不同
+
+        只解析雜湊字串中的參數，不涉及雜湊運算，因此直接在目前的 process 執行
+
+        Args:
+            password_hash: 資料庫中的雜湊字串
+
+        Returns:
+            是否需要重新雜湊
+        """
+        return self.hasher.check_needs_rehash(password_hash)
+
+    def shutdown(self) -> None:
+        """
+        關閉 process pool
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+password_service = PasswordService()
@@ -0,0 +1,259 @@
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+from api.indexes import INDEXES
+
+# 每個集合都有的 _id 索引
+ID_INDEX = ("_id_", (("_id", 1),))
+# 可使用索引邊界的等值條件
+EQUALITY_OPERATORS = {"$eq", "$in"}
+
+class UnindexedQueryError(ValueError):
+    """
+    聚合管道開頭的 $match/$sort 無法使用任何已宣告的索引
+    """
+
+def _declared_indexes(database_name: str, collection_name: str) -> List[Tuple[str, Tuple[Tuple[str, Any], ...]]]:
+    for (database, collection), models in INDEXES.items():
+        if database.value == database_name and collection.value == collection_name:
+            return [(model.document["name"], tuple(model.document["key"].items())) for model in models] + [ID_INDEX]
+    return [ID_INDEX]
+
+def query_shape(filter_dict: Dict[str, Any]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    取出查詢條件的形狀 (與值無關)
+
+    Args:
+        filter_dict: MongoDB 原生格式的查詢條件
+
+    Returns:
+        (等值條件的欄位, 範圍或其他條件的欄位)；$and/$or 等邏輯運算子不計入
+    """
+    equality, ranges = set(), set()
+    for field, value in filter_dict.items():
+        if field.startswith("$"):
+            continue
+        if isinstance(value, dict) and any(key.startswith("$") for key in value):
+            (equality if set(value) <= EQUALITY_OPERATORS else ranges).add(field)
+        else:
+            equality.add(field)
+    return frozenset(equality), frozenset(ranges)
+
+@lru_cache(maxsize=1024)
+def index_plan(database_name: str, collection_name: str, equality: FrozenSet[str],
+        ranges: FrozenSet[str], sort: Tuple[Tuple[str, int], ...]) -> Optional[str]:
+    """
+    依 api.indexes.INDEXES 找出可以支援此查詢形狀的索引，相同形狀只計算一次
+
+    索引以等值欄位開頭後，接著的鍵必須與排序條件相同 (或整體反向)；
+    沒有排序時索引的第一個鍵必須出現在查詢條件中。有多個可用索引時選擇等值前綴最長者
+
+    Args:
+        database_name: 資料庫名稱
+        collection_name: 集合名稱
+        equality: 等值條件的欄位
+        ranges: 範圍或其他條件的欄位
+        sort: 排序條件
+
+    Returns:
+        索引名稱，沒有可用的索引時為 None
+    """
+    best, best_prefix = None, -1
+    for name, keys in _declared_indexes(database_name, collection_name):
+        if any(direction not in (1, -1) for _, direction in keys):
+            continue
+        prefix = 0
+        while prefix < len(keys) and keys[prefix][0] in equality:
+            prefix += 1
+        if sort:
+            following = keys[prefix:prefix + len(sort)]
+            if [field for field, _ in following] != [field for field, _ in sort]:
+                continue
+            same = all(a == b for (_, a), (_, b) in zip(following, sort))
+            reverse = all(a == -b for (_, a), (_, b) in zip(following, sort))
+            if not (same or reverse):
+                continue
+        elif not prefix and keys[0][0] not in ranges:
+            continue
+        if prefix > best_prefix:
+            best, best_prefix = name, prefix
+    return best
+
+class Pipeline:
+    def __init__(self, db, database_name: str, collection_name: str, require_index: bool = True):
+        """
+        可組合的聚合管道，$match 使用與 build_query 相同的 field__operator 語法
+
+        通常以 mongodb.pipeline(...) 或 async_mongodb.pipeline(...) 建立:
+            pipeline = async_mongodb.pipeline(DATABASE.REPORT.value, COLLECTION.REPORT.value)
+            pipeline.match(status="pending").paginate([("created_at", -1)], limit=20)
+            page = await async_mongodb.aggregate_page(pipeline)
+
+        Args:
+            db: MongoDB 或 AsyncMongoDB 實例，用來轉換查詢條件與分頁 token
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+            require_index: build 時開頭的 $match/$sort 無法使用已宣告的索引則拋出 UnindexedQueryError，
+                          離線的統計與維護工作可設為 False 以允許整個集合掃描
+        """
+        self.db = db
+        self.database_name = database_name
+        self.collection_name = collection_name
+        self.require_index = require_index
+        self.stages: List[Dict[str, Any]] = []
+        self.page_sort: Optional[List[tuple]] = None
+        self.page_limit: Optional[int] = None
+
+    def _add(self, stage: Dict[str, Any]) -> "Pipeline":
+        if self.page_sort is not None:
+            raise ValueError("paginate() must be the last stage of the pipeline")
+        self.stages.append(stage)
+        return self
+
+    def match(self, filter_dict: Dict[str, Any] = {}, **conditions) -> "Pipeline":
+        """
+        Args:
+            filter_dict: 查詢條件 (MongoDB 原生格式)，可選
+            **conditions: 簡化查詢條件，格式為 field__operator=value
+        """
+        query = self.db._merge_conditions(dict(filter_dict), conditions)
+        previous = self.stages[-1].get("$match") if self.stages else None
+        # 連續的 $match 合併為一個，讓查詢形狀 (與索引檢查) 包含所有條件
+        if previous is not None and not previous.keys() & query.keys() and self.page_sort is None:
+            previous.update(query)
+            return self
+        return self._add({"$match": query})
+
+    def lookup(self, from_collection: str, local_field: str, foreign_field: str, as_field: str) -> "Pipeline":
+        """
+        $lookup 只能關聯同一個資料庫中的集合
+        """
+        return self._add({"$lookup": {
+            "from": from_collection, "localField": local_field, "foreignField": foreign_field, "as": as_field
+        }})
+
+    def unwind(self, path: str, preserve_empty: bool = False) -> "Pipeline":
+        return self._add({"$unwind": {"path": path, "preserveNullAndEmptyArrays": preserve_empty}})
+
+    def group(self, key: Any, **accumulators) -> "Pipeline":
+        """
+        Args:
+            key: 分組鍵，例如 "$author_id" 或 {"question_id": "$question_id", "verdict": "$verdict"}
+            **accumulators: 累加欄位，例如 count={"$sum": 1}
+        """
+        return self._add({"$group": {"_id": key, **accumulators}})
+
+    def sort(self, sort_list: List[tuple]) -> "Pipeline":
+        return self._add({"$sort": {field: direction for field, direction in sort_list}})
+
+    def project(self, projection: Dict[str, Any]) -> "Pipeline":
+        return self._add({"$project": projection})
+
+    def skip(self, skip: int) -> "Pipeline":
+        return self._add({"$skip": skip})
+
+    def limit(self, limit: int) -> "Pipeline":
+        return self._add({"$limit": limit})
+
+    def facet(self, **branches: Union["Pipeline", List[Dict[str, Any]]]) -> "Pipeline":
+        """
+        Args:
+            **branches: 子管道，可為 Pipeline 或階段列表
+        """
+        return self._add({"$facet": {
+            name: branch.stages if isinstance(branch, Pipeline) else branch
+            for name, branch in branches.items()
+        }})
+
+    def paginate(self, sort_list: List[tuple], limit: int, cursor: Optional[str] = None) -> "Pipeline":
+        """
+        以 keyset 分頁取得一頁結果與符合條件的總數，只需一次查詢
+
+        會加上 $sort 與 $facet 兩個階段，必須是最後一個呼叫；以 aggregate_page 執行
+
+        Args:
+            sort_list: 排序條件列表，會自動以 _id 作為最後的排序鍵
+            limit: 每頁數量
+            cursor: 上一頁回傳的 next_cursor，None 代表第一頁
+
+        Raises:
+            InvalidCursorError: token 格式錯誤或與排序條件不符
+        """
+        sort_list = self.db._normalize_sort(sort_list)
+        for stage in self.stages:
+            if "$project" in stage:
+                stage["$project"] = self.db._include_sort_fields(stage["$project"], sort_list)
+        items = []
+        if cursor:
+            items.append({"$match": self.db.build_keyset_query(sort_list, self.db.decode_cursor(cursor, sort_list))})
+        items.append({"$limit": limit + 1})
+        self.sort(sort_list)
+        self.facet(items=items, total=[{"$count": "count"}])
+        self.page_sort = sort_list
+        self.page_limit = limit
+        return self
+
+    def check_indexes(self) -> Optional[str]:
+        """
+        檢查開頭的 $match 與緊接的 $sort 是否能使用已宣告的索引
+
+        Returns:
+            使用的索引名稱；管道不以 $match/$sort 開頭 (本來就需要掃描整個集合) 時為 None
+
+        Raises:
+            UnindexedQueryError: 沒有可用的索引
+        """
+        filter_dict, sort = {}, ()
+        stages = iter(self.stages)
+        stage = next(stages, {})
+        if "$match" in stage:
+            filter_dict = stage["$match"]
+            stage = next(stages, {})
+        # 伺服器會將 $sort 移到 $project 之前
+        while "$project" in stage:
+            stage = next(stages, {})
+        if "$sort" in stage:
+            sort = tuple(stage["$sort"].items())
+        equality, ranges = query_shape(filter_dict)
+        if not (equality or ranges or sort):
+            return None
+        name = index_plan(self.database_name, self.collection_name, equality, ranges, sort)
+        if name is None:
+            raise UnindexedQueryError(
+                f"No declared index on {self.database_name}.{self.collection_name} serves "
+                f"match {sorted(equality | ranges)} sort {list(sort)}"
+            )
+        return name
+
+    def build(self) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            聚合管道
+
+        Raises:
+            UnindexedQueryError: require_index 為 True 且開頭的 $match/$sort 無法使用索引
+        """
+        if self.require_index:
+            self.check_indexes()
+        return self.stages
+
+    def parse_page(self, results: List[Dict[str, Any]], convert_id: bool = True) -> Dict[str, Any]:
+        """
+        將 paginate 管道的聚合結果轉換為分頁結果
+
+        Returns:
+            {"items": 文件列表, "next_cursor": 下一頁 token, "total": 符合條件的總數}
+        """
+        if self.page_sort is None:
+            raise ValueError("Pipeline has no paginate() stage")
+        facet = results[0] if results else {"items": [], "total": []}
+        documents = facet["items"]
+        next_cursor = None
+        if len(documents) > self.page_limit:
+            documents = documents[:self.page_limit]
+            next_cursor = self.db.encode_cursor(documents[-1], self.page_sort)
+        if convert_id:
+            for doc in documents:
+                if "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
+        total = facet["total"][0]["count"] if facet["total"] else 0
+        return {"items": documents, "next_cursor": next_cursor, "total": total}
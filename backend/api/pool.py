@@ -0,0 +1,181 @@
+import threading
+from collections import defaultdict
+from pymongo import monitoring
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+from typing import Any, Dict, Optional
+from api.metrics import LATENCY_BUCKETS, registry
+from config import config
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def resolve_read_preference(mode: Optional[str]):
+    """
+    將讀取偏好名稱轉換為 pymongo 的 read preference
+
+    非 primary 的讀取偏好會套用 MONGODB_MAX_STALENESS_SECONDS
+
+    Args:
+        mode: primary / primaryPreferred / secondary / secondaryPreferred / nearest，空值回傳 None
+
+    Returns:
+        read preference 或 None
+    """
+    if not mode:
+        return None
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=config.MONGODB_MAX_STALENESS_SECONDS)
+
+def resolve_write_concern(value: Optional[str]) -> Optional[WriteConcern]:
+    """
+    將 write concern 設定 (例如 "majority"、"1") 轉換為 WriteConcern，空值回傳 None
+    """
+    if not value:
+        return None
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+def client_options(max_pool_size: int, pool_monitor: "PoolMonitor") -> Dict[str, Any]:
+    """
+    依照 Config 建立 MongoClient / AsyncIOMotorClient 的連線參數
+
+    Args:
+        max_pool_size: 每個伺服器的連線池上限
+        pool_monitor: 連線池事件監聽器
+
+    Returns:
+        client 的關鍵字參數
+    """
+    options = {
+        "maxPoolSize": max_pool_size,
+        "minPoolSize": min(config.MONGODB_MIN_POOL_SIZE, max_pool_size),
+        "maxIdleTimeMS": config.MONGODB_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": config.MONGODB_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": config.MONGODB_SOCKET_TIMEOUT_MS,
+        "event_listeners": [pool_monitor],
+    }
+    if config.MONGODB_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = config.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+    if config.MONGODB_COMPRESSORS:
+        options["compressors"] = config.MONGODB_COMPRESSORS
+    if config.MONGODB_READ_PREFERENCE:
+        options["read_preference"] = resolve_read_preference(config.MONGODB_READ_PREFERENCE)
+    if config.MONGODB_WRITE_CONCERN:
+        options["w"] = resolve_write_concern(config.MONGODB_WRITE_CONCERN).document["w"]
+    return options
+
+def database_options(database_name: str) -> Dict[str, Any]:
+    """
+    MONGODB_READ_PREFERENCE_<DATABASE> 與 MONGODB_WRITE_CONCERN_<DATABASE> 指定的資料庫層級設定
+
+    Returns:
+        get_database 的關鍵字參數
+    """
+    options = {}
+    preference = resolve_read_preference(config.MONGODB_DATABASE_READ_PREFERENCES.get(database_name))
+    if preference is not None:
+        options["read_preference"] = preference
+    concern = resolve_write_concern(config.MONGODB_DATABASE_WRITE_CONCERNS.get(database_name))
+    if concern is not None:
+        options["write_concern"] = concern
+    return options
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self, client: str, max_pool_size: int = 0):
+        """
+        統計每個伺服器連線池的連線數、使用中與等待中的請求數，並輸出到 /metrics
+
+        事件由 pymongo 的執行緒呼叫，因此以鎖保護計數
+
+        Args:
+            client: client 名稱 (sync / async)，作為 metrics 標籤
+            max_pool_size: 每個伺服器的連線池上限，用來計算飽和度；client 建立時設定
+        """
+        self.client = client
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, int]] = defaultdict(lambda: {"open": 0, "checked_out": 0, "waiting": 0})
+
+    def _update(self, event, **changes: int) -> None:
+        address = f"{event.address[0]}:{event.address[1]}"
+        with self._lock:
+            pool = self._pools[address]
+            for key, delta in changes.items():
+                pool[key] = max(0, pool[key] + delta)
+            values = dict(pool)
+        labels = {"client": self.client, "address": address}
+        registry.set("codingweb_mongo_pool_connections", "Open connections in the MongoDB pool", labels, values["open"])
+        registry.set("codingweb_mongo_pool_checked_out", "MongoDB connections in use", labels, values["checked_out"])
+        registry.set("codingweb_mongo_pool_waiting", "Operations waiting for a MongoDB connection", labels, values["waiting"])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            每個伺服器位址的 {"open", "checked_out", "waiting", "max", "saturation"}
+        """
+        with self._lock:
+            pools = {address: dict(pool) for address, pool in self._pools.items()}
+        for pool in pools.values():
+            pool["max"] = self.max_pool_size
+            pool["saturation"] = pool["checked_out"] / self.max_pool_size if self.max_pool_size else 0.0
+        return pools
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        registry.inc(
+            "codingweb_mongo_pool_cleared_total",
+            "MongoDB pools cleared after a network error or failover",
+            {"client": self.client, "address": f"{event.address[0]}:{event.address[1]}"}
+        )
+
+    def pool_closed(self, event):
+        address = f"{event.address[0]}:{event.address[1]}"
+        with self._lock:
+            self._pools.pop(address, None)
+
+    def connection_created(self, event):
+        self._update(event, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event, waiting=-1)
+        registry.inc(
+            "codingweb_mongo_pool_checkout_failures_total",
+            "MongoDB connection check-outs that failed (timeout, pool closed or connection error)",
+            {"client": self.client, "reason": str(event.reason)}
+        )
+
+    def connection_checked_out(self, event):
+        self._update(event, waiting=-1, checked_out=1)
+        registry.observe(
+            "codingweb_mongo_pool_wait_seconds",
+            "Time spent waiting for a MongoDB connection",
+            LATENCY_BUCKETS,
+            {"client": self.client},
+            event.duration
+        )
+
+    def connection_checked_in(self, event):
+        self._update(event, checked_out=-1)
@@ -0,0 +1,291 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from starlette.concurrency import run_in_threadpool
+from api.mongodb import mongodb
+from api.responses import projection_for
+from api.stats import STATS_DATABASE, QUESTION_STATS
+from map import DATABASE, COLLECTION
+from models.questions import QuestionBase
+from models.users import UserDisplay
+
+logger = logging.getLogger(__name__)
+
+DETAIL_DATABASE = DATABASE.QUESTION.value
+DETAIL_COLLECTION = COLLECTION.QUESTION_DETAIL.value
+# 內嵌最新的答案數量，更早的答案以 /answer/answers?question_id= 分頁讀取
+DETAIL_ANSWERS = 20
+QUESTION_PROJECTION = projection_for(QuestionBase)
+# 讀取模型只保存公開的欄位: 測資 (含預期輸出) 只保留標記為範例的 sample_cases
+QUESTION_FIELDS = tuple(field for field in QUESTION_PROJECTION if field not in ("_id", "test_cases"))
+ANSWER_PROJECTION = {"author_id": 1, "language": 1, "verdict": 1, "created_at": 1}
+AUTHOR_PROJECTION = projection_for(UserDisplay)
+
+def rating_average(document: Dict[str, Any]) -> float:
+    count = document.get("review_count", 0)
+    return round(document.get("rating_sum", 0) / count, 2) if count else 0.0
+
+def public_fields(question: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    題目文件中可以公開的欄位與範例測資
+    """
+    return {
+        **{field: question.get(field) for field in QUESTION_FIELDS},
+        "sample_cases": [
+            {"input": case.get("input", ""), "output": case.get("output", "")}
+            for case in question.get("test_cases") or [] if case.get("sample")
+        ],
+    }
+
+def present(detail: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    將讀取模型轉換為 QuestionDetail 回應: 評分總和換算為平均
+    """
+    detail.pop("built_at", None)
+    # 較早建立的讀取模型可能仍含完整測資
+    detail.pop("test_cases", None)
+    for answer in detail.get("answers", []):
+        answer["rating_average"] = rating_average(answer)
+        answer.pop("rating_sum", None)
+    detail["rating_average"] = rating_average(detail)
+    detail.pop("rating_sum", None)
+    return detail
+
+class QuestionDetailService:
+    def __init__(self, db=mongodb):
+        """
+        題目頁面的讀取模型 (question.question_detail)
+
+        題目、答案、評論與使用者分屬不同的資料庫，無法以 $lookup 關聯；每個題目維護一份
+        內嵌題目內容、作者顯示資訊、最新 DETAIL_ANSWERS 份答案摘要 (含各自的評論數與評分)
+        及整題評論統計的文件，題目頁面只需一次以 _id 讀取。
+
+        文件在第一次讀取時建立，之後由寫入答案、評測與評論的路徑增量更新；題目內容與
+        使用者名稱、頭像的變更由 change feed 傳遞。增量更新只修改已存在的文件，
+        與建立同時發生的寫入造成的誤差可用 python manage.py rebuild-question-details 修正
+
+        Args:
+            db: MongoDB 實例
+        """
+        self.db = db
+
+    def _authors(self, user_ids: Iterable[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        一次查詢取得使用者的顯示資訊
+
+        Returns:
+            {使用者 ID: {"name", "avatar"}}
+        """
+        user_ids = sorted({user_id for user_id in user_ids if user_id})
+        if not user_ids:
+            return {}
+        users = self.db.get_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.USER.value,
+            {"_id": {"$in": self.db._object_ids(user_ids)}},
+            projection=AUTHOR_PROJECTION
+        )
+        return {user["_id"]: {"name": user.get("name"), "avatar": user.get("avatar")} for user in users}
+
+    def build(self, question_id: str) -> Optional[Dict[str, Any]]:
+        """
+        從題目、答案、評論與使用者集合重新建立一份讀取模型
+
+        Args:
+            question_id: 題目 ID
+
+        Returns:
+            讀取模型，題目不存在時為 None (並刪除殘留的讀取模型)
+        """
+        questions = self.db.get_data(
+            DATABASE.QUESTION.value,
+            COLLECTION.QUESTION.value,
+            {"_id": question_id},
+            projection=QUESTION_PROJECTION,
+            limit=1
+        )
+        if not questions:
+            self.db.delete_data(DETAIL_DATABASE, DETAIL_COLLECTION, {"_id": question_id})
+            return None
+        question = questions[0]
+
+        answers = self.db.get_data(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            {"question_id": question_id},
+            projection=ANSWER_PROJECTION,
+            sort_list=[("created_at", -1), ("_id", -1)],
+            limit=DETAIL_ANSWERS
+        )
+        answer_count = len(answers)
+        if answer_count == DETAIL_ANSWERS:
+            answer_count = self.db.count_documents(
+                DATABASE.ANSWER.value, COLLECTION.ANSWER.value, {"question_id": question_id}
+            )
+
+        reviews = {}
+        if answers:
+            pipeline = (
+                self.db.pipeline(DATABASE.REVIEW.value, COLLECTION.REVIEW.value)
+                .match(answer_id__in=[answer["_id"] for answer in answers])
+                .group("$answer_id", review_count={"$sum": 1}, rating_sum={"$sum": "$rating"})
+            )
+            reviews = {group["_id"]: group for group in self.db.aggregate(DATABASE.REVIEW.value, COLLECTION.REVIEW.value, pipeline)}
+        # 整題的評論統計由 StatsService 維護
+        stats = self.db.get_data(
+            STATS_DATABASE,
+            QUESTION_STATS,
+            {"_id": question_id},
+            projection={"review_count": 1, "rating_sum": 1},
+            limit=1
+        )
+        stats = stats[0] if stats else {}
+        authors = self._authors([question.get("author_id")] + [answer.get("author_id") for answer in answers])
+
+        detail = {
+            **public_fields(question),
+            "author": authors.get(question.get("author_id")),
+            "answer_count": answer_count,
+            "answers": [{
+                **answer,
+                "author": authors.get(answer.get("author_id")),
+                "review_count": reviews.get(answer["_id"], {}).get("review_count", 0),
+                "rating_sum": reviews.get(answer["_id"], {}).get("rating_sum", 0),
+            } for answer in answers],
+            "review_count": stats.get("review_count", 0),
+            "rating_sum": stats.get("rating_sum", 0),
+            "built_at": datetime.utcnow(),
+        }
+        self.db.update_data(
+            DETAIL_DATABASE,
+            DETAIL_COLLECTION,
+            {"_id": question_id},
+            {"$set": dict(detail), "$unset": {"test_cases": ""}},
+            upsert=True
+        )
+        detail["_id"] = question_id
+        return detail
+
+    def record_answer(self, answer_id: str, answer: Dict[str, Any]) -> None:
+        """
+        新增答案後將摘要加到讀取模型的答案列表開頭
+
+        Args:
+            answer_id: 答案 ID
+            answer: 含 question_id、author_id、language、verdict、created_at 的答案
+        """
+        author_id = answer.get("author_id")
+        entry = {
+            "_id": answer_id,
+            "author_id": author_id,
+            "author": self._authors([author_id]).get(author_id),
+            "language": answer.get("language"),
+            "verdict": answer.get("verdict"),
+            "created_at": answer.get("created_at"),
+            "review_count": 0,
+            "rating_sum": 0,
+        }
+        # 建立讀取模型時已讀到此答案則不重複計入
+        self.db.update_data(
+            DETAIL_DATABASE,
+            DETAIL_COLLECTION,
+            {"_id": answer["question_id"], "answers._id": {"$ne": answer_id}},
+            {
+                "$inc": {"answer_count": 1},
+                "$push": {"answers": {"$each": [entry], "$position": 0, "$slice": DETAIL_ANSWERS}},
+            }
+        )
+
+    def record_verdict(self, answer_id: str, question_id: str, verdict: str) -> None:
+        """
+        更新內嵌答案的評測結果 (不在最新答案列表中的答案不需更新)
+        """
+        self.db.update_data(
+            DETAIL_DATABASE,
+            DETAIL_COLLECTION,
+            {"_id": question_id, "answers._id": answer_id},
+            {"answers.$.verdict": verdict}
+        )
+
+    def record_review(self, review: Dict[str, Any], answer: Dict[str, Any]) -> None:
+        """
+        新增評論後更新整題與內嵌答案的評論統計
+
+        Args:
+            review: 含 rating 的評論
+            answer: 被評論的答案，含 _id、question_id
+        """
+        rating = review.get("rating", 0)
+        increments = {"review_count": 1, "rating_sum": rating}
+        updated = self.db.update_data(
+            DETAIL_DATABASE,
+            DETAIL_COLLECTION,
+            {"_id": answer["question_id"], "answers._id": answer["_id"]},
+            {"$inc": {**increments, "answers.$.review_count": 1, "answers.$.rating_sum": rating}}
+        )
+        if not updated:
+            self.db.update_data(DETAIL_DATABASE, DETAIL_COLLECTION, {"_id": answer["question_id"]}, {"$inc": increments})
+
+    def _exists(self, filter_dict: Dict[str, Any]) -> bool:
+        return bool(self.db.get_data(DETAIL_DATABASE, DETAIL_COLLECTION, filter_dict, projection={"_id": 1}, limit=1))
+
+    def update_author(self, user: Dict[str, Any]) -> int:
+        """
+        使用者名稱或頭像變更後更新題目作者與內嵌答案作者的顯示資訊
+
+        Returns:
+            更新的讀取模型數量
+        """
+        user_id = user["_id"]
+        author = {"name": user.get("name"), "avatar": user.get("avatar")}
+        # 使用者文件的其他變更 (例如登入時升級密碼雜湊) 不影響顯示資訊: 只更新作者資訊
+        # 過期的讀取模型，先以 limit=1 的查詢確認，沒有過期的就略過 update_many
+        stale = {"author_id": user_id, "$or": [{"author.name": {"$ne": author["name"]}}, {"author.avatar": {"$ne": author["avatar"]}}]}
+        stale_answers = {"answers": {"$elemMatch": stale}}
+        updated = 0
+        if self._exists(stale):
+            updated += self.db.update_datas(DETAIL_DATABASE, DETAIL_COLLECTION, stale, {"author": author})
+        if self._exists(stale_answers):
+            updated += self.db.update_datas(
+                DETAIL_DATABASE,
+                DETAIL_COLLECTION,
+                stale_answers,
+                {"answers.$[answer].author": author},
+                array_filters=[{"answer.author_id": user_id}]
+            )
+        return updated
+
+    def apply_change(self, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        if collection_name == COLLECTION.USER.value:
+            for user in documents:
+                self.update_author(user)
+            return
+
+        # 題目作者可能變更，一併更新作者的顯示資訊 (一次查詢)
+        authors = self._authors(question.get("author_id") for question in documents)
+        operations = [{
+            "op": "update",
+            "filter": {"_id": question["_id"]},
+            "update": {
+                "$set": {**public_fields(question), "author": authors.get(question.get("author_id"))},
+                "$unset": {"test_cases": ""},
+            },
+        } for question in documents]
+        operations += [{"op": "delete", "filter": {"_id": question_id}} for question_id in deleted_ids]
+        if operations:
+            self.db.bulk(DETAIL_DATABASE, DETAIL_COLLECTION, operations, ordered=False)
+
+    async def on_change(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        """
+        change feed 的訂閱者 (account.user 與 question.question)，更新可重複套用
+        """
+        await run_in_threadpool(self.apply_change, collection_name, documents, deleted_ids)
+
+    async def resync(self, db) -> None:
+        """
+        遺漏的變更無法得知影響哪些題目: 清除讀取模型，之後讀取時重新建立
+        """
+        removed = await run_in_threadpool(self.db.delete_datas, DETAIL_DATABASE, DETAIL_COLLECTION, {})
+        logger.warning(f"Cleared {removed} question detail read model(s) after change feed resync")
+
+question_details = QuestionDetailService()
@@ -0,0 +1,204 @@
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from api.metrics import current_route, registry
+from config import config
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis 為選用套件，只有 RATE_LIMIT_BACKEND=redis 時需要
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+# 不限制的路徑 (監控與健康檢查)
+EXEMPT_PATHS = {"/", "/metrics", "/ready"}
+# 已驗證的 (token, claims) 存放在 scope["state"] 的鍵，get_current_user 直接使用不再驗證
+TOKEN_CLAIMS_STATE = "token_claims"
+
+class RateLimitBackend:
+    """
+    token bucket 的儲存後端介面
+    """
+    async def acquire(self, key: str, rate: float, burst: int, cost: float = 1) -> Tuple[bool, float]:
+        """
+        從 key 的 bucket 取出 cost 個 token
+
+        Args:
+            key: bucket 的鍵
+            rate: 每秒補充的 token 數
+            burst: bucket 容量
+            cost: 此次請求消耗的 token 數
+
+        Returns:
+            (是否允許, 剩餘 token 數)
+        """
+        raise NotImplementedError
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, max_keys: int = 100000):
+        """
+        單一 process 內的 token bucket，只在 event loop 中使用因此不需要鎖
+
+        bucket 數量超過 max_keys 時移除最久未使用者 (等同將其重設為滿的 bucket)
+
+        Args:
+            max_keys: 最多保存的 bucket 數
+        """
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int, cost: float = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+# 以伺服器時間計算，多台 API 節點的時鐘誤差不影響結果
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+class RedisRateLimitBackend(RateLimitBackend):
+    def __init__(self, url: str, prefix: str = "codingweb:ratelimit:"):
+        """
+        Redis 相容伺服器上的共享 token bucket，多個 uvicorn worker 與節點共用同一個額度
+
+        以 Lua script 在伺服器端原子性地補充與扣除 token，bucket 補滿後自動過期
+
+        Args:
+            url: 連線字串，例如 redis://localhost:6379/0
+            prefix: 鍵的前綴
+        """
+        if redis_asyncio is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._client = redis_asyncio.Redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._prefix = prefix
+
+    async def acquire(self, key: str, rate: float, burst: int, cost: float = 1) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[self._prefix + key], args=[rate, burst, cost])
+        return bool(allowed), float(tokens)
+
+def build_rate_limit_backend() -> Optional[RateLimitBackend]:
+    """
+    依照 Config 建立 token bucket 後端，RATE_LIMIT_BACKEND 為 none 時回傳 None
+    """
+    if config.RATE_LIMIT_BACKEND == "memory":
+        return MemoryRateLimitBackend(config.RATE_LIMIT_MAX_KEYS)
+    if config.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(config.RATE_LIMIT_URL)
+    return None
+
+class RateLimitMiddleware:
+    def __init__(self, app, backend: Optional[RateLimitBackend], rate: float, burst: int, token_service=None):
+        """
+        以 token bucket 限制每個使用者 (帶有效 token 時) 或 IP 的請求速率
+
+        超過限制時回傳 429 與 Retry-After，其餘回應加上 X-RateLimit-Limit 與
+        X-RateLimit-Remaining。後端發生錯誤時放行請求。IP 取自 ASGI 的 client，
+        位於反向代理之後時請以 uvicorn --proxy-headers 執行。驗證通過的 token 與 claims
+        存放在 scope["state"]，get_current_user 不需再次驗證
+
+        Args:
+            app: 下一層 ASGI app
+            backend: token bucket 後端，None 代表不限制
+            rate: 每秒補充的 token 數
+            burst: bucket 容量 (允許的瞬間請求數)
+            token_service: 用來辨識使用者的 TokenService
+        """
+        self.app = app
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.token_service = token_service
+
+    def _identity(self, scope) -> str:
+        if self.token_service is not None:
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    if scheme.lower() == "bearer" and token:
+                        # 無效的 token 由路由回應 401，此處以 IP 計算
+                        claims = self.token_service.try_verify(token)
+                        if claims is not None:
+                            scope.setdefault("state", {})[TOKEN_CLAIMS_STATE] = (token, claims)
+                            return f"user:{claims['user_id']}"
+                    break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.backend is None or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            allowed, remaining = await self.backend.acquire(self._identity(scope), self.rate, self.burst)
+        except Exception as e:
+            logger.error(f"Rate limit backend failed, allowing request: {str(e)}")
+            await self.app(scope, receive, send)
+            return
+
+        headers = [
+            (b"x-ratelimit-limit", str(self.burst).encode()),
+            (b"x-ratelimit-remaining", str(int(remaining)).encode()),
+        ]
+        if not allowed:
+            registry.inc(
+                "codingweb_rate_limited_total",
+                "Requests rejected by the rate limiter",
+                {"route": current_route.get()}
+            )
+            retry_after = max(1, math.ceil((1 - remaining) / self.rate))
+            body = json.dumps({"detail": "Too many requests"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", str(retry_after).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def rate_limit_middleware(app, token_service=None) -> RateLimitMiddleware:
+    """
+    依照 Config 建立 RateLimitMiddleware；交給 app.add_middleware 時由 Starlette
+    在建立 middleware stack (第一個請求或 lifespan) 時才呼叫，匯入 app 時不讀取設定
+    """
+    return RateLimitMiddleware(app, build_rate_limit_backend(), config.RATE_LIMIT_RATE, config.RATE_LIMIT_BURST, token_service)
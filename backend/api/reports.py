@@ -0,0 +1,217 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Dict, List, Tuple
+from api.async_mongodb import async_mongodb
+from api.auth import token_service
+from map import DATABASE, COLLECTION, ModerationAction, ReportStatus, ReportTarget, UserRole, UserStatus
+
+logger = logging.getLogger(__name__)
+
+REPORT_DATABASE = DATABASE.REPORT.value
+REPORT_COLLECTION = COLLECTION.REPORT.value
+# 檢舉目標所在的集合與作者欄位 (封鎖時封鎖該使用者)
+TARGETS: Dict[str, Tuple[str, str, str]] = {
+    ReportTarget.QUESTION.value: (DATABASE.QUESTION.value, COLLECTION.QUESTION.value, "author_id"),
+    ReportTarget.ANSWER.value: (DATABASE.ANSWER.value, COLLECTION.ANSWER.value, "author_id"),
+    ReportTarget.REVIEW.value: (DATABASE.REVIEW.value, COLLECTION.REVIEW.value, "reviewer_id"),
+    ReportTarget.USER.value: (DATABASE.ACCOUNT.value, COLLECTION.USER.value, "_id"),
+}
+# 每個原因的權重，與檢舉者的權重相乘後累加到 weight，審核佇列依 weight 排序
+REASON_WEIGHTS = {"abuse": 3, "plagiarism": 2, "inappropriate": 2, "spam": 1, "other": 1}
+STAFF_REPORT_WEIGHT = 5
+# 每份合併的檢舉保留最近的附註數量
+MAX_REPORT_COMMENTS = 20
+ACTION_STATUS = {
+    ModerationAction.DISMISS.value: ReportStatus.DISMISSED.value,
+    ModerationAction.RESOLVE.value: ReportStatus.RESOLVED.value,
+    ModerationAction.BAN.value: ReportStatus.RESOLVED.value,
+}
+
+class ReportTriage:
+    def __init__(self, db=async_mongodb):
+        """
+        檢舉的收件與審核
+
+        同一目標與原因的待處理檢舉合併為一份文件 (唯一的 partial index 保證)，
+        新的檢舉以 upsert 累加 count 與 weight；同一位使用者重複檢舉不會重複計算
+
+        Args:
+            db: AsyncMongoDB 實例
+        """
+        self.db = db
+
+    async def target_exists(self, target_type: str, target_id: str) -> bool:
+        database_name, collection_name, _ = TARGETS[target_type]
+        return await self.db.count_documents(database_name, collection_name, {"_id": target_id}) > 0
+
+    async def submit(self, target_type: str, target_id: str, reason: str, reporter: Dict[str, Any],
+            comment: str = ""
+        ) -> Tuple[Dict[str, Any], bool]:
+        """
+        記錄一筆檢舉，合併到同一目標與原因的待處理檢舉
+
+        Args:
+            target_type: 目標類型 (ReportTarget)
+            target_id: 目標 ID
+            reason: 原因 (ReportReason)
+            reporter: get_current_user 回傳的使用者資訊
+            comment: 附註，可選
+
+        Returns:
+            (合併後的檢舉 {"_id", "count", "weight"}, 是否為此使用者的重複檢舉)
+        """
+        reporter_id = reporter["user_id"]
+        weight = REASON_WEIGHTS.get(reason, 1)
+        if reporter["role"] in (UserRole.ADMIN.value, UserRole.STAFF.value):
+            weight *= STAFF_REPORT_WEIGHT
+        now = datetime.utcnow()
+        key = {"target_type": target_type, "target_id": target_id, "reason": reason, "status": ReportStatus.PENDING.value}
+        update = {
+            "$inc": {"count": 1, "weight": weight},
+            "$addToSet": {"reporters": reporter_id},
+            "$set": {"last_reported_at": now, "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        }
+        if comment:
+            update["$push"] = {"comments": {
+                "$each": [{"reporter_id": reporter_id, "comment": comment, "created_at": now}],
+                "$slice": -MAX_REPORT_COMMENTS
+            }}
+
+        # 第一次 upsert 可能與同時進行的檢舉競爭插入，重試時會更新對方插入的文件
+        for _ in range(2):
+            try:
+                report = await self.db.find_one_and_update(
+                    REPORT_DATABASE,
+                    REPORT_COLLECTION,
+                    {**key, "reporters": {"$ne": reporter_id}},
+                    update,
+                    projection={"count": 1, "weight": 1},
+                    upsert=True
+                )
+                return report, False
+            except DuplicateKeyError:
+                existing = await self.db.get_data(
+                    REPORT_DATABASE,
+                    REPORT_COLLECTION,
+                    {**key, "reporters": reporter_id},
+                    projection={"count": 1, "weight": 1},
+                    limit=1
+                )
+                if existing:
+                    return existing[0], True
+        raise Exception(f"Could not record report for {target_type} {target_id}")
+
+    async def _authors(self, targets: Dict[str, List[str]]) -> List[str]:
+        """
+        依目標類型批次查詢作者，每種類型一次查詢
+        """
+        authors = set()
+        for target_type, target_ids in targets.items():
+            database_name, collection_name, field = TARGETS[target_type]
+            if field == "_id":
+                authors.update(target_ids)
+                continue
+            documents = await self.db.get_data(
+                database_name,
+                collection_name,
+                {"_id": {"$in": self.db._object_ids(target_ids)}},
+                projection={field: 1}
+            )
+            authors.update(document[field] for document in documents if document.get(field))
+        return sorted(authors)
+
+    async def moderate(self, decisions: List[Tuple[str, str]], moderator: Dict[str, Any], note: str = "") -> Dict[str, Any]:
+        """
+        批次處理審核決定
+
+        resolve 與 ban 會一併結案同一目標的其他待處理檢舉 (不同原因)；ban 另外封鎖目標的作者
+        (只封鎖一般使用者)。檢舉以一次 bulk、使用者以一次 update_many 更新，不逐筆寫入
+
+        Args:
+            decisions: (檢舉 ID, ModerationAction) 列表
+            moderator: get_current_user 回傳的使用者資訊
+            note: 處理說明，可選
+
+        Returns:
+            {"reports_updated", "users_banned", "target_user_ids" (被封鎖並撤銷 token 的目標作者，不含管理者與職員), "not_found"}
+        """
+        actions = {report_id: action for report_id, action in decisions}
+        reports = await self.db.get_data(
+            REPORT_DATABASE,
+            REPORT_COLLECTION,
+            {"_id": {"$in": self.db._object_ids(list(actions))}, "status": ReportStatus.PENDING.value},
+            projection={"target_type": 1, "target_id": 1}
+        )
+        found = {report["_id"] for report in reports}
+
+        # 每種處理方式一個 update 操作: 選取的檢舉，以及 resolve/ban 時同一目標的其他待處理檢舉
+        report_ids: Dict[str, List[str]] = defaultdict(list)
+        targets: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+        for report in reports:
+            action = actions[report["_id"]]
+            report_ids[action].append(report["_id"])
+            if action != ModerationAction.DISMISS.value:
+                targets[action][report["target_type"]].append(report["target_id"])
+
+        now = datetime.utcnow()
+        operations = []
+        # ban 與 resolve 的連帶結案優先於同一目標上的 dismiss
+        for action in (ModerationAction.BAN.value, ModerationAction.RESOLVE.value, ModerationAction.DISMISS.value):
+            ids = report_ids.get(action)
+            if not ids:
+                continue
+            matches = [{"_id": {"$in": self.db._object_ids(ids)}}] + [
+                {"target_type": target_type, "target_id": {"$in": target_ids}}
+                for target_type, target_ids in targets[action].items()
+            ]
+            operations.append({
+                "op": "update",
+                "filter": {"status": ReportStatus.PENDING.value, "$or": matches},
+                "update": {
+                    "status": ACTION_STATUS[action],
+                    "resolution": action,
+                    "resolved_by": moderator["user_id"],
+                    "resolution_note": note,
+                    "resolved_at": now,
+                    "updated_at": now,
+                },
+                "multi": True,
+            })
+        summary = {"modified_count": 0}
+        if operations:
+            summary = await self.db.bulk(REPORT_DATABASE, REPORT_COLLECTION, operations)
+
+        banned = []
+        if targets[ModerationAction.BAN.value]:
+            banned = await self._authors(targets[ModerationAction.BAN.value])
+        users_banned = 0
+        if banned:
+            # 管理者與職員不會被封鎖
+            banned = [user["_id"] for user in await self.db.get_data(
+                DATABASE.ACCOUNT.value,
+                COLLECTION.USER.value,
+                {"_id": {"$in": self.db._object_ids(banned)}, "role": UserRole.USER.value},
+                projection={"_id": 1}
+            )]
+        if banned:
+            users_banned = await self.db.update_datas(
+                DATABASE.ACCOUNT.value,
+                COLLECTION.USER.value,
+                {"_id": {"$in": self.db._object_ids(banned)}, "status": {"$ne": UserStatus.BANNED.value}},
+                {"status": UserStatus.BANNED.value, "banned_at": now, "updated_at": now}
+            )
+            # token 驗證不查詢使用者狀態，撤銷已簽發的 token 才能立即生效
+            await token_service.revoke_users(banned)
+            logger.warning(f"Moderator {moderator['user_id']} banned {users_banned} user(s): {', '.join(banned)}")
+
+        return {
+            "reports_updated": summary["modified_count"],
+            "users_banned": users_banned,
+            "target_user_ids": banned,
+            "not_found": [report_id for report_id in actions if report_id not in found],
+        }
+
+report_triage = ReportTriage()
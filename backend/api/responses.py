@@ -0,0 +1,38 @@
+import orjson
+from bson import ObjectId, Decimal128
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Any, Dict, Type
+
+def bson_default(value: Any) -> Any:
+    """
+    orjson 無法直接編碼的 BSON 型別；datetime 由 orjson 原生處理 (ISO 8601，與 jsonable_encoder 相同)
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """
+    將查詢結果 (可含 ObjectId、datetime) 編碼為 UTF-8 JSON
+    """
+    return orjson.dumps(content, default=bson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class BSONJSONResponse(JSONResponse):
+    """
+    以 orjson 編碼並直接處理 ObjectId 的 JSON 回應
+
+    路由直接回傳此回應時 FastAPI 會略過 jsonable_encoder 與 response_model 的驗證，
+    查詢結果不需要先把 _id 轉為字串 (以 convert_id=False 查詢)；
+    response_model 仍可宣告以產生 OpenAPI 文件
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def projection_for(model: Type[BaseModel]) -> Dict[str, int]:
+    """
+    依回應模型的欄位建立 MongoDB 投影，只讀取回應中會出現的欄位
+    """
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
@@ -0,0 +1,319 @@
+import bisect
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from config import config
+from map import DATABASE, COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# 中文、日文假名與韓文字元：沒有空白分詞，以 n-gram 切分
+CJK_CHARACTERS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+CJK_PATTERN = re.compile(f"[{CJK_CHARACTERS}]")
+TOKEN_PATTERN = re.compile(f"[{CJK_CHARACTERS}]+|[^\\W{CJK_CHARACTERS}]+")
+
+# 各欄位的權重 (BM25F 的簡化：以加權後的詞頻與文件長度計算)
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "description": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 前綴查詢最多展開的詞數
+MAX_PREFIX_EXPANSION = 50
+SNAPSHOT_VERSION = 1
+
+def tokenize(text: str, for_query: bool = False) -> List[str]:
+    """
+    將文字切分為索引詞
+
+    英文與數字以單字為單位 (NFKC 正規化後轉小寫)；CJK 文字在索引時同時產生
+    單字 (unigram) 與雙字 (bigram)，查詢時只使用 bigram 以提高精確度，
+    單一字元的查詢則使用 unigram
+
+    Args:
+        text: 文字
+        for_query: 是否為查詢字串
+
+    Returns:
+        索引詞列表
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(unicodedata.normalize("NFKC", text).lower()):
+        run = match.group()
+        if not CJK_PATTERN.match(run):
+            tokens.append(run)
+            continue
+        bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+        if for_query:
+            tokens.extend(bigrams or [run])
+        else:
+            tokens.extend(run)
+            tokens.extend(bigrams)
+    return tokens
+
+class SearchIndex:
+    def __init__(self, database_name: str = DATABASE.QUESTION.value, collection_name: str = COLLECTION.QUESTION.value):
+        """
+        題目的記憶體內反向索引，以 BM25 排序
+
+        透過 MongoDB 存取層的寫入監聽器 (add_listener) 即時更新，
+        並可儲存快照讓新的 worker 不必重新讀取與切分所有題目
+
+        Args:
+            database_name: 資料庫名稱
+            collection_name: 集合名稱
+        """
+        self.database_name = database_name
+        self.collection_name = collection_name
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        # 詞 -> {文件 ID: 加權詞頻}
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # 文件 ID -> {詞: 加權詞頻}，刪除或更新文件時使用
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_length: Dict[str, float] = {}
+        self._total_length = 0.0
+        # 文件 ID -> 搜尋結果中回傳的欄位
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        # 文件 ID -> updated_at，與資料庫比對是否需要重新索引
+        self._versions: Dict[str, Optional[datetime]] = {}
+        # 排序後的所有詞，供前綴查詢；詞彙變動後在下次前綴查詢時重建
+        self._terms: List[str] = []
+        self._terms_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, document: Dict[str, Any]) -> None:
+        """
+        新增或更新一個文件
+        """
+        doc_id = str(document["_id"])
+        weights: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            value = document.get(field) or ""
+            text = " ".join(value) if isinstance(value, list) else str(value)
+            for token in tokenize(text):
+                weights[token] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            self._insert(doc_id, dict(weights))
+            self._docs[doc_id] = {"_id": doc_id, "title": document.get("title", ""), "tags": document.get("tags", [])}
+            self._versions[doc_id] = document.get("updated_at") or document.get("created_at")
+
+    def _insert(self, doc_id: str, weights: Dict[str, float]) -> None:
+        for term, weight in weights.items():
+            postings = self._postings[term]
+            if not postings:
+                self._terms_dirty = True
+            postings[doc_id] = weight
+        self._doc_terms[doc_id] = weights
+        length = sum(weights.values())
+        self._doc_length[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        """
+        移除一個文件
+        """
+        with self._lock:
+            self._remove(str(doc_id))
+            self._docs.pop(str(doc_id), None)
+            self._versions.pop(str(doc_id), None)
+
+    def _remove(self, doc_id: str) -> None:
+        weights = self._doc_terms.pop(doc_id, None)
+        if weights is None:
+            return
+        for term in weights:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                self._terms_dirty = True
+        self._total_length -= self._doc_length.pop(doc_id)
+
+    def on_change(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        """
+        MongoDB 存取層的寫入監聽器，也作為 change feed 的訂閱者接收其他 process 的寫入
+        """
+        for document in documents:
+            self.add(document)
+        for doc_id in deleted_ids:
+            self.remove(doc_id)
+
+    async def resync(self, db) -> None:
+        """
+        change feed 無法續傳時重新比對資料庫
+        """
+        await self.sync(db)
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """
+        以 prefix 開頭、文件數最多的詞
+        """
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        start = bisect.bisect_left(self._terms, prefix)
+        end = bisect.bisect_left(self._terms, prefix + "\U0010ffff")
+        candidates = self._terms[start:end]
+        if len(candidates) > MAX_PREFIX_EXPANSION:
+            candidates = heapq.nlargest(MAX_PREFIX_EXPANSION, candidates, key=lambda term: len(self._postings[term]))
+        return candidates
+
+    def _score(self, terms: List[str]) -> Dict[str, float]:
+        count = len(self._doc_terms)
+        if not count:
+            return {}
+        average_length = self._total_length / count
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_length[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, offset: int = 0, limit: int = 20, prefix: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        以 BM25 排序搜尋
+
+        Args:
+            query: 查詢字串
+            offset: 略過的結果數
+            limit: 回傳的結果數
+            prefix: 最後一個詞是否視為前綴 (邊輸入邊搜尋)
+
+        Returns:
+            (結果列表 [{"_id", "title", "tags", "score"}], 符合的文件總數)
+        """
+        tokens = tokenize(query, for_query=True)
+        if not tokens:
+            return [], 0
+        with self._lock:
+            terms = tokens
+            if prefix:
+                terms = tokens[:-1] + (self._expand_prefix(tokens[-1]) or [tokens[-1]])
+            scores = self._score(terms)
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))[offset:]
+            results = [{**self._docs[doc_id], "score": round(score, 4)} for doc_id, score in top]
+        return results, len(scores)
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        邊輸入邊提示：回傳最相關的題目標題
+        """
+        results, _ = self.search(prefix, limit=limit, prefix=True)
+        return [{"_id": result["_id"], "title": result["title"]} for result in results]
+
+    def save(self, path: str) -> None:
+        """
+        將索引寫入快照檔 (先寫暫存檔再取代，避免其他 worker 讀到不完整的檔案)
+        """
+        with self._lock:
+            snapshot = {
+                "version": SNAPSHOT_VERSION,
+                "doc_terms": self._doc_terms,
+                "docs": self._docs,
+                "versions": self._versions,
+            }
+            data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def load(self, path: str) -> bool:
+        """
+        從快照檔載入索引，檔案不存在或版本不符時回傳 False
+        """
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return False
+        with self._lock:
+            self._clear()
+            for doc_id, weights in snapshot["doc_terms"].items():
+                self._insert(doc_id, weights)
+            self._docs = snapshot["docs"]
+            self._versions = snapshot["versions"]
+        return True
+
+    async def sync(self, db, batch_size: int = 500) -> Dict[str, int]:
+        """
+        與資料庫比對並補上快照之後的變更：只讀取 _id 與 updated_at，
+        重新索引新增或較新的文件，移除已不存在的文件
+
+        Args:
+            db: AsyncMongoDB 實例
+
+        Returns:
+            {"indexed": 重新索引數, "removed": 移除數}
+        """
+        stale = []
+        seen = set()
+        async for document in db.iter_data(
+            self.database_name,
+            self.collection_name,
+            projection={"_id": 1, "updated_at": 1, "created_at": 1},
+            batch_size=1000
+        ):
+            doc_id = document["_id"]
+            seen.add(doc_id)
+            version = document.get("updated_at") or document.get("created_at")
+            if doc_id not in self._versions or (version is not None and version != self._versions[doc_id]):
+                stale.append(doc_id)
+
+        for start in range(0, len(stale), batch_size):
+            documents = await db.get_data(
+                self.database_name,
+                self.collection_name,
+                {"_id": {"$in": db._object_ids(stale[start:start + batch_size])}},
+                projection={"title": 1, "description": 1, "tags": 1, "updated_at": 1, "created_at": 1}
+            )
+            for document in documents:
+                self.add(document)
+
+        removed = [doc_id for doc_id in list(self._versions) if doc_id not in seen]
+        for doc_id in removed:
+            self.remove(doc_id)
+        return {"indexed": len(stale), "removed": len(removed)}
+
+    async def start(self, db, snapshot_path: str = None) -> None:
+        """
+        啟動時載入快照、補上之後的變更並開始接收寫入通知
+        """
+        snapshot_path = snapshot_path or config.SEARCH_SNAPSHOT_PATH
+        loaded = bool(snapshot_path) and self.load(snapshot_path)
+        db.add_listener(self.database_name, self.collection_name, self)
+        report = await self.sync(db)
+        logger.info(
+            f"Search index ready: {len(self)} documents "
+            f"({'snapshot' if loaded else 'no snapshot'}, {report['indexed']} indexed, {report['removed']} removed)"
+        )
+
+    def stop(self, snapshot_path: str = None) -> None:
+        snapshot_path = snapshot_path or config.SEARCH_SNAPSHOT_PATH
+        if snapshot_path:
+            try:
+                self.save(snapshot_path)
+            except OSError as e:
+                logger.error(f"Failed to save search snapshot: {str(e)}")
+
+search_index = SearchIndex()
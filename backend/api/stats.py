@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sortedcontainers import SortedList
+from api.mongodb import mongodb
+from map import DATABASE, COLLECTION, Verdict
+
+logger = logging.getLogger(__name__)
+
+STATS_DATABASE = DATABASE.STATS.value
+QUESTION_STATS = COLLECTION.QUESTION_STATS.value
+USER_STATS = COLLECTION.USER_STATS.value
+FINAL_VERDICTS = [verdict.value for verdict in Verdict if verdict != Verdict.PENDING]
+# 同步排行榜時往前重疊的時間
+LEADERBOARD_SYNC_OVERLAP = timedelta(seconds=5)
+
+def acceptance_rate(stats: Dict[str, Any]) -> float:
+    attempts = stats.get("attempts", 0)
+    return round(stats.get("accepted", 0) / attempts, 4) if attempts else 0.0
+
+class StatsService:
+    def __init__(self, db=mongodb):
+        """
+        題目與使用者統計的增量維護
+
+        每份答案以 stats_verdict 欄位記錄已計入統計的評測結果，更新時以
+        find_one_and_update 原子性地交換，因此重試的工作或重新評測不會重複計算；
+        執行中斷造成的誤差可用 python manage.py rebuild-stats 修正
+
+        Args:
+            db: MongoDB 實例
+        """
+        self.db = db
+
+    def record_verdict(self, answer_id: str, verdict: str) -> None:
+        """
+        答案得到最終評測結果 (或重新評測改變結果) 後更新統計
+
+        Args:
+            answer_id: 答案 ID
+            verdict: 新的評測結果
+        """
+        if verdict not in FINAL_VERDICTS:
+            return
+        answer = self.db.find_one_and_update(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            {"_id": answer_id, "stats_verdict": {"$ne": verdict}},
+            {"stats_verdict": verdict},
+            projection={"question_id": 1, "author_id": 1, "stats_verdict": 1},
+            return_new=False
+        )
+        if answer is None:
+            # 已計入相同的結果
+            return
+
+        previous = answer.get("stats_verdict")
+        question_id = answer["question_id"]
+        user_id = answer.get("author_id")
+        accepted = int(verdict == Verdict.ACCEPTED.value) - int(previous == Verdict.ACCEPTED.value)
+        now = datetime.utcnow()
+
+        question_inc = {f"verdicts.{verdict}": 1, "accepted": accepted}
+        user_inc = {"accepted": accepted}
+        if previous is None:
+            question_inc["attempts"] = 1
+            user_inc["attempts"] = 1
+        else:
+            question_inc[f"verdicts.{previous}"] = -1
+        self._inc(QUESTION_STATS, question_id, question_inc, now)
+        if user_id is None:
+            return
+        self._inc(USER_STATS, user_id, user_inc, now)
+
+        if verdict == Verdict.ACCEPTED.value:
+            added = self.db.update_data(
+                STATS_DATABASE,
+                USER_STATS,
+                {"_id": user_id, "solved": {"$ne": question_id}},
+                {"$push": {"solved": question_id}, "$inc": {"solved_count": 1},
+                 "$set": {"last_solved_at": now, "updated_at": now}}
+            )
+            if added:
+                self._inc(QUESTION_STATS, question_id, {"solvers": 1}, now)
+        elif previous == Verdict.ACCEPTED.value:
+            # 重新評測後不再通過：使用者沒有其他通過的答案時才移出已解題目
+            remaining = self.db.count_documents(
+                DATABASE.ANSWER.value,
+                COLLECTION.ANSWER.value,
+                {"question_id": question_id, "author_id": user_id, "stats_verdict": Verdict.ACCEPTED.value}
+            )
+            if remaining:
+                return
+            removed = self.db.update_data(
+                STATS_DATABASE,
+                USER_STATS,
+                {"_id": user_id, "solved": question_id},
+                {"$pull": {"solved": question_id}, "$inc": {"solved_count": -1}, "$set": {"updated_at": now}}
+            )
+            if removed:
+                self._inc(QUESTION_STATS, question_id, {"solvers": -1}, now)
+
+    def record_review(self, review: Dict[str, Any], answer: Dict[str, Any]) -> None:
+        """
+        新增評論後更新統計
+
+        Args:
+            review: 含 rating、reviewer_id 的評論
+            answer: 被評論的答案，含 question_id、author_id
+        """
+        now = datetime.utcnow()
+        rating = review.get("rating", 0)
+        self._inc(QUESTION_STATS, answer["question_id"], {"review_count": 1, "rating_sum": rating}, now)
+        if answer.get("author_id"):
+            self._inc(USER_STATS, answer["author_id"], {"reviews_received": 1, "rating_received_sum": rating}, now)
+        if review.get("reviewer_id"):
+            self._inc(USER_STATS, review["reviewer_id"], {"reviews_given": 1}, now)
+
+    def _inc(self, collection_name: str, _id: str, increments: Dict[str, int], now: datetime) -> None:
+        increments = {field: value for field, value in increments.items() if value}
+        if not increments:
+            return
+        self.db.update_data(
+            STATS_DATABASE,
+            collection_name,
+            {"_id": _id},
+            {"$inc": increments, "$set": {"updated_at": now}},
+            upsert=True
+        )
+
+class Leaderboard:
+    def __init__(self):
+        """
+        記憶體內依解題數排序的排行榜
+
+        以 (-解題數, 最後解題時間, 使用者 ID) 排序的 SortedList，更新與名次查詢皆為 O(log n)；
+        同解題數的使用者名次相同 (1, 2, 2, 4)，列表中先達到該解題數者在前
+        """
+        self._keys: "SortedList[Tuple[int, float, str]]" = SortedList()
+        self._entries: Dict[str, Tuple[int, float, str]] = {}
+        self._lock = threading.Lock()
+        self._synced_at: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, user_id: str, solved_count: int, last_solved_at: Optional[datetime] = None) -> None:
+        timestamp = last_solved_at.replace(tzinfo=timezone.utc).timestamp() if last_solved_at else 0.0
+        key = (-solved_count, timestamp, user_id)
+        with self._lock:
+            self._discard(user_id)
+            if solved_count > 0:
+                self._keys.add(key)
+                self._entries[user_id] = key
+
+    def _discard(self, user_id: str) -> None:
+        key = self._entries.pop(user_id, None)
+        if key is not None:
+            self._keys.remove(key)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """
+        使用者的名次，沒有解題的使用者回傳 None
+        """
+        with self._lock:
+            key = self._entries.get(user_id)
+            if key is None:
+                return None
+            return self._keys.bisect_left((key[0],)) + 1
+
+    def page(self, offset: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"rank": self._keys.bisect_left((key[0],)) + 1, "user_id": key[2], "solved_count": -key[0]}
+                for key in self._keys.islice(offset, offset + limit)
+            ]
+
+    async def refresh(self, db) -> int:
+        """
+        從 user_stats 載入上次同步之後變更的使用者 (第一次呼叫時載入全部)
+
+        Args:
+            db: AsyncMongoDB 實例
+
+        Returns:
+            更新的使用者數
+        """
+        now = datetime.utcnow()
+        conditions = {}
+        if self._synced_at is not None:
+            # 與上次同步重疊，容許寫入端與本機時鐘的誤差
+            conditions["updated_at__gte"] = self._synced_at - LEADERBOARD_SYNC_OVERLAP
+        self._synced_at = now
+        count = 0
+        async for stats in db.iter_data(
+            STATS_DATABASE,
+            USER_STATS,
+            projection={"solved_count": 1, "last_solved_at": 1},
+            batch_size=1000,
+            **conditions
+        ):
+            self.update(stats["_id"], stats.get("solved_count", 0), stats.get("last_solved_at"))
+            count += 1
+        return count
+
+    def on_change(self, database_name: str, collection_name: str, documents: List[Dict[str, Any]], deleted_ids: List[str]) -> None:
+        """
+        change feed 的訂閱者：worker 寫入 user_stats 後更新名次
+        """
+        for stats in documents:
+            self.update(stats["_id"], stats.get("solved_count", 0), stats.get("last_solved_at"))
+        for user_id in deleted_ids:
+            self.update(user_id, 0)
+
+    async def resync(self, db) -> None:
+        self._synced_at = None
+        await self.refresh(db)
+
+    async def run_refresh(self, db, interval: float) -> None:
+        """
+        沒有 change feed 時定期同步 worker 寫入的統計，由 app 的 lifespan 啟動
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh(db)
+            except Exception as e:
+                logger.error(f"Failed to refresh leaderboard: {str(e)}")
+
+stats_service = StatsService()
+leaderboard = Leaderboard()
@@ -0,0 +1,47 @@
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Any, Tuple
+from api.responses import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def ndjson_response(documents: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """
+    將文件串流包裝為 NDJSON (每行一個 JSON 物件) 回應
+
+    Args:
+        documents: 文件的非同步迭代器，例如 async_mongodb.iter_data(...)
+
+    Returns:
+        StreamingResponse
+    """
+    async def encode():
+        async for doc in documents:
+            yield dumps(doc) + b"\n"
+
+    return StreamingResponse(encode(), media_type=NDJSON_MEDIA_TYPE)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+def sse_response(events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """
+    將事件串流包裝為 Server-Sent Events 回應
+
+    Args:
+        events: (事件名稱, 資料) 的非同步迭代器，事件名稱為 None 時送出註解 (保持連線)
+
+    Returns:
+        StreamingResponse
+    """
+    async def encode():
+        async for event, data in events:
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+    return StreamingResponse(
+        encode(),
+        media_type=SSE_MEDIA_TYPE,
+        # 避免反向代理緩衝事件
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,240 @@
+import ast
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from api.metrics import registry
+from config import config
+from map import Verdict
+
+# 可以重用的最終評測結果
+REUSABLE_VERDICTS = [verdict.value for verdict in Verdict if verdict != Verdict.PENDING]
+REUSE_PROJECTION = {"verdict": 1, "judge": 1}
+# 無法解析或編譯的原始碼: 語法錯誤、空字元，以及巢狀過深或過長的運算式造成的遞迴與記憶體錯誤
+UNCOMPILABLE_ERRORS = (SyntaxError, ValueError, RecursionError, MemoryError)
+
+def normalize_source(code: str, language: str) -> str:
+    """
+    正規化原始碼，使只有空白、空行或註解不同的提交得到相同結果
+
+    Python 以 ast.dump 正規化 (不含行號)，字串常數等語意內容完全保留；
+    無法解析的程式碼 (必為編譯錯誤) 與其他語言只統一換行並去除行尾空白
+
+    Args:
+        code: 原始碼
+        language: 程式語言
+
+    Returns:
+        正規化後的字串
+    """
+    if language == "python":
+        try:
+            return ast.dump(ast.parse(code))
+        except UNCOMPILABLE_ERRORS:
+            pass
+    lines = code.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+def suite_hash(question: Dict[str, Any]) -> str:
+    """
+    題目中影響評測結果的欄位 (測資、時間與記憶體上限) 的雜湊，即題目的評測版本
+    """
+    suite = {
+        "test_cases": [
+            {"input": case.get("input", ""), "output": case.get("output", "")}
+            for case in question.get("test_cases", [])
+        ],
+        "time_limit": question.get("time_limit", 2.0),
+        "memory_limit": question.get("memory_limit", 256),
+    }
+    return hashlib.sha256(json.dumps(suite, sort_keys=True).encode()).hexdigest()
+
+def submission_hash(question: Dict[str, Any], language: str, code: str, short_circuit: bool = True) -> str:
+    """
+    提交的內容雜湊，雜湊相同的提交評測結果必定相同
+
+    Args:
+        question: 含 _id、test_cases、time_limit、memory_limit 的題目文件
+        language: 程式語言
+        code: 原始碼
+        short_circuit: 是否在第一個失敗的測資後停止 (影響結果中的通過數)
+
+    Returns:
+        十六進位 SHA-256
+    """
+    parts = [
+        str(question["_id"]),
+        suite_hash(question),
+        language,
+        # ast.dump 的格式隨 Python 版本變動
+        f"{sys.version_info.major}.{sys.version_info.minor}",
+        "short_circuit" if short_circuit else "full",
+        normalize_source(code, language),
+    ]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+def reusable_filter(digest: str) -> Dict[str, Any]:
+    """
+    查詢具有相同雜湊且已評測完成的答案
+    """
+    return {"submission_hash": digest, "verdict": {"$in": REUSABLE_VERDICTS}}
+
+def reused_result(judge_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    從另一份相同提交的評測結果複製可以重用的部分: 整體結果、通過數/測資數與各測資的結果與時間，
+    不複製程式輸出與錯誤訊息
+
+    Args:
+        judge_result: 另一份答案的 judge 欄位
+
+    Returns:
+        新答案的 judge 欄位
+    """
+    return {
+        "verdict": judge_result["verdict"],
+        "passed": judge_result["passed"],
+        "total": judge_result["total"],
+        "time": judge_result.get("time", 0),
+        "results": [
+            {"verdict": result["verdict"], "time": result.get("time", 0)} if result else None
+            for result in judge_result.get("results", [])
+        ],
+    }
+
+def record_reuse(source: str, hit: bool) -> None:
+    registry.inc(
+        "codingweb_judge_reuse_total",
+        "Submissions answered from a stored verdict with the same content hash",
+        {"source": source, "result": "hit" if hit else "miss"}
+    )
+
+def compile_python(code: str) -> bytes:
+    """
+    將原始碼編譯為可直接以 python 執行的 .pyc 內容
+
+    Raises:
+        UNCOMPILABLE_ERRORS: 原始碼無法編譯
+    """
+    code_object = compile(code, "solution.py", "exec")
+    # PEP 552 標頭: magic、flags、mtime、原始碼大小；直接執行 .pyc 時只檢查 magic
+    header = importlib.util.MAGIC_NUMBER + (0).to_bytes(4, "little") * 2 + len(code.encode()).to_bytes(4, "little")
+    return header + marshal.dumps(code_object)
+
+class ArtifactCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        以原始碼雜湊為鍵、存放在磁碟上的編譯結果快取
+
+        總大小超過 max_bytes 時淘汰最久未使用的檔案。多個 worker process
+        可共用同一個目錄：寫入使用暫存檔 + rename，讀取失敗視為未命中，
+        每個 process 只依自己看到的檔案估算總大小。
+        目錄在第一次讀寫時才建立並載入，匯入模組時不需要完整的環境
+
+        Args:
+            directory: 快取目錄，None 代表 JUDGE_ARTIFACT_DIR
+            max_bytes: 總大小上限，None 代表 JUDGE_ARTIFACT_MAX_BYTES
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self._directory is None:
+                self._directory = config.JUDGE_ARTIFACT_DIR
+            if self._max_bytes is None:
+                self._max_bytes = config.JUDGE_ARTIFACT_MAX_BYTES
+            # 只有 worker 的使用者可以存取，評測中的提交程式無法讀取或覆寫其他人的編譯結果
+            os.makedirs(self._directory, mode=0o700, exist_ok=True)
+            os.chmod(self._directory, 0o700)
+            self._load()
+            self._loaded = True
+
+    def _load(self) -> None:
+        files = []
+        for name in os.listdir(self._directory):
+            path = os.path.join(self._directory, name)
+            if name.endswith(".pyc") and os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+
+    @staticmethod
+    def key(code: str, language: str) -> str:
+        """
+        快取鍵使用原始碼本身 (而非正規化結果)，以保留錯誤訊息中的行號
+        """
+        tag = importlib.util.MAGIC_NUMBER.hex()
+        return hashlib.sha256(f"{language}\0{tag}\0{code}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        self._ensure_loaded()
+        name = f"{key}.pyc"
+        path = os.path.join(self._directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self._record("miss")
+            return None
+        with self._lock:
+            if name not in self._entries:
+                self._bytes += len(data)
+            self._entries[name] = len(data)
+            self._entries.move_to_end(name)
+        self._record("hit")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self._ensure_loaded()
+        if len(data) > self._max_bytes:
+            return
+        name = f"{key}.pyc"
+        temporary = os.path.join(self._directory, f".{name}.{uuid.uuid4().hex}")
+        try:
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, os.path.join(self._directory, name))
+        except OSError:
+            return
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            evicted: List[str] = []
+            while self._bytes > self._max_bytes:
+                oldest, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                evicted.append(oldest)
+            total = self._bytes
+        for oldest in evicted:
+            try:
+                os.remove(os.path.join(self._directory, oldest))
+            except OSError:
+                pass
+        if evicted:
+            self._record("eviction", len(evicted))
+        registry.set("codingweb_judge_artifact_cache_bytes", "Size of cached bytecode artifacts", {}, total)
+
+    def _record(self, result: str, count: int = 1) -> None:
+        registry.inc(
+            "codingweb_judge_artifact_cache_total",
+            "Bytecode artifact cache lookups and evictions",
+            {"result": result},
+            count
+        )
@@ -1,9 +1,113 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import account, question
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from api.activity import activity_log
+from api.async_mongodb import async_mongodb
+from api.auth import token_service
+from api.cache import build_cache
+from api.changefeed import CacheInvalidator, change_feed, WATCHED_NAMESPACES, install_change_log
+from api.coalescing import coalescing_middleware
+from api.indexes import sync_indexes
+from api.metrics import MetricsMiddleware, registry, render_metrics
+from api.mongodb import mongodb
+from api.password import password_service
+from api.question_detail import question_details
+from api.ratelimit import rate_limit_middleware
+from api.responses import BSONJSONResponse
+from api.search import search_index
+from api.stats import leaderboard
+from config import config
+from map import DATABASE, COLLECTION
+from routers import account, question, answer, review, report, stats
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
+# 每個啟動階段的秒數，輸出到 /metrics 與 /ready
+startup_seconds: Dict[str, float] = {}
+
+async def startup_phase(name: str, awaitable):
+    started_at = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        startup_seconds[name] = round(time.perf_counter() - started_at, 4)
+        registry.set("codingweb_startup_seconds", "Seconds spent in each startup phase", {"phase": name}, startup_seconds[name])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started_at = time.perf_counter()
+    # Clients are created lazily; open the pools before the first request instead of during it
+    await asyncio.gather(
+        startup_phase("connect_async", async_mongodb.warm_up()),
+        startup_phase("connect_sync", run_in_threadpool(mongodb.warm_up)),
+    )
+    async_mongodb.enable_cache(build_cache())
+    # Independent warm-up steps run concurrently: declared indexes, the search index,
+    # tokens revoked by other processes and the leaderboard written by the judge workers
+    await asyncio.gather(
+        startup_phase("indexes", sync_indexes(async_mongodb)),
+        startup_phase("search_index", search_index.start(async_mongodb)),
+        startup_phase("revocations", token_service.sync_revocations()),
+        startup_phase("leaderboard", leaderboard.refresh(async_mongodb)),
+    )
+
+    # Deliver writes made by other workers and processes to in-process state
+    cache_invalidator = CacheInvalidator(async_mongodb)
+    for database, collection in WATCHED_NAMESPACES:
+        change_feed.subscribe(database.value, collection.value, cache_invalidator)
+    change_feed.subscribe(DATABASE.QUESTION.value, COLLECTION.QUESTION.value, search_index)
+    # Question edits and user renames reach the question detail read model
+    change_feed.subscribe(DATABASE.QUESTION.value, COLLECTION.QUESTION.value, question_details)
+    change_feed.subscribe(DATABASE.ACCOUNT.value, COLLECTION.USER.value, question_details)
+    change_feed.subscribe(DATABASE.ACCOUNT.value, COLLECTION.REVOKED_TOKEN.value, token_service)
+    change_feed.subscribe(DATABASE.STATS.value, COLLECTION.USER_STATS.value, leaderboard)
+    mode = await startup_phase("change_feed", change_feed.start())
+    # Services that write through the sync client (run in the threadpool) log their changes too
+    install_change_log(mongodb, mode)
+
+    # Activity events are buffered in memory and written in batches
+    polling = [asyncio.create_task(activity_log.run_flush(config.ACTIVITY_FLUSH_INTERVAL))]
+    if mode is None:
+        polling.append(asyncio.create_task(token_service.run_revocation_sync(config.TOKEN_REVOCATION_SYNC_INTERVAL)))
+        polling.append(asyncio.create_task(leaderboard.run_refresh(async_mongodb, config.LEADERBOARD_REFRESH_INTERVAL)))
+    startup_seconds["total"] = round(time.perf_counter() - started_at, 4)
+    registry.set("codingweb_startup_seconds", "Seconds spent in each startup phase", {"phase": "total"}, startup_seconds["total"])
+    logger.info(f"Startup finished in {startup_seconds['total']}s: {startup_seconds}")
+    yield
+
+    # Stop producers first, then release pools and clients
+    for task in polling:
+        task.cancel()
+    await asyncio.gather(*polling, return_exceptions=True)
+    await activity_log.flush()
+    await change_feed.stop()
+    search_index.stop()
+    password_service.shutdown()
+    async_mongodb.close()
+    mongodb.close()
+
+# /ready 等待 MongoDB ping 的秒數
+READY_TIMEOUT = 2
+
+app = FastAPI(lifespan=lifespan, default_response_class=BSONJSONResponse)
+
+# Middleware factories read the config when Starlette builds the stack, not at import
+app.add_middleware(
+    coalescing_middleware,
+    routes=["/question/questions", "/question/{question_id}"],
+    # Coalesced requests skip the handler, so their views are recorded here
+    on_shared={"/question/{question_id}": question.record_shared_view},
+)
+
+app.add_middleware(rate_limit_middleware, token_service=token_service)
+
+# Outside the rate limiter so 429 responses carry CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all origins for now, restrict in production
@@ -12,10 +116,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost: sets the route template used by the middlewares above
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
+
 app.include_router(account.router)
 app.include_router(question.router, prefix='/question')
+app.include_router(answer.router, prefix='/answer')
+app.include_router(review.router, prefix='/review')
+app.include_router(report.router, prefix='/report')
+app.include_router(stats.router, prefix='/stats')
 
 @app.get("/")
 def index():
     # TODO: Handle the root route
-    return {"message": "Welcome to Coding Web"}
\ No newline at end of file
+    return {"message": "Welcome to Coding Web"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics: per-route HTTP latency, MongoDB operation latency and
+    documents returned, connection pool usage and read-through cache hit/miss counts
+    """
+    return PlainTextResponse(
+        render_metrics(async_mongodb.cache),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: MongoDB answers a ping and no connection pool is saturated
+
+    Returns 503 when the ping fails or any pool has at least
+    MONGODB_POOL_SATURATION_THRESHOLD of its connections checked out. The
+    response also lists how long each startup phase took.
+    """
+    try:
+        await asyncio.wait_for(async_mongodb.command("admin", {"ping": 1}), READY_TIMEOUT)
+        database = "ok"
+    except Exception as e:
+        database = f"error: {str(e) or type(e).__name__}"
+    pools = {"async": async_mongodb.pool_monitor.snapshot(), "sync": mongodb.pool_monitor.snapshot()}
+    saturated = [
+        f"{client} {address}"
+        for client, addresses in pools.items()
+        for address, pool in addresses.items()
+        if pool["saturation"] >= config.MONGODB_POOL_SATURATION_THRESHOLD
+    ]
+    ok = database == "ok" and not saturated
+    return BSONJSONResponse(
+        {"status": "ready" if ok else "unavailable", "database": database, "saturated": saturated, "pools": pools,
+         "startup_seconds": startup_seconds},
+        status_code=200 if ok else 503
+    )
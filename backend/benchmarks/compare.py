@@ -0,0 +1,89 @@
+"""
+比較兩份 benchmarks.suite 的 JSON 報告
+
+延遲 (p50/p95/p99) 增加或吞吐量降低超過 --threshold 的情境會標示為退步，
+有任何退步時以狀態碼 1 結束，可用於 CI。
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.compare base.json head.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# (欄位, 數值越大越好)
+METRICS = [("throughput", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)]
+# 樣本太少的情境百分位數不穩定，不判定退步
+MIN_SAMPLES = 50
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+def change(base: float, head: float) -> float:
+    if not base:
+        return 0.0
+    return (head - base) / base
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> Tuple[List[List[str]], List[str]]:
+    """
+    Returns:
+        (表格列, 退步的項目)
+    """
+    rows = []
+    regressions = []
+    names = list(base["scenarios"]) + [name for name in head["scenarios"] if name not in base["scenarios"]]
+    for name in names + ["overall"]:
+        before = base["overall"] if name == "overall" else base["scenarios"].get(name)
+        after = head["overall"] if name == "overall" else head["scenarios"].get(name)
+        if before is None or after is None:
+            rows.append([name, "only in " + ("head" if before is None else "base")] + [""] * (len(METRICS) - 1))
+            continue
+        cells = [name]
+        for metric, higher_is_better in METRICS:
+            delta = change(before[metric], after[metric])
+            worse = -delta if higher_is_better else delta
+            flag = ""
+            if worse > threshold and min(before["count"], after["count"]) >= MIN_SAMPLES:
+                flag = " !"
+                regressions.append(f"{name} {metric} {before[metric]} -> {after[metric]} ({delta:+.1%})")
+            cells.append(f"{before[metric]:.2f} -> {after[metric]:.2f} ({delta:+.1%}){flag}")
+        rows.append(cells)
+    return rows, regressions
+
+def warn_mismatch(base: Dict[str, Any], head: Dict[str, Any]) -> None:
+    """
+    設定不同的兩次執行無法直接比較
+    """
+    for key in ("mongo", "scale", "concurrency", "duration", "mix", "config"):
+        if base["meta"].get(key) != head["meta"].get(key):
+            print(f"warning: {key} differs: {base['meta'].get(key)} vs {head['meta'].get(key)}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    warn_mismatch(base, head)
+    print(f"base {base['meta'].get('commit')}  head {head['meta'].get('commit')}")
+    # 啟動時間只列出，不計入退步 (mongomock 下的差異主要是雜訊)
+    for key in ("import_seconds", "startup_seconds"):
+        if key in base["meta"] and key in head["meta"]:
+            print(f"{key}: {base['meta'][key]} -> {head['meta'][key]}")
+    rows, regressions = compare(base, head, args.threshold)
+    header = ["scenario"] + [metric for metric, _ in METRICS]
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+skip/limit 與 keyset 分頁在不同頁數深度下的單頁延遲比較
+
+需要一個本機的 mongod (預設 mongodb://localhost:27017)。
+資料寫入獨立的 bench 資料庫，結束後會刪除。
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.deep_paging --documents 200000 --page-size 20
+"""
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "benchmark-only-secret-key")
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from api.mongodb import mongodb
+
+BENCH_DATABASE = "bench"
+BENCH_COLLECTION = "deep_paging"
+SORT_LIST = [("created_at", -1), ("_id", -1)]
+DEPTHS = [1, 10, 100, 500, 1000, 5000]
+
+def seed(total: int):
+    collection = mongodb.get_collection(BENCH_DATABASE, BENCH_COLLECTION)
+    collection.drop()
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(total):
+        batch.append({"title": f"question {i}", "created_at": start + timedelta(seconds=i)})
+        if len(batch) == 10000:
+            mongodb.add_datas(BENCH_DATABASE, BENCH_COLLECTION, batch)
+            batch = []
+    if batch:
+        mongodb.add_datas(BENCH_DATABASE, BENCH_COLLECTION, batch)
+    collection.create_index(SORT_LIST)
+
+def time_skip_page(depth: int, page_size: int) -> float:
+    start = time.perf_counter()
+    mongodb.get_data(
+        BENCH_DATABASE, BENCH_COLLECTION,
+        sort_list=SORT_LIST, skip=(depth - 1) * page_size, limit=page_size
+    )
+    return time.perf_counter() - start
+
+def keyset_cursors(depths, page_size: int) -> dict:
+    """
+    依序翻頁一次，記錄每個目標深度的前一頁 token
+    """
+    cursors = {1: None}
+    cursor = None
+    for page in range(1, max(depths)):
+        cursor = mongodb.get_page(
+            BENCH_DATABASE, BENCH_COLLECTION,
+            sort_list=SORT_LIST, limit=page_size, cursor=cursor
+        )["next_cursor"]
+        if page + 1 in depths:
+            cursors[page + 1] = cursor
+    return cursors
+
+def time_keyset_page(cursor, page_size: int) -> float:
+    start = time.perf_counter()
+    mongodb.get_page(
+        BENCH_DATABASE, BENCH_COLLECTION,
+        sort_list=SORT_LIST, limit=page_size, cursor=cursor
+    )
+    return time.perf_counter() - start
+
+def best_of(repeat: int, func, *args) -> float:
+    return min(func(*args) for _ in range(repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    depths = [depth for depth in DEPTHS if depth * args.page_size <= args.documents]
+    try:
+        seed(args.documents)
+        cursors = keyset_cursors(depths, args.page_size)
+
+        print(f"{'page':>6} {'skip/limit (ms)':>16} {'keyset (ms)':>12}")
+        for depth in depths:
+            skip_ms = best_of(args.repeat, time_skip_page, depth, args.page_size) * 1000
+            keyset_ms = best_of(args.repeat, time_keyset_page, cursors[depth], args.page_size) * 1000
+            print(f"{depth:>6} {skip_ms:>16.2f} {keyset_ms:>12.2f}")
+    finally:
+        mongodb.get_database(BENCH_DATABASE).drop_collection(BENCH_COLLECTION)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+評測吞吐量：每秒可評測的提交數
+
+不需要資料庫；以一題 A+B 題目、每次提交 --cases 筆測資進行評測。
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.judge_throughput --submissions 200 --cases 10
+以 root 執行時提交的程式以 JUDGE_SANDBOX_USER (預設 nobody) 執行，JUDGE_PYTHON 須可由該使用者執行；
+非 root 的開發環境需設定 JUDGE_ALLOW_UNSANDBOXED=true
+"""
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "benchmark-only-secret-key")
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.judge import Judge
+
+SOLUTION = """
+a, b = map(int, input().split())
+print(a + b)
+"""
+
+WRONG_SOLUTION = """
+a, b = map(int, input().split())
+print(a - b)
+"""
+
+def build_cases(count: int):
+    cases = []
+    for _ in range(count):
+        a, b = random.randint(1, 10 ** 9), random.randint(1, 10 ** 9)
+        cases.append({"input": f"{a} {b}\n", "output": f"{a + b}\n"})
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="judge pool size (default: CPU count)")
+    parser.add_argument("--wrong-ratio", type=float, default=0.2, help="fraction of wrong submissions (exercise short-circuit)")
+    args = parser.parse_args()
+
+    judge = Judge(workers=args.workers)
+    cases = build_cases(args.cases)
+    codes = [WRONG_SOLUTION if random.random() < args.wrong_ratio else SOLUTION for _ in range(args.submissions)]
+
+    start = time.perf_counter()
+    # 多個提交同時送入同一個 judge，與多個請求同時評測的情況相同
+    with ThreadPoolExecutor(max_workers=4) as submitters:
+        verdicts = list(submitters.map(lambda code: judge.judge(code, cases)["verdict"], codes))
+    elapsed = time.perf_counter() - start
+    judge.shutdown()
+
+    print(f"{args.submissions} submissions x {args.cases} cases in {elapsed:.2f}s")
+    print(f"{args.submissions / elapsed:.1f} submissions/s, {args.submissions * args.cases / elapsed:.1f} test cases/s")
+    print({verdict: verdicts.count(verdict) for verdict in set(verdicts)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+登入風暴期間非驗證路由的延遲 (p50/p99)
+
+同時送出大量 /login 請求，並在期間持續量測 GET / 的延遲；
+--inline 會改在 event loop 中直接執行 Argon2，用來與 process pool 版本比較。
+需要一個本機的 mongod (預設 mongodb://localhost:27017)。
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.login_storm --logins 500 --concurrency 100
+"""
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "benchmark-only-secret-key")
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+from argon2 import PasswordHasher
+
+from api.mongodb import mongodb
+from api.password import password_service
+from app import app
+from config import config
+from map import DATABASE, COLLECTION
+
+EMAIL = "storm@bench.codingweb.local"
+PASSWORD = "benchmark"
+
+def seed_user():
+    ph = PasswordHasher(
+        time_cost=config.ARGON2_TIME_COST,
+        memory_cost=config.ARGON2_MEMORY_COST,
+        parallelism=config.ARGON2_PARALLELISM
+    )
+    mongodb.delete_datas(DATABASE.ACCOUNT.value, COLLECTION.USER.value, {"email": EMAIL})
+    mongodb.add_data(DATABASE.ACCOUNT.value, COLLECTION.USER.value, {
+        "name": "storm",
+        "email": EMAIL,
+        "password": ph.hash(PASSWORD),
+        "role": "user",
+        "status": "active",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    })
+
+def use_inline_hashing():
+    """
+    以在 event loop 中同步執行的版本取代 process pool (舊行為)
+    """
+    ph = PasswordHasher(
+        time_cost=config.ARGON2_TIME_COST,
+        memory_cost=config.ARGON2_MEMORY_COST,
+        parallelism=config.ARGON2_PARALLELISM
+    )
+
+    async def verify(password_hash, password):
+        try:
+            ph.verify(password_hash, password)
+        except Exception:
+            return False, False
+        return True, ph.check_needs_rehash(password_hash)
+
+    password_service.verify = verify
+
+async def run(logins: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    rejected = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def login():
+            nonlocal rejected
+            async with semaphore:
+                response = await client.post("/login", json={"email": EMAIL, "password": PASSWORD})
+                if response.status_code == 429:
+                    rejected += 1
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/")
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return latencies, elapsed, rejected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop instead of the process pool")
+    args = parser.parse_args()
+
+    seed_user()
+    if args.inline:
+        use_inline_hashing()
+    try:
+        latencies, elapsed, rejected = asyncio.run(run(args.logins, args.concurrency))
+    finally:
+        password_service.shutdown()
+        mongodb.delete_datas(DATABASE.ACCOUNT.value, COLLECTION.USER.value, {"email": EMAIL})
+
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"mode: {'inline' if args.inline else 'process pool'}")
+    print(f"logins: {args.logins} in {elapsed:.2f}s ({args.logins / elapsed:.1f}/s), rejected with 429: {rejected}")
+    print(f"GET / during storm: n={len(latencies)} p50={cuts[49] * 1000:.2f}ms p99={cuts[98] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+/register 同步與非同步版本的吞吐量比較
+
+需要一個本機的 mongod (預設 mongodb://localhost:27017)，例如:
+    mongod --dbpath /tmp/bench-db --port 27017
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.register_load --requests 2000 --concurrency 200
+"""
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "benchmark-only-secret-key")
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+from argon2 import PasswordHasher
+from fastapi import FastAPI, HTTPException, status
+
+from api.mongodb import mongodb
+from config import config
+from map import DATABASE, COLLECTION, UserRole, UserStatus
+from models.users import UserCreate
+from routers import account
+
+EMAIL_DOMAIN = "bench.codingweb.local"
+
+ph = PasswordHasher(
+    time_cost=config.ARGON2_TIME_COST,
+    memory_cost=config.ARGON2_MEMORY_COST,
+    parallelism=config.ARGON2_PARALLELISM
+)
+
+def build_sync_app() -> FastAPI:
+    """
+    建立與舊版相同、以同步 pymongo 實作的 /register
+    """
+    app = FastAPI()
+
+    @app.post("/register", status_code=status.HTTP_201_CREATED)
+    def register(user: UserCreate):
+        existing_user = mongodb.get_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.USER.value,
+            {"email": user.email},
+            limit=1
+        )
+        if existing_user:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+
+        user_data = user.dict()
+        user_data["password"] = ph.hash(user.password)
+        current_time = datetime.utcnow()
+        user_data["created_at"] = current_time
+        user_data["updated_at"] = current_time
+        user_data["role"] = UserRole.USER.value
+        user_data["status"] = UserStatus.ACTIVE.value
+        user_id = mongodb.add_data(DATABASE.ACCOUNT.value, COLLECTION.USER.value, user_data)
+        return {"message": "User registered successfully", "user_id": user_id}
+
+    return app
+
+def build_async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(account.router)
+    return app
+
+async def run_load(app: FastAPI, total: int, concurrency: int) -> float:
+    """
+    以固定併發數送出 total 個註冊請求，回傳每秒請求數
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                payload = {
+                    "name": "bench",
+                    "email": f"{uuid.uuid4().hex}@{EMAIL_DOMAIN}",
+                    "password": "benchmark",
+                }
+                response = await client.post("/register", json=payload)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return total / elapsed
+
+def cleanup():
+    mongodb.delete_datas(
+        DATABASE.ACCOUNT.value,
+        COLLECTION.USER.value,
+        mongodb.build_query(email__ends_with=f"@{EMAIL_DOMAIN}")
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        for name, app in (("sync", build_sync_app()), ("async", build_async_app())):
+            rps = asyncio.run(run_load(app, args.requests, args.concurrency))
+            print(f"{name:>5}: {rps:8.1f} req/s ({args.requests} requests, concurrency {args.concurrency})")
+    finally:
+        cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+列表回應的序列化成本比較 (不需要資料庫)
+
+以與題目列表相同形狀的文件 (ObjectId、datetime、tags) 比較:
+    legacy    逐筆將 _id 轉為字串後經過 jsonable_encoder 與 json.dumps (原本的路徑)
+    orjson    BSONJSONResponse 直接編碼查詢結果 (目前的路徑)
+    pydantic  以 TypeAdapter(Page[QuestionSummary]) 驗證後 dump_json (宣告 response_model 並回傳 dict 的成本下限)
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.serialization --documents 10000
+"""
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "benchmark-only-secret-key")
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from api.responses import BSONJSONResponse
+from models.pages import Page
+from models.questions import QuestionSummary
+
+TAGS = ["array", "string", "math", "dp", "graph", "greedy", "sorting", "tree", "hash", "recursion"]
+
+def make_documents(total: int) -> list:
+    start = datetime(2024, 1, 1)
+    rng = random.Random(0)
+    return [{
+        "_id": ObjectId(),
+        "title": f"Question {i}",
+        "tags": rng.sample(TAGS, 3),
+        "author_id": str(ObjectId()),
+        "time_limit": 1.0,
+        "memory_limit": 256,
+        "created_at": start + timedelta(seconds=i),
+        "updated_at": start + timedelta(seconds=i),
+    } for i in range(total)]
+
+def legacy(documents: list) -> bytes:
+    # 原本的 get_data 會原地轉換 _id，因此先複製
+    items = [dict(doc) for doc in documents]
+    for doc in items:
+        doc["_id"] = str(doc["_id"])
+    content = jsonable_encoder({"items": items, "next_cursor": None})
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+def orjson_path(documents: list) -> bytes:
+    return BSONJSONResponse({"items": list(documents), "next_cursor": None}).body
+
+PAGE_ADAPTER = TypeAdapter(Page[QuestionSummary])
+
+def pydantic_path(documents: list) -> bytes:
+    items = [dict(doc, _id=str(doc["_id"])) for doc in documents]
+    page = PAGE_ADAPTER.validate_python({"items": items, "next_cursor": None})
+    return PAGE_ADAPTER.dump_json(page, by_alias=True)
+
+def best_of(repeat: int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    # 三種路徑的輸出內容必須相同
+    expected = json.loads(legacy(documents))
+    for func in (orjson_path, pydantic_path):
+        assert json.loads(func(documents)) == expected, func.__name__
+
+    baseline = None
+    print(f"{'path':<10}{'ms':>10}{'docs/s':>14}{'speedup':>10}")
+    for name, func in (("legacy", legacy), ("orjson", orjson_path), ("pydantic", pydantic_path)):
+        seconds = best_of(args.repeat, func, documents)
+        baseline = baseline or seconds
+        print(f"{name:<10}{seconds * 1000:>10.1f}{args.documents / seconds:>14.0f}{baseline / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
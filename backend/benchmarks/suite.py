@@ -0,0 +1,449 @@
+"""
+整個 app 的負載與延遲基準測試
+
+以 httpx 在同一個 process 中驅動 app:app，依比例混合註冊、登入、題目列表、題目內容、
+提交答案與評論等情境，以固定的並行數執行，輸出每個情境的吞吐量與 p50/p95/p99 延遲
+(JSON)，可用 benchmarks.compare 比較兩次 commit 的結果。
+
+MongoDB 可選擇:
+    mongomock  程序內的假資料庫 (預設，不需要任何服務，適合比較 app 本身的開銷)
+    spawn      啟動暫時的本機 mongod (需要 PATH 中有 mongod)，--replica-set 可測試 change stream
+    url        使用 MONGODB_URL 指定的伺服器 (會寫入 app 的資料庫，請使用專用的伺服器)
+
+執行 (於 backend/ 目錄下):
+    python -m benchmarks.suite --scale 1 --concurrency 32 --duration 30 --output base.json
+    python -m benchmarks.suite --mongo spawn --mix list_questions=60,question_detail=40
+"""
+import os
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "benchmark-only-secret-key")
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MIX = {
+    "list_questions": 35,
+    "question_detail": 30,
+    "list_answers": 10,
+    "submit_answer": 10,
+    "post_review": 8,
+    "login": 4,
+    "register": 3,
+}
+# 每 scale 的資料量
+SEED_VOLUMES = {"users": 1000, "questions": 500, "answers": 20000, "reviews": 5000, "reports": 200}
+TAGS = ["array", "string", "math", "dp", "graph", "greedy", "sorting", "tree", "hash", "recursion"]
+PASSWORD = "benchmark"
+SOLUTION = "a, b = map(int, input().split())\nprint(a + b)\n"
+
+def use_mongomock() -> None:
+    """
+    以 mongomock 取代 pymongo 與 motor 的 client，必須在匯入 api 模組之前呼叫
+    """
+    import mongomock
+    import mongomock.aggregate
+    import mongomock.collection
+    import mongomock_motor
+    import motor.motor_asyncio
+    import pymongo
+    import pymongo.errors
+
+    shared = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: shared
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=shared)
+
+    # 新版 pymongo 的 bulk 更新會傳入 mongomock 尚未支援的 sort 參數
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    mongomock.collection.BulkOperationBuilder.add_update = lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+    # mongomock 未實作的聚合階段 (如 $indexStats) 以 OperationFailure 回報，與伺服器不支援時的處理相同
+    process_pipeline = mongomock.aggregate.process_pipeline
+
+    def checked_pipeline(*args, **kwargs):
+        try:
+            return process_pipeline(*args, **kwargs)
+        except NotImplementedError as e:
+            raise pymongo.errors.OperationFailure(str(e))
+    mongomock.collection.aggregate.process_pipeline = checked_pipeline
+    # mongomock 不支援 hello 指令，無法判斷是否為 replica set
+    os.environ.setdefault("CHANGE_FEED_MODE", "polling")
+
+def spawn_mongod(replica_set: bool) -> subprocess.Popen:
+    """
+    在暫存目錄啟動 mongod 並設定 MONGODB_URL
+    """
+    binary = shutil.which("mongod")
+    if binary is None:
+        sys.exit("--mongo spawn requires mongod on PATH")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    dbpath = tempfile.mkdtemp(prefix="codingweb-bench-")
+    command = [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"]
+    if replica_set:
+        command += ["--replSet", "bench"]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+    import pymongo
+    client = pymongo.MongoClient(f"mongodb://127.0.0.1:{port}", directConnection=True, serverSelectionTimeoutMS=30000)
+    client.admin.command("ping")
+    if replica_set:
+        client.admin.command("replSetInitiate", {"_id": "bench", "members": [{"_id": 0, "host": f"127.0.0.1:{port}"}]})
+        deadline = time.monotonic() + 30
+        while not client.admin.command("hello").get("isWritablePrimary"):
+            if time.monotonic() > deadline:
+                sys.exit("mongod replica set did not elect a primary")
+            time.sleep(0.2)
+    client.close()
+    os.environ["MONGODB_URL"] = f"mongodb://127.0.0.1:{port}/?directConnection=true"
+    process.dbpath = dbpath
+    return process
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    nearest-rank 百分位數，values 需已排序
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput": round(len(values) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            sys.exit(f"unknown scenario {name!r}, choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+class Fixture:
+    def __init__(self, scale: float, seed: int):
+        """
+        寫入每個 DATABASE/COLLECTION 的測試資料，並保留情境需要的 ID 與 token
+        """
+        self.volumes = {name: max(1, int(count * scale)) for name, count in SEED_VOLUMES.items()}
+        self.rng = random.Random(seed)
+        self.user_ids: List[str] = []
+        self.question_ids: List[str] = []
+        self.answer_ids: List[str] = []
+        self.tokens: List[str] = []
+        self.emails: List[str] = []
+
+    def seed(self) -> Dict[str, int]:
+        from argon2 import PasswordHasher
+        from api.mongodb import mongodb
+        from config import config
+        from map import DATABASE, COLLECTION, Verdict
+
+        rng = self.rng
+        now = datetime.utcnow()
+        # 所有種子使用者共用同一個密碼雜湊，避免種子資料花費數分鐘計算 Argon2
+        password_hash = PasswordHasher(
+            time_cost=config.ARGON2_TIME_COST,
+            memory_cost=config.ARGON2_MEMORY_COST,
+            parallelism=config.ARGON2_PARALLELISM
+        ).hash(PASSWORD)
+
+        def insert(database, collection, documents):
+            ids = []
+            for start in range(0, len(documents), 5000):
+                ids += mongodb.add_datas(database.value, collection.value, documents[start:start + 5000])
+            return ids
+
+        self.emails = [f"user{i}@bench.example.com" for i in range(self.volumes["users"])]
+        self.user_ids = insert(DATABASE.ACCOUNT, COLLECTION.USER, [
+            {
+                "name": f"user{i}", "email": email, "password": password_hash,
+                "role": "admin" if i == 0 else "user", "status": "active",
+                "created_at": now - timedelta(days=365) + timedelta(minutes=i), "updated_at": now,
+            }
+            for i, email in enumerate(self.emails)
+        ])
+        self.question_ids = insert(DATABASE.QUESTION, COLLECTION.QUESTION, [
+            {
+                "title": f"Question {i}: {' '.join(rng.sample(TAGS, 2))} practice",
+                "description": " ".join(rng.choice(TAGS) for _ in range(60)),
+                "tags": rng.sample(TAGS, rng.randint(1, 3)),
+                "author_id": rng.choice(self.user_ids),
+                "test_cases": [{"input": f"{j} {j + 1}", "output": str(2 * j + 1)} for j in range(5)],
+                "time_limit": 2.0, "memory_limit": 256,
+                "created_at": now - timedelta(days=180) + timedelta(minutes=10 * i), "updated_at": now,
+            }
+            for i in range(self.volumes["questions"])
+        ])
+        verdicts = [verdict.value for verdict in Verdict if verdict != Verdict.PENDING]
+        answer_authors = [rng.choice(self.user_ids) for _ in range(self.volumes["answers"])]
+        self.answer_ids = insert(DATABASE.ANSWER, COLLECTION.ANSWER, [
+            {
+                "question_id": rng.choice(self.question_ids), "author_id": author_id,
+                "language": "python", "code": f"{SOLUTION}# {i}\n",
+                "verdict": rng.choice(verdicts), "created_at": now - timedelta(seconds=self.volumes["answers"] - i),
+                "updated_at": now,
+            }
+            for i, author_id in enumerate(answer_authors)
+        ])
+        # 每位使用者對同一份答案只評論一次且不評論自己的答案 (answer_reviewer_unique)，重複的組合略過
+        reviews: Dict[tuple, int] = {}
+        for i in range(self.volumes["reviews"]):
+            index = rng.randrange(len(self.answer_ids))
+            reviewer_id = rng.choice(self.user_ids)
+            if reviewer_id != answer_authors[index]:
+                reviews.setdefault((self.answer_ids[index], reviewer_id), i)
+        insert(DATABASE.REVIEW, COLLECTION.REVIEW, [
+            {
+                "answer_id": answer_id, "reviewer_id": reviewer_id,
+                "rating": rng.randint(1, 5), "comment": "benchmark review",
+                "created_at": now - timedelta(seconds=i), "updated_at": now,
+            }
+            for (answer_id, reviewer_id), i in reviews.items()
+        ])
+        # 同一目標與原因的待處理檢舉只有一份 (pending_target_reason_unique)
+        reasons = ["spam", "plagiarism", "abuse"]
+        insert(DATABASE.REPORT, COLLECTION.REPORT, [
+            {
+                "target_type": "answer", "target_id": self.answer_ids[(i // len(reasons)) % len(self.answer_ids)],
+                "reason": reasons[i % len(reasons)], "status": "pending",
+                "count": count, "weight": count, "reporters": rng.sample(self.user_ids, count),
+                "created_at": now - timedelta(seconds=i), "last_reported_at": now,
+            }
+            for i, count in ((i, rng.randint(1, 5)) for i in range(self.volumes["reports"]))
+        ])
+        return {**self.volumes, "reviews": len(reviews)}
+
+    def issue_tokens(self, count: int) -> None:
+        from api.auth import token_service
+        self.tokens = [token_service.issue(user_id, "user")[0] for user_id in self.user_ids[:count]]
+
+    def hot_question(self) -> str:
+        # 偏斜分布：少數熱門題目收到大部分的讀取
+        return self.question_ids[int(len(self.question_ids) * self.rng.random() ** 3)]
+
+class Scenarios:
+    def __init__(self, fixture: Fixture):
+        self.fixture = fixture
+        self.registered = 0
+
+    def auth(self, rng: random.Random) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {rng.choice(self.fixture.tokens)}"}
+
+    async def list_questions(self, client, rng, state):
+        params = {"limit": 20}
+        if rng.random() < 0.3:
+            params["tag"] = rng.choice(TAGS)
+        elif state.get("cursor") and rng.random() < 0.5:
+            params["cursor"] = state["cursor"]
+        response = await client.get("/question/questions", params=params)
+        if response.status_code == 200 and "tag" not in params:
+            state["cursor"] = response.json().get("next_cursor")
+        return response
+
+    async def question_detail(self, client, rng, state):
+        return await client.get(f"/question/{self.fixture.hot_question()}")
+
+    async def list_answers(self, client, rng, state):
+        return await client.get("/answer/answers", params={"question_id": self.fixture.hot_question(), "limit": 20})
+
+    async def submit_answer(self, client, rng, state):
+        # 一半為重複的提交 (可重用評測結果)，一半為新的程式碼
+        code = SOLUTION if rng.random() < 0.5 else f"{SOLUTION}# {rng.getrandbits(64)}\n"
+        return await client.post(
+            "/answer/create",
+            json={"question_id": self.fixture.hot_question(), "code": code},
+            headers=self.auth(rng)
+        )
+
+    async def post_review(self, client, rng, state):
+        return await client.post(
+            "/review/create",
+            json={"answer_id": rng.choice(self.fixture.answer_ids), "rating": rng.randint(1, 5), "comment": "benchmark"},
+            headers=self.auth(rng)
+        )
+
+    async def login(self, client, rng, state):
+        return await client.post("/login", json={"email": rng.choice(self.fixture.emails), "password": PASSWORD})
+
+    async def register(self, client, rng, state):
+        self.registered += 1
+        suffix = f"{os.getpid()}-{self.registered}-{rng.getrandbits(32)}"
+        return await client.post("/register", json={
+            "name": f"new {suffix}"[:50], "email": f"new-{suffix}@bench.example.com", "password": PASSWORD
+        })
+
+async def drive(app, scenarios: Scenarios, mix: Dict[str, int], concurrency: int, duration: float, warmup: float, seed: int):
+    import httpx
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        end = measure_from + duration
+
+        async def user(index: int):
+            rng = random.Random(seed * 1000 + index)
+            state: Dict[str, Any] = {}
+            while True:
+                name = rng.choices(names, weights)[0]
+                began = time.perf_counter()
+                if began >= end:
+                    return
+                try:
+                    response = await getattr(scenarios, name)(client, rng, state)
+                    status = response.status_code
+                except Exception:
+                    status = 599
+                finished = time.perf_counter()
+                if began >= measure_from:
+                    latencies[name].append(finished - began)
+                    statuses[name][str(status)] += 1
+                    if status >= 400:
+                        errors[name] += 1
+
+        await asyncio.gather(*[user(index) for index in range(concurrency)])
+
+    report = {name: summarize(latencies[name], errors[name], duration) for name in names}
+    for name in names:
+        report[name]["statuses"] = dict(statuses[name])
+    overall = summarize([value for name in names for value in latencies[name]], sum(errors.values()), duration)
+    return report, overall
+
+async def run(args, mix: Dict[str, int]) -> Dict[str, Any]:
+    # 匯入 app 不應建立 MongoDB client 或連線 (client 在 lifespan 中建立)
+    imported_at = time.perf_counter()
+    from app import app, startup_seconds as startup_phases
+    import_seconds = time.perf_counter() - imported_at
+    from config import config
+
+    fixture = Fixture(args.scale, args.seed)
+    seeded_at = time.perf_counter()
+    volumes = fixture.seed()
+    fixture.issue_tokens(min(200, len(fixture.user_ids)))
+    seed_seconds = time.perf_counter() - seeded_at
+
+    started_at = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup_seconds = time.perf_counter() - started_at
+        scenarios, overall = await drive(app, Scenarios(fixture), mix, args.concurrency, args.duration, args.warmup, args.seed)
+
+    return {
+        "meta": {
+            **git_revision(),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mongo": args.mongo,
+            "scale": args.scale,
+            "volumes": volumes,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "mix": mix,
+            "seed_seconds": round(seed_seconds, 3),
+            "import_seconds": round(import_seconds, 3),
+            "startup_seconds": round(startup_seconds, 3),
+            "startup_phases": dict(startup_phases),
+            "config": {
+                "CACHE_BACKEND": config.CACHE_BACKEND,
+                "RATE_LIMIT_BACKEND": config.RATE_LIMIT_BACKEND,
+                "COALESCE_REQUESTS": config.COALESCE_REQUESTS,
+                "CHANGE_FEED_MODE": config.CHANGE_FEED_MODE,
+            },
+        },
+        "overall": overall,
+        "scenarios": scenarios,
+    }
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'scenario':<16} {'count':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(report["scenarios"].items()) + [("overall", report["overall"])]
+    for name, row in rows:
+        print(
+            f"{name:<16} {row['count']:>7} {row['errors']:>5} {row['throughput']:>9.1f} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+        )
+    meta = report["meta"]
+    print(f"seed {meta['seed_seconds']}s, import {meta['import_seconds']}s, startup {meta['startup_seconds']}s")
+    print("startup phases: " + ", ".join(f"{phase} {seconds}s" for phase, seconds in meta["startup_phases"].items()))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", choices=["mongomock", "spawn", "url"], default="mongomock")
+    parser.add_argument("--replica-set", action="store_true", help="with --mongo spawn, start a single-node replica set")
+    parser.add_argument("--scale", type=float, default=1.0, help=f"data volume multiplier of {SEED_VOLUMES}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the measurement")
+    parser.add_argument("--mix", default=None, help="scenario weights, e.g. list_questions=60,question_detail=40")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    # 索引快照與評測快取不應沿用上一次執行的結果
+    scratch = tempfile.mkdtemp(prefix="codingweb-bench-")
+    os.environ.setdefault("SEARCH_SNAPSHOT_PATH", "")
+    os.environ.setdefault("JUDGE_ARTIFACT_DIR", os.path.join(scratch, "artifacts"))
+
+    mongod = None
+    if args.mongo == "mongomock":
+        use_mongomock()
+    elif args.mongo == "spawn":
+        mongod = spawn_mongod(args.replica_set)
+    try:
+        report = asyncio.run(run(args, mix))
+    finally:
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(mongod.dbpath, ignore_errors=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
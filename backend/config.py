@@ -1,5 +1,7 @@
 import sys
 import os
+import socket
+import tempfile
 
 class Singleton(type):
     _instances = {}
@@ -14,11 +16,117 @@ class Config(metaclass=Singleton):
         self.check_required_variables()
 
     def load_environment_variables(self):
-        self.MONGODB_URL = os.getenv("MONGODB_URL")
-        # self.PASETO_SECRET_KEY = os.getenv("PASETO_SECRET_KEY")
+        self.MONGODB_URL = self._secret("MONGODB_URL")
+        # 連線池: 非同步 client (API) 與同步 client (worker、管理指令、threadpool) 各自的上限
+        self.MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+        self.MONGODB_SYNC_MAX_POOL_SIZE = int(os.getenv("MONGODB_SYNC_MAX_POOL_SIZE", "10"))
+        self.MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "1"))
+        self.MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "30000"))
+        # 等待可用連線的上限 (毫秒)，0 代表不限制 (只受 serverSelectionTimeoutMS 限制)
+        self.MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "0"))
+        self.MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+        self.MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+        self.MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "5000"))
+        # 傳輸壓縮，例如 zstd,snappy,zlib (zstd 需安裝 pymongo[zstd]，snappy 需安裝 pymongo[snappy])
+        self.MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "")
+        # 讀取偏好 (primary / primaryPreferred / secondary / secondaryPreferred / nearest) 與 write concern (例如 majority、1)，
+        # 空字串代表使用連線字串或伺服器的預設值；可以 MONGODB_READ_PREFERENCE_<DATABASE> 與
+        # MONGODB_WRITE_CONCERN_<DATABASE> 針對個別資料庫設定，例如 MONGODB_READ_PREFERENCE_QUESTION=secondaryPreferred。
+        # 寫入後立即讀回的資料庫 (account、answer) 不建議讀取 secondary
+        self.MONGODB_READ_PREFERENCE = os.getenv("MONGODB_READ_PREFERENCE", "")
+        self.MONGODB_WRITE_CONCERN = os.getenv("MONGODB_WRITE_CONCERN", "")
+        self.MONGODB_DATABASE_READ_PREFERENCES = self._per_database("MONGODB_READ_PREFERENCE_")
+        self.MONGODB_DATABASE_WRITE_CONCERNS = self._per_database("MONGODB_WRITE_CONCERN_")
+        # 列表路由 (題目、答案、評論、檢舉列表) 的讀取偏好，空字串代表使用資料庫的設定
+        self.MONGODB_LISTING_READ_PREFERENCE = os.getenv("MONGODB_LISTING_READ_PREFERENCE", "")
+        # 讀取 secondary 時允許的最大延遲秒數 (至少 90)，-1 代表不限制
+        self.MONGODB_MAX_STALENESS_SECONDS = int(os.getenv("MONGODB_MAX_STALENESS_SECONDS", "-1"))
+        # /ready 回報未就緒的連線池使用率門檻
+        self.MONGODB_POOL_SATURATION_THRESHOLD = float(os.getenv("MONGODB_POOL_SATURATION_THRESHOLD", "0.9"))
+        # Argon2 參數 (預設值與 argon2-cffi 相同)
+        self.ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+        self.ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
+        self.ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+        # 密碼雜湊 process pool 大小與最多允許排隊的工作數
+        self.PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+        self.PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+        # 讀取快取: none / memory / redis
+        self.CACHE_BACKEND = os.getenv("CACHE_BACKEND", "none")
+        self.CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+        self.CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+        self.CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+        self.CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        # 列表附加的使用者顯示資訊 (api.loaders) 存入讀取快取的秒數，0 代表只在請求內記住
+        self.USER_LOADER_CACHE_TTL = float(os.getenv("USER_LOADER_CACHE_TTL", "10"))
+        # 速率限制 (token bucket，每個使用者或 IP): none / memory / redis，每秒補充數與容量
+        self.RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "none")
+        self.RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", self.CACHE_URL)
+        self.RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "20"))
+        self.RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "40"))
+        self.RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+        # 合併同時進行的相同 GET 請求 (題目列表與題目內容)
+        self.COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+        # 慢查詢門檻 (毫秒)，以及是否對慢查詢執行 explain() 以偵測 COLLSCAN
+        self.SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+        self.SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+        # 背景工作佇列: 租約 (visibility timeout) 秒數、最多嘗試次數、重試基準延遲與輪詢間隔
+        self.JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+        self.JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))
+        self.JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+        # 評測結果重用 (相同題目測資、語言與正規化後的原始碼) 以及 bytecode 快取目錄與大小上限
+        self.JUDGE_REUSE_VERDICTS = os.getenv("JUDGE_REUSE_VERDICTS", "true").lower() == "true"
+        self.JUDGE_ARTIFACT_DIR = os.getenv("JUDGE_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "codingweb-artifacts"))
+        self.JUDGE_ARTIFACT_MAX_BYTES = int(os.getenv("JUDGE_ARTIFACT_MAX_BYTES", str(256 * 1024 * 1024)))
+        # 評測子行程的隔離: 執行提交程式的使用者 (名稱或 uid，worker 以 root 執行時預設為 nobody，
+        # 並為子行程建立沒有網路的 network namespace)；或以外部 sandbox 指令前綴 (例如 nsjail ... --)
+        # 取代內建的隔離。兩者皆未設定時拒絕評測，除非 JUDGE_ALLOW_UNSANDBOXED=true (僅供開發)
+        self.JUDGE_SANDBOX_USER = os.getenv("JUDGE_SANDBOX_USER", "nobody" if os.geteuid() == 0 else "")
+        self.JUDGE_SANDBOX_COMMAND = os.getenv("JUDGE_SANDBOX_COMMAND", "")
+        self.JUDGE_ALLOW_UNSANDBOXED = os.getenv("JUDGE_ALLOW_UNSANDBOXED", "false").lower() == "true"
+        # 執行提交程式的直譯器，須可由 JUDGE_SANDBOX_USER 執行，且版本與 worker 相同 (直接執行 worker 編譯的 .pyc)
+        self.JUDGE_PYTHON = os.getenv("JUDGE_PYTHON", sys.executable)
+        # 排行榜從 user_stats 同步的間隔 (秒)
+        self.LEADERBOARD_REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", "5"))
+        # 活動紀錄 (瀏覽、提交、評論、登入): 是否啟用、寫入間隔 (秒)、緩衝達到多少筆時提前寫入、
+        # 緩衝上限 (寫入失敗時超過上限的最舊事件會被丟棄)、每份小時文件的事件上限與保存天數
+        self.ACTIVITY_LOG = os.getenv("ACTIVITY_LOG", "true").lower() == "true"
+        self.ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+        self.ACTIVITY_FLUSH_SIZE = int(os.getenv("ACTIVITY_FLUSH_SIZE", "1000"))
+        self.ACTIVITY_MAX_BUFFER = int(os.getenv("ACTIVITY_MAX_BUFFER", "100000"))
+        self.ACTIVITY_BUCKET_EVENTS = int(os.getenv("ACTIVITY_BUCKET_EVENTS", "1000"))
+        self.ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "400"))
+        # 題目搜尋索引快照路徑，空字串代表不使用快照
+        self.SEARCH_SNAPSHOT_PATH = os.getenv("SEARCH_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "codingweb-search.pickle"))
+        # 跨 process 的變更通知: auto (replica set 使用 change stream，standalone 改為輪詢 change_log) / change_stream / polling / off
+        self.CHANGE_FEED_MODE = os.getenv("CHANGE_FEED_MODE", "auto")
+        # 續傳位置以此名稱儲存，同一台機器上的 worker 共用
+        self.CHANGE_FEED_NAME = os.getenv("CHANGE_FEED_NAME", socket.gethostname())
+        self.CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "1"))
+        self.CHANGE_FEED_CHECKPOINT_INTERVAL = float(os.getenv("CHANGE_FEED_CHECKPOINT_INTERVAL", "5"))
+        # 輪詢模式下 change_log 紀錄保存的秒數
+        self.CHANGE_LOG_TTL = int(os.getenv("CHANGE_LOG_TTL", str(24 * 60 * 60)))
+        self.PASETO_SECRET_KEY = self._secret("PASETO_SECRET_KEY")
+        # token 有效秒數、已驗證 token 的 LRU 大小與撤銷紀錄同步間隔 (秒)
+        self.TOKEN_TTL = int(os.getenv("TOKEN_TTL", str(24 * 60 * 60)))
+        self.TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+        self.TOKEN_REVOCATION_SYNC_INTERVAL = float(os.getenv("TOKEN_REVOCATION_SYNC_INTERVAL", "5"))
+
+    def _secret(self, name: str):
+        # 可改以 <NAME>_FILE 指定存放秘密的檔案 (例如 Docker/Kubernetes secret)，
+        # 秘密就不會出現在環境變數與 /proc/<pid>/environ 中
+        path = os.getenv(f"{name}_FILE")
+        if path:
+            with open(path) as f:
+                return f.read().strip()
+        return os.getenv(name)
+
+    def _per_database(self, prefix: str) -> dict:
+        # 例如 MONGODB_READ_PREFERENCE_QUESTION=secondaryPreferred -> {"question": "secondaryPreferred"}
+        return {key[len(prefix):].lower(): value for key, value in os.environ.items() if key.startswith(prefix) and value}
 
     def check_required_variables(self):
-        required_variables = ["MONGODB_URL"] #, "PASETO_SECRET_KEY"]
+        required_variables = ["MONGODB_URL", "PASETO_SECRET_KEY"]
 
         missing_variables = [var for var in required_variables if not getattr(self, var)]
 
@@ -26,4 +134,15 @@ class Config(metaclass=Singleton):
             print(f"Error: Missing required environment variables: {', '.join(missing_variables)}")
             sys.exit(1)
 
-config = Config()
\ No newline at end of file
+class LazyConfig:
+    """
+    第一次讀取設定時才載入環境變數並檢查必要的設定，匯入模組 (測試、管理指令、
+    benchmarks) 時不需要完整的環境
+    """
+    def __getattr__(self, name):
+        return getattr(Config(), name)
+
+    def __setattr__(self, name, value):
+        setattr(Config(), name, value)
+
+config = LazyConfig()
\ No newline at end of file
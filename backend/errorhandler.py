@@ -22,4 +22,18 @@ class InvalidCredentials(HTTPException):
         
         logging.error(
             f"Authentication failed in {func_name}() at {filename}:{lineno} - {detail}"
+        )
+
+# 權限不足
+class PermissionDenied(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=403, detail=detail)
+
+# 服務忙碌 (例如密碼雜湊佇列已滿)
+class ServiceBusy(HTTPException):
+    def __init__(self, detail: str, retry_after: int = 1):
+        super().__init__(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
         )
\ No newline at end of file
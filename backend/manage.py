@@ -0,0 +1,228 @@
+"""
+管理指令
+
+執行 (於 backend/ 目錄下):
+    python manage.py rebuild-stats --check   # 只比對統計與答案/評論集合的差異
+    python manage.py rebuild-stats           # 重新計算並寫入統計
+    python manage.py rebuild-question-details  # 重新建立題目頁面的讀取模型
+"""
+import argparse
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from api.changefeed import install_change_log
+from api.mongodb import mongodb
+from api.question_detail import DETAIL_COLLECTION, DETAIL_DATABASE, question_details
+from api.stats import STATS_DATABASE, QUESTION_STATS, USER_STATS, FINAL_VERDICTS
+from map import DATABASE, COLLECTION, Verdict
+
+QUESTION_FIELDS = ("attempts", "accepted", "solvers", "verdicts", "review_count", "rating_sum")
+USER_FIELDS = ("attempts", "accepted", "solved_count", "solved", "reviews_received", "rating_received_sum", "reviews_given")
+
+def compute_stats() -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    從答案與評論集合重新計算統計
+
+    Returns:
+        (題目統計, 使用者統計)，以 ID 為鍵
+    """
+    questions: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+        "attempts": 0, "accepted": 0, "solvers": 0, "verdicts": {}, "review_count": 0, "rating_sum": 0
+    })
+    users: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+        "attempts": 0, "accepted": 0, "solved_count": 0, "solved": [], "last_solved_at": None,
+        "reviews_received": 0, "rating_received_sum": 0, "reviews_given": 0
+    })
+
+    # 以 (題目, 使用者, 結果) 分組，只傳回分組後的計數
+    for group in mongodb.iter_aggregate(DATABASE.ANSWER.value, COLLECTION.ANSWER.value, [
+        {"$match": {"verdict": {"$in": FINAL_VERDICTS}}},
+        {"$group": {
+            "_id": {"question_id": "$question_id", "author_id": "$author_id", "verdict": "$verdict"},
+            "count": {"$sum": 1},
+            "last": {"$max": "$updated_at"},
+        }},
+        {"$project": {
+            "_id": 0, "question_id": "$_id.question_id", "author_id": "$_id.author_id",
+            "verdict": "$_id.verdict", "count": 1, "last": 1,
+        }},
+    ], batch_size=1000):
+        question_id = group["question_id"]
+        user_id = group.get("author_id")
+        verdict = group["verdict"]
+        accepted = group["count"] if verdict == Verdict.ACCEPTED.value else 0
+
+        question = questions[question_id]
+        question["attempts"] += group["count"]
+        question["accepted"] += accepted
+        question["verdicts"][verdict] = question["verdicts"].get(verdict, 0) + group["count"]
+        if user_id is None:
+            continue
+        user = users[user_id]
+        user["attempts"] += group["count"]
+        user["accepted"] += accepted
+        if accepted:
+            user["solved"].append(question_id)
+            question["solvers"] += 1
+            if group["last"] and (user["last_solved_at"] is None or group["last"] > user["last_solved_at"]):
+                user["last_solved_at"] = group["last"]
+
+    reviews = list(mongodb.iter_aggregate(DATABASE.REVIEW.value, COLLECTION.REVIEW.value, [
+        {"$group": {"_id": "$answer_id", "count": {"$sum": 1}, "rating_sum": {"$sum": "$rating"}}},
+    ], batch_size=1000))
+    for start in range(0, len(reviews), 1000):
+        chunk = reviews[start:start + 1000]
+        answers = mongodb.get_data(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            {"_id": {"$in": mongodb._object_ids([group["_id"] for group in chunk])}},
+            projection={"question_id": 1, "author_id": 1}
+        )
+        answers = {answer["_id"]: answer for answer in answers}
+        for group in chunk:
+            answer = answers.get(str(group["_id"]))
+            if answer is None:
+                continue
+            question = questions[answer["question_id"]]
+            question["review_count"] += group["count"]
+            question["rating_sum"] += group["rating_sum"]
+            if answer.get("author_id"):
+                users[answer["author_id"]]["reviews_received"] += group["count"]
+                users[answer["author_id"]]["rating_received_sum"] += group["rating_sum"]
+
+    for group in mongodb.iter_aggregate(DATABASE.REVIEW.value, COLLECTION.REVIEW.value, [
+        {"$match": {"reviewer_id": {"$ne": None}}},
+        {"$group": {"_id": "$reviewer_id", "count": {"$sum": 1}}},
+    ], batch_size=1000):
+        users[group["_id"]]["reviews_given"] += group["count"]
+
+    for user in users.values():
+        user["solved"].sort()
+        user["solved_count"] = len(user["solved"])
+    return dict(questions), dict(users)
+
+def _comparable(document: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    values = {}
+    for field in fields:
+        value = document.get(field)
+        if field == "verdicts":
+            value = {verdict: count for verdict, count in (value or {}).items() if count}
+        elif field == "solved":
+            value = sorted(value or [])
+        elif value is None:
+            value = 0
+        values[field] = value
+    return values
+
+def find_drift(collection_name: str, expected: Dict[str, Dict[str, Any]], fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """
+    比對已儲存的統計與重新計算的結果
+
+    Returns:
+        差異列表 [{"_id", "stored", "expected"}]
+    """
+    drift = []
+    seen = set()
+    for stored in mongodb.iter_data(STATS_DATABASE, collection_name, batch_size=1000):
+        seen.add(stored["_id"])
+        actual = _comparable(stored, fields)
+        wanted = _comparable(expected.get(stored["_id"], {}), fields)
+        if actual != wanted:
+            drift.append({"_id": stored["_id"], "stored": actual, "expected": wanted})
+    for _id, document in expected.items():
+        if _id not in seen:
+            drift.append({"_id": _id, "stored": None, "expected": _comparable(document, fields)})
+    return drift
+
+def write_stats(collection_name: str, expected: Dict[str, Dict[str, Any]], drift: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    只改寫有差異的統計文件，刪除已沒有對應資料的文件
+    """
+    now = datetime.utcnow()
+    operations = []
+    for entry in drift:
+        if entry["_id"] in expected:
+            operations.append({
+                "op": "upsert",
+                "filter": {"_id": entry["_id"]},
+                "update": {"$set": {**expected[entry["_id"]], "updated_at": now}},
+            })
+        else:
+            operations.append({"op": "delete", "filter": {"_id": entry["_id"]}})
+    return mongodb.bulk(STATS_DATABASE, collection_name, operations, ordered=False)
+
+def mark_counted() -> None:
+    """
+    將每份答案的 stats_verdict 設為目前的評測結果，與重新計算的統計一致
+    """
+    for verdict in FINAL_VERDICTS:
+        mongodb.update_datas(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            {"verdict": verdict, "stats_verdict": {"$ne": verdict}},
+            {"stats_verdict": verdict}
+        )
+    mongodb.update_datas(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"verdict": Verdict.PENDING.value, "stats_verdict": {"$exists": True}},
+        {"$unset": {"stats_verdict": ""}}
+    )
+
+def rebuild_stats(check: bool) -> int:
+    """
+    重新計算統計；評測 worker 執行中時重新計算期間的變更可能造成少量差異，可再執行一次 --check 確認
+    """
+    questions, users = compute_stats()
+    drifted = False
+    for collection_name, expected, fields in (
+        (QUESTION_STATS, questions, QUESTION_FIELDS),
+        (USER_STATS, users, USER_FIELDS),
+    ):
+        drift = find_drift(collection_name, expected, fields)
+        drifted = drifted or bool(drift)
+        print(f"{STATS_DATABASE}.{collection_name}: {len(expected)} expected, {len(drift)} drifted")
+        for entry in drift[:10]:
+            print(f"  {entry['_id']}: stored {entry['stored']} expected {entry['expected']}")
+        if drift and not check:
+            summary = write_stats(collection_name, expected, drift)
+            print(f"  rewrote {summary['upserted_count'] + summary['modified_count']}, removed {summary['deleted_count']}")
+    if not check:
+        mark_counted()
+    return 1 if check and drifted else 0
+
+def rebuild_question_details() -> int:
+    """
+    重新建立每個題目的讀取模型，並刪除已沒有對應題目的讀取模型
+    """
+    question_ids = set()
+    for question in mongodb.iter_data(DATABASE.QUESTION.value, COLLECTION.QUESTION.value, projection={"_id": 1}, batch_size=1000):
+        question_details.build(question["_id"])
+        question_ids.add(question["_id"])
+    orphans = [
+        detail["_id"]
+        for detail in mongodb.iter_data(DETAIL_DATABASE, DETAIL_COLLECTION, projection={"_id": 1}, batch_size=1000)
+        if detail["_id"] not in question_ids
+    ]
+    if orphans:
+        mongodb.delete_datas(DETAIL_DATABASE, DETAIL_COLLECTION, {"_id": {"$in": mongodb._object_ids(orphans)}})
+    print(f"{DETAIL_DATABASE}.{DETAIL_COLLECTION}: rebuilt {len(question_ids)}, removed {len(orphans)}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild-stats", help="recompute question and user statistics")
+    rebuild.add_argument("--check", action="store_true", help="only report drift, exit with status 1 if any")
+    commands.add_parser("rebuild-question-details", help="rebuild the question detail read model")
+    args = parser.parse_args()
+    install_change_log(mongodb)
+
+    if args.command == "rebuild-stats":
+        sys.exit(rebuild_stats(args.check))
+    if args.command == "rebuild-question-details":
+        sys.exit(rebuild_question_details())
+
+if __name__ == "__main__":
+    main()
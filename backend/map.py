@@ -17,10 +17,70 @@ class DATABASE(enum.Enum):
     ANSWER = "answer"
     REVIEW = "review"
     REPORT = "report"
+    STATS = "stats"
+    ACTIVITY = "activity"
+    SYSTEM = "system"
 
 class COLLECTION(enum.Enum):
     USER = "user"
     QUESTION = "question"
+    QUESTION_DETAIL = "question_detail"
     ANSWER = "answer"
     REVIEW = "review"
-    REPORT = "report"
\ No newline at end of file
+    REPORT = "report"
+    JOB = "job"
+    REVOKED_TOKEN = "revoked_token"
+    QUESTION_STATS = "question_stats"
+    USER_STATS = "user_stats"
+    ACTIVITY_BUCKET = "activity_bucket"
+    CHANGE_LOG = "change_log"
+    FEED_CHECKPOINT = "feed_checkpoint"
+
+class Verdict(enum.Enum):
+    PENDING = "pending"
+    ACCEPTED = "accepted"
+    WRONG_ANSWER = "wrong_answer"
+    TIME_LIMIT_EXCEEDED = "time_limit_exceeded"
+    MEMORY_LIMIT_EXCEEDED = "memory_limit_exceeded"
+    OUTPUT_LIMIT_EXCEEDED = "output_limit_exceeded"
+    RUNTIME_ERROR = "runtime_error"
+    COMPILE_ERROR = "compile_error"
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class ReportStatus(enum.Enum):
+    PENDING = "pending"
+    RESOLVED = "resolved"
+    DISMISSED = "dismissed"
+
+class ReportTarget(enum.Enum):
+    QUESTION = "question"
+    ANSWER = "answer"
+    REVIEW = "review"
+    USER = "user"
+
+class ReportReason(enum.Enum):
+    SPAM = "spam"
+    ABUSE = "abuse"
+    PLAGIARISM = "plagiarism"
+    INAPPROPRIATE = "inappropriate"
+    OTHER = "other"
+
+class ModerationAction(enum.Enum):
+    DISMISS = "dismiss"
+    RESOLVE = "resolve"
+    BAN = "ban"
+
+class ActivityEvent(enum.Enum):
+    VIEW = "view"
+    SUBMISSION = "submission"
+    REVIEW = "review"
+    LOGIN = "login"
+
+class ActivityEntity(enum.Enum):
+    USER = "user"
+    QUESTION = "question"
@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, Optional
+from map import Verdict
+from models.users import UserDisplay
+
+class AnswerBase(BaseModel):
+    question_id: str
+    language: str = Field(default="python")
+    code: str = Field(..., min_length=1, max_length=65536)
+    author_id: Optional[str] = None
+    verdict: Verdict = Field(default=Verdict.PENDING)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class AnswerCreate(BaseModel):
+    question_id: str
+    language: str = Field(default="python")
+    code: str = Field(..., min_length=1, max_length=65536)
+
+# 回應模型：欄位同時決定查詢的投影 (api.responses.projection_for)
+class AnswerSummary(BaseModel):
+    id: str = Field(..., alias="_id")
+    question_id: str
+    author_id: Optional[str] = None
+    author: Optional[UserDisplay] = None
+    language: str = "python"
+    verdict: Verdict = Verdict.PENDING
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class AnswerDetail(AnswerBase):
+    id: str = Field(..., alias="_id")
+    judge: Optional[Dict[str, Any]] = None
@@ -0,0 +1,77 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+from map import Verdict
+from models.users import UserDisplay
+
+class TestCase(BaseModel):
+    input: str = ""
+    output: str
+    # 範例測資會公開在題目頁面，其餘測資只有評測使用
+    sample: bool = False
+
+class SampleCase(BaseModel):
+    input: str = ""
+    output: str
+
+class QuestionBase(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    description: str = Field(..., min_length=1)
+    tags: List[str] = Field(default_factory=list)
+    test_cases: List[TestCase] = Field(default_factory=list)
+    time_limit: float = Field(default=2.0, gt=0, le=10)  # 秒 (CPU 時間)
+    memory_limit: int = Field(default=256, ge=32, le=1024)  # MB
+    author_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class QuestionCreate(QuestionBase):
+    pass
+
+class QuestionUpdate(BaseModel):
+    title: Optional[str] = Field(None, min_length=1, max_length=200)
+    description: Optional[str] = Field(None, min_length=1)
+    tags: Optional[List[str]] = None
+    test_cases: Optional[List[TestCase]] = None
+    time_limit: Optional[float] = Field(None, gt=0, le=10)
+    memory_limit: Optional[int] = Field(None, ge=32, le=1024)
+
+# 回應模型：欄位同時決定查詢的投影 (api.responses.projection_for)
+class QuestionSummary(BaseModel):
+    id: str = Field(..., alias="_id")
+    title: str
+    tags: List[str] = Field(default_factory=list)
+    author_id: Optional[str] = None
+    author: Optional[UserDisplay] = None
+    time_limit: float = 2.0
+    memory_limit: int = 256
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class AnswerBrief(BaseModel):
+    id: str = Field(..., alias="_id")
+    author_id: Optional[str] = None
+    author: Optional[UserDisplay] = None
+    language: str = "python"
+    verdict: Verdict = Verdict.PENDING
+    created_at: Optional[datetime] = None
+    review_count: int = 0
+    rating_average: float = 0.0
+
+# 題目頁面：由讀取模型 (api.question_detail) 一次讀取，不含評測用的測資
+class QuestionDetail(BaseModel):
+    id: str = Field(..., alias="_id")
+    title: str
+    description: str
+    tags: List[str] = Field(default_factory=list)
+    sample_cases: List[SampleCase] = Field(default_factory=list)
+    time_limit: float = 2.0
+    memory_limit: int = 256
+    author_id: Optional[str] = None
+    author: Optional[UserDisplay] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    answer_count: int = 0
+    answers: List[AnswerBrief] = Field(default_factory=list)
+    review_count: int = 0
+    rating_average: float = 0.0
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+from map import ModerationAction, ReportReason, ReportStatus, ReportTarget
+
+class ReportCreate(BaseModel):
+    target_type: ReportTarget
+    target_id: str
+    reason: ReportReason
+    comment: str = Field(default="", max_length=1024)
+
+# 同一目標與原因的待處理檢舉合併為一份
+class ReportSummary(BaseModel):
+    id: str = Field(..., alias="_id")
+    target_type: ReportTarget
+    target_id: str
+    reason: ReportReason
+    status: ReportStatus = ReportStatus.PENDING
+    count: int = 1
+    weight: float = 1
+    created_at: Optional[datetime] = None
+    last_reported_at: Optional[datetime] = None
+
+class ReportDecision(BaseModel):
+    report_id: str
+    action: ModerationAction
+
+class ReportModerate(BaseModel):
+    decisions: List[ReportDecision] = Field(..., min_length=1, max_length=500)
+    note: str = Field(default="", max_length=1024)
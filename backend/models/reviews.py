@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class ReviewBase(BaseModel):
+    answer_id: str
+    reviewer_id: Optional[str] = None
+    rating: int = Field(..., ge=1, le=5)
+    comment: str = Field(default="", max_length=4096)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class ReviewCreate(BaseModel):
+    answer_id: str
+    rating: int = Field(..., ge=1, le=5)
+    comment: str = Field(default="", max_length=4096)
@@ -1,34 +1,55 @@
-from pydantic import BaseModel, Field, EmailStr
-from datetime import datetime
-from typing import Optional
-from map import UserRole, UserStatus
-
-class UserBase(BaseModel):
-    name: str = Field(..., min_length=2, max_length=50)
-    email: EmailStr
-    password: Optional[str] = None
-    role: UserRole = Field(default=UserRole.USER)
-    status: UserStatus = Field(default=UserStatus.ACTIVE)
-    avatar: Optional[str] = None
-    phone: Optional[str] = None
-    created_at: Optional[datetime] = None
-    updated_at: Optional[datetime] = None
-
-class UserCreate(UserBase):
-    name: str = Field(..., min_length=2, max_length=50)
-    email: EmailStr
-    password: str = Field(..., min_length=6)
-
-class UserUpdate(UserBase):
-    pass
-
-class UserLogin(BaseModel):
-    email: EmailStr
-    password: str
-
-class LoginResponse(BaseModel):
-    token: str
-
-class PasswordChange(BaseModel):
-    old_password: str
-    new_password: str = Field(..., min_length=6)
\ No newline at end of file
+from pydantic import BaseModel, Field, EmailStr
+from datetime import datetime
+from typing import Optional
+from map import UserRole, UserStatus
+
+class UserBase(BaseModel):
+    name: str = Field(..., min_length=2, max_length=50)
+    email: EmailStr
+    password: Optional[str] = None
+    role: UserRole = Field(default=UserRole.USER)
+    status: UserStatus = Field(default=UserStatus.ACTIVE)
+    avatar: Optional[str] = None
+    phone: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# role 與 status 由伺服器設定，註冊時不接受
+class UserCreate(BaseModel):
+    name: str = Field(..., min_length=2, max_length=50)
+    email: EmailStr
+    password: str = Field(..., min_length=6)
+    avatar: Optional[str] = None
+    phone: Optional[str] = None
+
+class UserUpdate(UserBase):
+    pass
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class LoginResponse(BaseModel):
+    message: str
+    user_id: str
+    token: str
+    token_type: str = "bearer"
+    expires_at: datetime
+
+class PasswordChange(BaseModel):
+    old_password: str
+    new_password: str = Field(..., min_length=6)
+
+# 回應模型：欄位同時決定查詢的投影 (api.responses.projection_for)
+class UserPublic(BaseModel):
+    id: str = Field(..., alias="_id")
+    name: str
+    avatar: Optional[str] = None
+    role: UserRole = UserRole.USER
+    status: UserStatus = UserStatus.ACTIVE
+    created_at: Optional[datetime] = None
+
+# 列表與題目頁面附加的作者顯示資訊 (api.loaders)
+class UserDisplay(BaseModel):
+    name: Optional[str] = None
+    avatar: Optional[str] = None
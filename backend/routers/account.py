@@ -1,23 +1,30 @@
-from fastapi import APIRouter, HTTPException, status
-from models.users import UserCreate
-from api.mongodb import mongodb
-from map import DATABASE, COLLECTION
-from argon2 import PasswordHasher
+from fastapi import APIRouter, Depends, HTTPException, status
+from models.users import UserCreate, UserLogin, LoginResponse, UserPublic
+from api.activity import activity_log
+from api.async_mongodb import async_mongodb
+from api.responses import BSONJSONResponse, projection_for
+from map import DATABASE, COLLECTION, ActivityEvent, UserRole, UserStatus
+from api.password import password_service
+from api.auth import token_service, get_current_user, get_token
+from errorhandler import InvalidCredentials
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
-ph = PasswordHasher()
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate):
+async def register(user: UserCreate):
     """
     Register a new user
     """
-    # Check if email already exists
-    existing_user = mongodb.get_data(
+    # Check if email already exists (an index seek on email_unique), so
+    # duplicates are rejected before paying for the password hash
+    existing_user = await async_mongodb.get_data(
         DATABASE.ACCOUNT.value, 
         COLLECTION.USER.value, 
         {"email": user.email}, 
+        projection={"_id": 1},
         limit=1
     )
     
@@ -30,36 +37,109 @@ def register(user: UserCreate):
     # Prepare user data
     user_data = user.dict()
     
-    # Hash password
-    user_data["password"] = ph.hash(user.password)
+    # Hash password in the process pool (Argon2 is CPU-bound)
+    user_data["password"] = await password_service.hash(user.password)
     
     # Set timestamps
     current_time = datetime.utcnow()
     user_data["created_at"] = current_time
     user_data["updated_at"] = current_time
     
-    # Convert Enums to values for MongoDB storage
-    user_data["role"] = user.role.value
-    user_data["status"] = user.status.value
+    # Roles gate moderation and admin routes, so new accounts are always active users
+    user_data["role"] = UserRole.USER.value
+    user_data["status"] = UserStatus.ACTIVE.value
     
-    # Insert user into database
-    user_id = mongodb.add_data(
-        DATABASE.ACCOUNT.value, 
-        COLLECTION.USER.value, 
-        user_data
-    )
+    # Insert user into database, the unique email index rejects concurrent duplicates
+    try:
+        user_id = await async_mongodb.add_data(
+            DATABASE.ACCOUNT.value, 
+            COLLECTION.USER.value, 
+            user_data
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     return {
         "message": "User registered successfully", 
         "user_id": user_id
     }
 
-@router.post("/login")
-def login():
-    # TODO: Login the user
-    pass
+@router.post("/login", response_model=LoginResponse)
+async def login(credentials: UserLogin):
+    """
+    Login the user and issue an access token
+
+    Send the token as `Authorization: Bearer <token>` to protected routes.
+    """
+    users = await async_mongodb.get_data(
+        DATABASE.ACCOUNT.value,
+        COLLECTION.USER.value,
+        {"email": credentials.email},
+        projection={"password": 1, "status": 1, "role": 1},
+        limit=1
+    )
+    if not users:
+        # Spend the same Argon2 work as a real check so response time doesn't reveal registered emails
+        await password_service.verify_dummy(credentials.password)
+        raise InvalidCredentials("Invalid email or password")
+    user = users[0]
+
+    valid, needs_rehash = await password_service.verify(user["password"], credentials.password)
+    # A banned account gets the same response as a wrong password, so it doesn't confirm the password
+    if not valid or user.get("status") == UserStatus.BANNED.value:
+        raise InvalidCredentials("Invalid email or password")
+
+    # Upgrade the stored hash when the Argon2 parameters in Config changed
+    if needs_rehash:
+        await async_mongodb.update_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.USER.value,
+            {"_id": user["_id"]},
+            {"password": await password_service.hash(credentials.password), "updated_at": datetime.utcnow()}
+        )
+
+    token, expires_at = token_service.issue(user["_id"], user.get("role", UserRole.USER.value))
+    activity_log.record(ActivityEvent.LOGIN, user["_id"])
+    return {
+        "message": "Login successful",
+        "user_id": user["_id"],
+        "token": token,
+        "expires_at": expires_at
+    }
 
 @router.post("/logout")
-def logout():
-    # TODO: Logout the user
-    pass
\ No newline at end of file
+async def logout(token: str = Depends(get_token), current_user: dict = Depends(get_current_user)):
+    """
+    Logout the user by revoking the access token
+    """
+    await token_service.revoke(token, current_user)
+    return {"message": "Logout successful"}
+
+@router.get("/users/{user_id}", response_model=UserPublic)
+async def get_user(user_id: str):
+    """
+    Get the public profile of a user
+    """
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    users = await async_mongodb.get_data(
+        DATABASE.ACCOUNT.value,
+        COLLECTION.USER.value,
+        {"_id": user_id},
+        projection=projection_for(UserPublic),
+        limit=1,
+        cache=True,
+        convert_id=False
+    )
+    if not users:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return BSONJSONResponse(users[0])
\ No newline at end of file
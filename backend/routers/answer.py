@@ -1,16 +1,262 @@
-from fastapi import APIRouter
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Union
+from bson import ObjectId
+from datetime import datetime
+from api import jobqueue
+from api.activity import activity_log
+from api.async_mongodb import async_mongodb
+from api.auth import get_current_user, require_roles
+from api.listing import list_documents, MAX_PAGE_SIZE
+from api.loaders import UserLoader, user_loader
+from api.responses import BSONJSONResponse, projection_for
+from api.question_detail import question_details
+from api.stats import stats_service
+from api.streaming import sse_response
+from api.submission_cache import REUSE_PROJECTION, record_reuse, reusable_filter, reused_result, submission_hash
+from config import config
+from map import DATABASE, COLLECTION, ActivityEvent, UserRole, Verdict
+from models.answers import AnswerCreate, AnswerDetail, AnswerSummary
+from models.pages import Page
 
 router = APIRouter()
 
-@router.get("/answers")
-def get_answers():
-    # TODO: Get answers from the database
-    pass
+# Fields of an answer shown to users other than its author
+SUMMARY_FIELDS = tuple(projection_for(AnswerSummary))
 
-@router.post("/create")
-def create_answer():
-    # TODO: Create a new answer
-    pass
+# Seconds between keep-alive comments on idle event streams
+SSE_KEEP_ALIVE = 15
+
+@router.get("/answers", response_model=Page[AnswerSummary])
+async def get_answers(
+    question_id: Optional[str] = None,
+    author_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    users: UserLoader = Depends(user_loader)
+):
+    """
+    Get answers, newest first
+
+    Pages are keyset-based: pass the returned `next_cursor` as `cursor` to get
+    the next page. With `stream=true` the result is sent as NDJSON while the
+    cursor is read, and `limit` may be omitted to export every matching answer.
+    Items are summaries with the author's name and avatar but without the code;
+    the author can read it with `GET /answer/{answer_id}`.
+    """
+    conditions = {}
+    if question_id:
+        conditions["question_id"] = question_id
+    if author_id:
+        conditions["author_id"] = author_id
+
+    return await list_documents(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        sort_list=[("created_at", -1), ("_id", -1)],
+        limit=limit,
+        cursor=cursor,
+        stream=stream,
+        projection=projection_for(AnswerSummary),
+        users=users,
+        user_fields={"author_id": "author"},
+        **conditions
+    )
+
+@router.post("/create", status_code=status.HTTP_202_ACCEPTED)
+async def create_answer(
+    answer: AnswerCreate,
+    response: Response,
+    short_circuit: bool = True,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Submit an answer and queue it for judging
+
+    Judging is done by the background workers (`python worker.py`). Follow the
+    returned job with `GET /answer/jobs/{job_id}` or its `/events` stream.
+    A submission identical to an already judged one (same test suite, language
+    and source up to formatting and comments) gets the stored verdict at once
+    with status 201.
+    """
+    if not ObjectId.is_valid(answer.question_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    questions = await async_mongodb.get_data(
+        DATABASE.QUESTION.value,
+        COLLECTION.QUESTION.value,
+        {"_id": answer.question_id},
+        projection={"test_cases": 1, "time_limit": 1, "memory_limit": 1},
+        limit=1,
+        cache=True
+    )
+    if not questions:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+
+    answer_data = answer.dict()
+    answer_data["author_id"] = current_user["user_id"]
+    answer_data["verdict"] = Verdict.PENDING.value
+    # Parsing and hashing can take a few milliseconds for large sources
+    answer_data["submission_hash"] = await run_in_threadpool(
+        submission_hash, questions[0], answer.language, answer.code, short_circuit
+    )
+    current_time = datetime.utcnow()
+    answer_data["created_at"] = current_time
+    answer_data["updated_at"] = current_time
+
+    previous = []
+    if config.JUDGE_REUSE_VERDICTS:
+        previous = await async_mongodb.get_data(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            reusable_filter(answer_data["submission_hash"]),
+            projection=REUSE_PROJECTION,
+            limit=1
+        )
+        record_reuse("submit", bool(previous))
+    if previous:
+        result = reused_result(previous[0]["judge"])
+        answer_data["verdict"] = previous[0]["verdict"]
+        answer_data["judge"] = result
+        answer_data["reused_from"] = previous[0]["_id"]
+        answer_id = await async_mongodb.add_data(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            answer_data
+        )
+        await run_in_threadpool(stats_service.record_verdict, answer_id, result["verdict"])
+        await run_in_threadpool(question_details.record_answer, answer_id, answer_data)
+        activity_log.record(ActivityEvent.SUBMISSION, current_user["user_id"], answer.question_id, current_time)
+        response.status_code = status.HTTP_201_CREATED
+        return {
+            "message": "Answer judged",
+            "answer_id": answer_id,
+            "verdict": result["verdict"],
+            "passed": result["passed"],
+            "total": result["total"],
+            "time": result["time"]
+        }
+
+    answer_id = await async_mongodb.add_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        answer_data
+    )
+    await run_in_threadpool(question_details.record_answer, answer_id, answer_data)
+    activity_log.record(ActivityEvent.SUBMISSION, current_user["user_id"], answer.question_id, current_time)
+    job_id = await enqueue_judge(answer_id, jobqueue.PRIORITY_SUBMISSION, short_circuit)
+
+    return {"message": "Answer queued for judging", "answer_id": answer_id, "job_id": job_id}
+
+@router.post("/{answer_id}/rejudge", status_code=status.HTTP_202_ACCEPTED)
+async def rejudge_answer(
+    answer_id: str,
+    short_circuit: bool = True,
+    current_user: dict = Depends(require_roles(UserRole.ADMIN, UserRole.STAFF))
+):
+    """
+    Judge an existing answer again, e.g. after the question's test cases changed
+
+    Re-judges run after fresh submissions that are already queued. Requires an
+    admin or staff token.
+    """
+    if not ObjectId.is_valid(answer_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Answer not found")
+    updated = await async_mongodb.update_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"_id": answer_id},
+        {"verdict": Verdict.PENDING.value, "updated_at": datetime.utcnow()}
+    )
+    if not updated and not await async_mongodb.count_documents(
+        DATABASE.ANSWER.value, COLLECTION.ANSWER.value, {"_id": answer_id}
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Answer not found")
+    job_id = await enqueue_judge(answer_id, jobqueue.PRIORITY_REJUDGE, short_circuit, reuse=False)
+
+    return {"message": "Answer queued for rejudging", "answer_id": answer_id, "job_id": job_id}
+
+async def enqueue_judge(answer_id: str, priority: int, short_circuit: bool, reuse: bool = True) -> str:
+    payload = {"answer_id": answer_id, "short_circuit": short_circuit, "reuse": reuse}
+    job_id = await jobqueue.enqueue("judge", payload, priority)
+    await async_mongodb.update_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"_id": answer_id},
+        {"job_id": job_id}
+    )
+    return job_id
+
+async def get_job_or_404(job_id: str):
+    job = await jobqueue.get_job(job_id) if ObjectId.is_valid(job_id) else None
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the status of a judge job
+    """
+    return await get_job_or_404(job_id)
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """
+    Server-sent events for a judge job
+
+    A `status` event is sent whenever the job changes and the stream ends after
+    the job is done or failed.
+    """
+    job = await get_job_or_404(job_id)
+
+    async def events():
+        nonlocal job
+        last = None
+        idle = 0.0
+        while True:
+            current = (job["status"], job["attempts"], job["updated_at"])
+            if current != last:
+                last = current
+                idle = 0.0
+                yield "status", job
+            if job["status"] in jobqueue.TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+            if await request.is_disconnected():
+                return
+            idle += config.JOB_POLL_INTERVAL
+            if idle >= SSE_KEEP_ALIVE:
+                idle = 0.0
+                yield None, None
+            job = await jobqueue.get_job(job_id) or job
+
+    return sse_response(events())
+
+@router.get("/{answer_id}", response_model=Union[AnswerDetail, AnswerSummary])
+async def get_answer(answer_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Get an answer by id
+
+    The author and staff get the code and judge result; other users get the summary.
+    """
+    if not ObjectId.is_valid(answer_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Answer not found")
+    answers = await async_mongodb.get_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"_id": answer_id},
+        projection=projection_for(AnswerDetail),
+        limit=1,
+        convert_id=False
+    )
+    if not answers:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Answer not found")
+    answer = answers[0]
+    if answer.get("author_id") != current_user["user_id"] and current_user["role"] not in (UserRole.ADMIN.value, UserRole.STAFF.value):
+        answer = {field: answer[field] for field in SUMMARY_FIELDS if field in answer}
+    return BSONJSONResponse(answer)
 
 @router.put("/update")
 def update_answer():
@@ -20,4 +266,4 @@ def update_answer():
 @router.delete("/delete")
 def delete_answer():
     # TODO: Delete an answer
-    pass
\ No newline at end of file
+    pass
@@ -1,17 +1,190 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Optional
+from bson import ObjectId
+from datetime import datetime
+import json
+from api.activity import activity_log
+from api.async_mongodb import async_mongodb
+from api.auth import require_roles
+from api.listing import list_documents, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.loaders import UserLoader, user_loader
+from api.question_detail import DETAIL_COLLECTION, DETAIL_DATABASE, present, question_details
+from api.responses import BSONJSONResponse, projection_for
+from api.search import search_index
+from map import DATABASE, COLLECTION, ActivityEvent, UserRole
+from models.pages import Page
+from models.questions import QuestionCreate, QuestionDetail, QuestionSummary
 
 router = APIRouter()
 
-@router.get("/questions")
-def get_questions():
-    # TODO: Get questions from the database
-    pass
+@router.get("/questions", response_model=Page[QuestionSummary])
+async def get_questions(
+    tag: Optional[str] = None,
+    author_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    users: UserLoader = Depends(user_loader)
+):
+    """
+    Get questions, newest first
+
+    Pages are keyset-based: pass the returned `next_cursor` as `cursor` to get
+    the next page. With `stream=true` the result is sent as NDJSON while the
+    cursor is read, and `limit` may be omitted to export every matching question.
+    Items are summaries with the author's name and avatar; use
+    `GET /question/{question_id}` for the full question.
+    """
+    conditions = {}
+    if tag:
+        conditions["tags"] = tag
+    if author_id:
+        conditions["author_id"] = author_id
+
+    return await list_documents(
+        DATABASE.QUESTION.value,
+        COLLECTION.QUESTION.value,
+        sort_list=[("created_at", -1), ("_id", -1)],
+        limit=limit,
+        cursor=cursor,
+        stream=stream,
+        cache=True,
+        projection=projection_for(QuestionSummary),
+        users=users,
+        user_fields={"author_id": "author"},
+        **conditions
+    )
+
+@router.get("/search")
+def search_questions(
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Full-text search over title, tags and description, ranked by BM25
+
+    Served from the in-process index, so no query reaches MongoDB.
+    """
+    items, total = search_index.search(q, offset=(page - 1) * limit, limit=limit)
+    return {"items": items, "total": total, "page": page, "limit": limit}
+
+@router.get("/autocomplete")
+def autocomplete_questions(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=20)
+):
+    """
+    Suggest question titles while typing; the last word is matched as a prefix
+    """
+    return {"items": search_index.autocomplete(q, limit)}
+
+@router.get("/{question_id}", response_model=QuestionDetail)
+async def get_question(question_id: str):
+    """
+    Get a question page: the question, its author, the latest answers and review totals
+
+    Served from the question detail read model with a single read; the model is
+    built on first access and kept up to date by answer, judge and review writes.
+    """
+    if not ObjectId.is_valid(question_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    details = await async_mongodb.get_data(
+        DETAIL_DATABASE,
+        DETAIL_COLLECTION,
+        {"_id": question_id},
+        limit=1,
+        convert_id=False
+    )
+    detail = details[0] if details else await run_in_threadpool(question_details.build, question_id)
+    if detail is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    activity_log.record(ActivityEvent.VIEW, question_id=question_id)
+    return BSONJSONResponse(present(detail))
+
+def record_shared_view(scope) -> None:
+    """
+    Record the view of a request that received another request's response (see api.coalescing)
+    """
+    activity_log.record(ActivityEvent.VIEW, question_id=scope["path"].rstrip("/").rsplit("/", 1)[-1])
 
 @router.post("/create")
 def create_question():
     # TODO: Create a new question
     pass
 
+@router.post("/import")
+async def import_questions(
+    request: Request,
+    ordered: bool = False,
+    current_user: dict = Depends(require_roles(UserRole.ADMIN, UserRole.STAFF))
+):
+    """
+    Bulk import a question bank
+
+    The body is either a JSON array of questions or NDJSON (one question per
+    line), e.g. `curl --data-binary @questions.ndjson .../question/import`.
+    Invalid records are reported and skipped; valid ones are inserted with
+    bulk writes. Indexes in the response refer to positions in the file.
+    Requires an admin or staff token.
+    """
+    body = await request.body()
+
+    records = []
+    invalid = []
+    received = 0
+    if body.lstrip().startswith(b"["):
+        try:
+            records = list(enumerate(json.loads(body)))
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {str(e)}")
+        received = len(records)
+    else:
+        for index, line in enumerate(body.splitlines()):
+            if not line.strip():
+                continue
+            received += 1
+            try:
+                records.append((index, json.loads(line)))
+            except json.JSONDecodeError as e:
+                invalid.append({"index": index, "error": f"Invalid JSON: {str(e)}"})
+
+    operations = []
+    positions = []
+    current_time = datetime.utcnow()
+    for index, record in records:
+        try:
+            question = QuestionCreate(**record)
+        except (ValidationError, TypeError) as e:
+            invalid.append({"index": index, "error": str(e)})
+            continue
+        question_data = question.dict()
+        question_data["author_id"] = question_data["author_id"] or current_user["user_id"]
+        question_data["created_at"] = question_data["created_at"] or current_time
+        question_data["updated_at"] = current_time
+        operations.append({"op": "insert", "document": question_data})
+        positions.append(index)
+
+    summary = await async_mongodb.bulk(
+        DATABASE.QUESTION.value,
+        COLLECTION.QUESTION.value,
+        operations,
+        ordered=ordered
+    )
+
+    # Map operation indexes back to positions in the uploaded file
+    summary["inserted_ids"] = {positions[i]: _id for i, _id in summary["inserted_ids"].items()}
+    for error in summary["errors"]:
+        error["index"] = positions[error["index"]]
+
+    return {
+        "received": received,
+        "invalid": sorted(invalid, key=lambda error: error["index"]),
+        **summary
+    }
+
 @router.put("/update")
 def update_question():
     # TODO: Update a question
@@ -20,4 +193,4 @@ def update_question():
 @router.delete("/delete")
 def delete_question():
     # TODO: Delete a question
-    pass
\ No newline at end of file
+    pass
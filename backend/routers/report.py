@@ -1,16 +1,119 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from bson import ObjectId
+from api.auth import get_current_user, require_roles
+from api.listing import list_documents, MAX_PAGE_SIZE
+from api.loaders import UserLoader, user_loader
+from api.reports import report_triage
+from map import DATABASE, COLLECTION, ReportStatus, UserRole
+from models.pages import Page
+from models.reports import ReportCreate, ReportModerate, ReportSummary
 
 router = APIRouter()
 
 @router.get("/reports")
-def get_reports():
-    # TODO: Get reports from the database
-    pass
+async def get_reports(
+    status: Optional[str] = None,
+    target_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    total: bool = False,
+    users: UserLoader = Depends(user_loader),
+    current_user: dict = Depends(require_roles(UserRole.ADMIN, UserRole.STAFF))
+):
+    """
+    Get reports, newest first (staff only)
 
-@router.post("/create")
-def create_report():
-    # TODO: Create a new report
-    pass
+    Pages are keyset-based: pass the returned `next_cursor` as `cursor` to get
+    the next page. With `stream=true` the result is sent as NDJSON while the
+    cursor is read, and `limit` may be omitted to export every matching report.
+    With `total=true` the page also carries the number of matching reports,
+    counted in the same query. Resolved reports carry the moderator's name and
+    avatar as `resolver`.
+    """
+    conditions = {}
+    if status:
+        conditions["status"] = status
+    if target_id:
+        conditions["target_id"] = target_id
+
+    return await list_documents(
+        DATABASE.REPORT.value,
+        COLLECTION.REPORT.value,
+        sort_list=[("created_at", -1), ("_id", -1)],
+        limit=limit,
+        cursor=cursor,
+        stream=stream,
+        total=total,
+        users=users,
+        user_fields={"resolved_by": "resolver"},
+        **conditions
+    )
+
+@router.get("/queue", response_model=Page[ReportSummary])
+async def get_queue(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    total: bool = False,
+    current_user: dict = Depends(require_roles(UserRole.ADMIN, UserRole.STAFF))
+):
+    """
+    Pending reports for moderation, highest weight first, then oldest first
+
+    Duplicate reports of the same target and reason are collapsed into one item
+    whose `count` and `weight` grow with every report.
+    """
+    return await list_documents(
+        DATABASE.REPORT.value,
+        COLLECTION.REPORT.value,
+        sort_list=[("weight", -1), ("created_at", 1), ("_id", 1)],
+        limit=limit,
+        cursor=cursor,
+        total=total,
+        status=ReportStatus.PENDING.value
+    )
+
+@router.post("/create", status_code=status.HTTP_201_CREATED)
+async def create_report(report: ReportCreate, current_user: dict = Depends(get_current_user)):
+    """
+    Report a question, answer, review or user
+
+    Reporting the same target for the same reason again has no further effect.
+    """
+    target_type = report.target_type.value
+    if not ObjectId.is_valid(report.target_id) or not await report_triage.target_exists(target_type, report.target_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report target not found")
+
+    aggregate, duplicate = await report_triage.submit(
+        target_type,
+        report.target_id,
+        report.reason.value,
+        current_user,
+        report.comment
+    )
+    return {
+        "message": "Already reported" if duplicate else "Report received",
+        "report_id": aggregate["_id"],
+        "count": aggregate["count"],
+    }
+
+@router.post("/moderate")
+async def moderate_reports(
+    moderation: ReportModerate,
+    current_user: dict = Depends(require_roles(UserRole.ADMIN, UserRole.STAFF))
+):
+    """
+    Apply moderation decisions to pending reports in one batch
+
+    `resolve` and `ban` also close the other pending reports on the same target;
+    `ban` additionally bans the target's author (regular users only).
+    """
+    return await report_triage.moderate(
+        [(decision.report_id, decision.action.value) for decision in moderation.decisions],
+        current_user,
+        moderation.note
+    )
 
 @router.put("/update")
 def update_report():
@@ -20,4 +123,4 @@ def update_report():
 @router.delete("/delete")
 def delete_report():
     # TODO: Delete a report
-    pass
\ No newline at end of file
+    pass
@@ -1,16 +1,95 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from api.activity import activity_log
+from api.async_mongodb import async_mongodb
+from api.auth import get_current_user
+from api.listing import list_documents, MAX_PAGE_SIZE
+from api.loaders import UserLoader, user_loader
+from api.question_detail import question_details
+from api.stats import stats_service
+from map import DATABASE, COLLECTION, ActivityEvent
+from errorhandler import PermissionDenied
+from models.reviews import ReviewCreate
 
 router = APIRouter()
 
 @router.get("/reviews")
-def get_reviews():
-    # TODO: Get reviews from the database
-    pass
+async def get_reviews(
+    answer_id: Optional[str] = None,
+    reviewer_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    users: UserLoader = Depends(user_loader)
+):
+    """
+    Get reviews, newest first
 
-@router.post("/create")
-def create_review():
-    # TODO: Create a new review
-    pass
+    Pages are keyset-based: pass the returned `next_cursor` as `cursor` to get
+    the next page. With `stream=true` the result is sent as NDJSON while the
+    cursor is read, and `limit` may be omitted to export every matching review.
+    Each review carries the reviewer's name and avatar as `reviewer`.
+    """
+    conditions = {}
+    if answer_id:
+        conditions["answer_id"] = answer_id
+    if reviewer_id:
+        conditions["reviewer_id"] = reviewer_id
+
+    return await list_documents(
+        DATABASE.REVIEW.value,
+        COLLECTION.REVIEW.value,
+        sort_list=[("created_at", -1), ("_id", -1)],
+        limit=limit,
+        cursor=cursor,
+        stream=stream,
+        users=users,
+        user_fields={"reviewer_id": "reviewer"},
+        **conditions
+    )
+
+@router.post("/create", status_code=status.HTTP_201_CREATED)
+async def create_review(review: ReviewCreate, current_user: dict = Depends(get_current_user)):
+    """
+    Review an answer
+    """
+    if not ObjectId.is_valid(review.answer_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Answer not found")
+    answers = await async_mongodb.get_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"_id": review.answer_id},
+        projection={"question_id": 1, "author_id": 1},
+        limit=1
+    )
+    if not answers:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Answer not found")
+    if answers[0].get("author_id") == current_user["user_id"]:
+        raise PermissionDenied("Cannot review your own answer")
+
+    review_data = review.dict()
+    review_data["reviewer_id"] = current_user["user_id"]
+    current_time = datetime.utcnow()
+    review_data["created_at"] = current_time
+    review_data["updated_at"] = current_time
+    # The unique (answer_id, reviewer_id) index rejects a second review, so stats count each reviewer once
+    try:
+        review_id = await async_mongodb.add_data(
+            DATABASE.REVIEW.value,
+            COLLECTION.REVIEW.value,
+            review_data
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Answer already reviewed")
+    await run_in_threadpool(stats_service.record_review, review_data, answers[0])
+    await run_in_threadpool(question_details.record_review, review_data, answers[0])
+    activity_log.record(ActivityEvent.REVIEW, review_data["reviewer_id"], answers[0]["question_id"], current_time)
+
+    return {"message": "Review created", "review_id": review_id}
 
 @router.put("/update")
 def update_review():
@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from bson import ObjectId
+from api.activity import activity_log
+from api.async_mongodb import async_mongodb
+from api.auth import get_current_user
+from api.listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.stats import STATS_DATABASE, QUESTION_STATS, USER_STATS, acceptance_rate, leaderboard
+from errorhandler import PermissionDenied
+from map import DATABASE, COLLECTION, ActivityEntity, UserRole
+
+router = APIRouter()
+
+# 活動彙總最多回溯的期數
+MAX_ACTIVITY_DAYS = 366
+MAX_ACTIVITY_WEEKS = 104
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    page: int = Query(1, ge=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Users ranked by solved questions; users with the same count share a rank
+    """
+    items = leaderboard.page((page - 1) * limit, limit)
+    if items:
+        users = await async_mongodb.get_data(
+            DATABASE.ACCOUNT.value,
+            COLLECTION.USER.value,
+            {"_id": {"$in": [ObjectId(item["user_id"]) for item in items if ObjectId.is_valid(item["user_id"])]}},
+            projection={"name": 1, "avatar": 1},
+            cache=True
+        )
+        profiles = {user["_id"]: user for user in users}
+        for item in items:
+            profile = profiles.get(item["user_id"], {})
+            item["name"] = profile.get("name")
+            item["avatar"] = profile.get("avatar")
+    return {"items": items, "total": len(leaderboard), "page": page, "limit": limit}
+
+@router.get("/users/{user_id}")
+async def get_user_stats(user_id: str):
+    """
+    Solved questions, attempts, acceptance rate and rank of a user
+    """
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    stats = await async_mongodb.get_data(STATS_DATABASE, USER_STATS, {"_id": user_id}, limit=1)
+    stats = stats[0] if stats else {"_id": user_id}
+    return {
+        "user_id": user_id,
+        "solved_count": stats.get("solved_count", 0),
+        "solved": stats.get("solved", []),
+        "attempts": stats.get("attempts", 0),
+        "accepted": stats.get("accepted", 0),
+        "acceptance_rate": acceptance_rate(stats),
+        "reviews_given": stats.get("reviews_given", 0),
+        "reviews_received": stats.get("reviews_received", 0),
+        "rank": leaderboard.rank(user_id),
+    }
+
+@router.get("/questions/{question_id}")
+async def get_question_stats(question_id: str):
+    """
+    Attempts, accepts, solvers, verdict breakdown and rating of a question
+    """
+    if not ObjectId.is_valid(question_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    stats = await async_mongodb.get_data(STATS_DATABASE, QUESTION_STATS, {"_id": question_id}, limit=1)
+    stats = stats[0] if stats else {"_id": question_id}
+    review_count = stats.get("review_count", 0)
+    return {
+        "question_id": question_id,
+        "attempts": stats.get("attempts", 0),
+        "accepted": stats.get("accepted", 0),
+        "acceptance_rate": acceptance_rate(stats),
+        "solvers": stats.get("solvers", 0),
+        "verdicts": {verdict: count for verdict, count in stats.get("verdicts", {}).items() if count},
+        "review_count": review_count,
+        "average_rating": round(stats.get("rating_sum", 0) / review_count, 2) if review_count else None,
+    }
+
+def activity_span(period: str, span: int) -> int:
+    if span > (MAX_ACTIVITY_WEEKS if period == "week" else MAX_ACTIVITY_DAYS):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Too many {period}s requested")
+    return span
+
+@router.get("/users/{user_id}/activity")
+async def get_user_activity(
+    user_id: str,
+    period: str = Query("day", pattern="^(day|week)$"),
+    span: int = Query(30, ge=1),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Daily or weekly counts of a user's logins, question views, submissions and reviews
+
+    Covers the last `span` days or ISO weeks including the current one, oldest
+    first. Only the user and staff can read it.
+    """
+    if current_user["user_id"] != user_id and current_user["role"] not in (UserRole.ADMIN.value, UserRole.STAFF.value):
+        raise PermissionDenied("Insufficient permissions")
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return {"user_id": user_id, **await activity_log.rollup(ActivityEntity.USER, user_id, period, activity_span(period, span))}
+
+@router.get("/questions/{question_id}/activity")
+async def get_question_activity(
+    question_id: str,
+    period: str = Query("day", pattern="^(day|week)$"),
+    span: int = Query(30, ge=1)
+):
+    """
+    Daily or weekly counts of views, submissions and reviews of a question
+
+    Covers the last `span` days or ISO weeks including the current one, oldest first.
+    """
+    if not ObjectId.is_valid(question_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
+    return {"question_id": question_id, **await activity_log.rollup(ActivityEntity.QUESTION, question_id, period, activity_span(period, span))}
@@ -0,0 +1,42 @@
+"""
+測試以 mongomock 取代 MongoDB，不需要啟動資料庫
+
+執行方式 (於 backend 目錄):
+    pip install -r tests/requirements.txt
+    python -m pytest -q
+"""
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("PASETO_SECRET_KEY", "test-secret-key-of-32-characters")
+os.environ.update(
+    SEARCH_SNAPSHOT_PATH="",
+    CACHE_BACKEND="none",
+    RATE_LIMIT_BACKEND="none",
+    PASSWORD_HASH_WORKERS="1",
+    ARGON2_TIME_COST="1",
+    ARGON2_MEMORY_COST="1024",
+    ARGON2_PARALLELISM="1",
+    JUDGE_ARTIFACT_DIR=os.path.join(tempfile.gettempdir(), "codingweb-test-artifacts"),
+)
+
+# 必須在匯入 api 模組之前取代 client
+from benchmarks.suite import use_mongomock  # noqa: E402
+use_mongomock()
+
+import pytest  # noqa: E402
+from api.mongodb import mongodb  # noqa: E402
+
+def run(coroutine):
+    """
+    在新的事件迴圈中執行 coroutine
+    """
+    return asyncio.run(coroutine)
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    yield
+    for name in mongodb.client.list_database_names():
+        mongodb.client.drop_database(name)
@@ -0,0 +1,46 @@
+import httpx
+from app import app
+from api.mongodb import mongodb
+from map import DATABASE, COLLECTION, UserRole, UserStatus
+from tests.conftest import run
+
+async def _post(*requests):
+    responses = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path, body in requests:
+                responses.append(await client.post(path, json=body))
+    return responses
+
+def _user(email):
+    return mongodb.get_data(
+        DATABASE.ACCOUNT.value, COLLECTION.USER.value, {"email": email}, projection={"role": 1, "status": 1}
+    )[0]
+
+def test_register_ignores_client_role_and_status():
+    response, = run(_post(("/register", {
+        "name": "eve", "email": "eve@example.com", "password": "secret1",
+        "role": UserRole.ADMIN.value, "status": UserStatus.BANNED.value,
+    })))
+
+    assert response.status_code == 201
+    user = _user("eve@example.com")
+    assert user["role"] == UserRole.USER.value
+    assert user["status"] == UserStatus.ACTIVE.value
+
+def test_login_failures_share_one_message():
+    register, = run(_post(("/register", {"name": "bob", "email": "bob@example.com", "password": "secret1"})))
+    assert register.status_code == 201
+    mongodb.update_data(
+        DATABASE.ACCOUNT.value, COLLECTION.USER.value, {"email": "bob@example.com"}, {"status": UserStatus.BANNED.value}
+    )
+
+    unknown, wrong, banned = run(_post(
+        ("/login", {"email": "nobody@example.com", "password": "secret1"}),
+        ("/login", {"email": "bob@example.com", "password": "wrong-password"}),
+        ("/login", {"email": "bob@example.com", "password": "secret1"}),
+    ))
+
+    assert [response.status_code for response in (unknown, wrong, banned)] == [401, 401, 401]
+    assert unknown.json() == wrong.json() == banned.json() == {"detail": "Invalid email or password"}
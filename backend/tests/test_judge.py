@@ -0,0 +1,104 @@
+import os
+import pwd
+import stat
+import subprocess
+import sys
+import pytest
+from api.judge import OUTPUT_LIMIT_MARGIN, OUTPUT_PREVIEW, Judge
+from api.submission_cache import ArtifactCache
+from map import Verdict
+
+SANDBOX_USER = "nobody"
+
+def _unsandboxed():
+    return Judge(workers=2, python=sys.executable, sandbox_user="", sandbox_command="", allow_unsandboxed=True)
+
+def _sandbox_python():
+    """
+    sandbox 使用者可以執行且版本與目前直譯器相同 (可載入 .pyc) 的 python，沒有時為 None
+    """
+    python = os.path.realpath(os.environ.get("JUDGE_PYTHON") or sys.executable)
+    path = python
+    while path != "/":
+        if not os.stat(path).st_mode & stat.S_IXOTH:
+            return None
+        path = os.path.dirname(path)
+    version = subprocess.run([python, "-c", "import sys; print(sys.version_info[:2])"], capture_output=True, text=True)
+    return python if version.stdout.strip() == str(sys.version_info[:2]) else None
+
+def test_refuses_to_judge_without_a_sandbox():
+    judge = Judge(workers=1, python=sys.executable, sandbox_user="", sandbox_command="", allow_unsandboxed=False)
+
+    with pytest.raises(RuntimeError):
+        judge.judge("print(1)", [{"input": "", "output": "1"}])
+
+def test_accepts_correct_output():
+    result = _unsandboxed().judge("a, b = map(int, input().split())\nprint(a + b)\n", [
+        {"input": "1 2", "output": "3", "sample": True},
+        {"input": "5 5", "output": "10"},
+    ])
+
+    assert result["verdict"] == Verdict.ACCEPTED.value
+    assert (result["passed"], result["total"]) == (2, 2)
+
+def test_output_flood_is_cut_off():
+    result = _unsandboxed().judge("while True:\n    print('x' * 4096)\n", [{"input": "", "output": "1", "sample": True}])
+
+    case, = result["results"]
+    assert result["verdict"] == Verdict.OUTPUT_LIMIT_EXCEEDED.value
+    assert len(case["output"]) <= OUTPUT_PREVIEW
+    assert case["error"] == "Output limit exceeded"
+
+def test_output_within_the_margin_is_judged_normally():
+    result = _unsandboxed().judge(f"print('x' * {OUTPUT_LIMIT_MARGIN // 2})\n", [{"input": "", "output": "1"}])
+
+    assert result["verdict"] == Verdict.WRONG_ANSWER.value
+
+def test_hidden_case_output_is_not_returned():
+    code = "import sys\nline = input()\nprint(line[::-1])\nprint('debug', line, file=sys.stderr)\nraise SystemExit(1)\n"
+    result = _unsandboxed().judge(code, [
+        {"input": "sample", "output": "elpmas", "sample": True},
+        {"input": "hidden-secret", "output": "terces-neddih"},
+    ], short_circuit=False)
+
+    sample, hidden = result["results"]
+    assert sample["output"].strip() == "elpmas"
+    assert "debug sample" in sample["error"]
+    assert hidden["verdict"] == Verdict.RUNTIME_ERROR.value
+    assert hidden["output"] == ""
+    assert hidden["error"] == ""
+
+def test_time_limit():
+    result = _unsandboxed().judge("while True:\n    pass\n", [{"input": "", "output": ""}], time_limit=1)
+
+    assert result["verdict"] == Verdict.TIME_LIMIT_EXCEEDED.value
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="switching to the sandbox user requires root")
+def test_sandbox_isolates_the_submission(tmp_path):
+    python = _sandbox_python()
+    if python is None:
+        pytest.skip("no python the sandbox user can run (set JUDGE_PYTHON)")
+    artifacts = ArtifactCache(str(tmp_path / "artifacts"))
+    judge = Judge(workers=1, python=python, artifacts=artifacts, sandbox_user=SANDBOX_USER, sandbox_command="")
+    code = "\n".join([
+        "import os, socket",
+        "def attempt(action):",
+        "    try:",
+        "        action()",
+        "        return 'open'",
+        "    except OSError:",
+        "        return 'denied'",
+        "print(os.getuid())",
+        "print(attempt(lambda: open(f'/proc/{os.getppid()}/environ', 'rb').read()))",
+        f"print(attempt(lambda: os.listdir({str(tmp_path / 'artifacts')!r})))",
+        "print(attempt(lambda: socket.create_connection(('127.0.0.1', 27017), timeout=1)))",
+        "print(attempt(os.fork))",
+    ])
+    expected = "\n".join([str(pwd.getpwnam(SANDBOX_USER).pw_uid), "denied", "denied", "denied", "denied"])
+
+    result = judge.judge(code, [{"input": "", "output": expected, "sample": True}])
+
+    case, = result["results"]
+    assert case["output"].split() == expected.split()
+    assert result["verdict"] == Verdict.ACCEPTED.value
+    assert stat.S_IMODE(os.stat(tmp_path / "artifacts").st_mode) == 0o700
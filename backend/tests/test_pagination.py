@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+import pytest
+from api.async_mongodb import async_mongodb
+from api.mongodb import InvalidCursorError, mongodb
+from tests.conftest import run
+
+DATABASE_NAME = "test"
+COLLECTION_NAME = "items"
+NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+
+def _seed(count=25):
+    start = datetime(2024, 1, 1)
+    # 每三筆共用同一個 created_at，分頁必須以 _id 區分
+    mongodb.add_datas(DATABASE_NAME, COLLECTION_NAME, [
+        {"n": i, "group": i % 2, "created_at": start + timedelta(minutes=i // 3)} for i in range(count)
+    ])
+    return mongodb.get_data(DATABASE_NAME, COLLECTION_NAME, sort_list=NEWEST_FIRST)
+
+def _pages(limit, sort_list=NEWEST_FIRST, **conditions):
+    pages, cursor = [], None
+    while True:
+        page = mongodb.get_page(DATABASE_NAME, COLLECTION_NAME, sort_list=sort_list, limit=limit, cursor=cursor, **conditions)
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 25, 30])
+def test_pages_cover_every_document_once_in_order(limit):
+    expected = [document["_id"] for document in _seed()]
+
+    pages = _pages(limit)
+
+    assert [document["_id"] for page in pages for document in page] == expected
+    assert all(len(page) == limit for page in pages[:-1])
+
+def test_ascending_pages_with_filter():
+    documents = _seed()
+    expected = sorted((document for document in documents if document["group"] == 1), key=lambda d: (d["created_at"], d["_id"]))
+
+    pages = _pages(4, sort_list=[("created_at", 1)], group=1)
+
+    assert [document["_id"] for page in pages for document in page] == [document["_id"] for document in expected]
+
+def test_async_pages_match_sync_pages():
+    _seed()
+
+    async def collect():
+        ids, cursor = [], None
+        while True:
+            page = await async_mongodb.get_page(DATABASE_NAME, COLLECTION_NAME, sort_list=NEWEST_FIRST, limit=4, cursor=cursor)
+            ids += [document["_id"] for document in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+
+    assert run(collect()) == [document["_id"] for page in _pages(4) for document in page]
+
+def test_cursor_from_another_sort_order_is_rejected():
+    _seed()
+    cursor = mongodb.get_page(DATABASE_NAME, COLLECTION_NAME, sort_list=NEWEST_FIRST, limit=2)["next_cursor"]
+
+    with pytest.raises(InvalidCursorError):
+        mongodb.get_page(DATABASE_NAME, COLLECTION_NAME, sort_list=[("created_at", 1)], limit=2, cursor=cursor)
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", ""])
+def test_malformed_cursor_is_rejected(cursor):
+    _seed(3)
+
+    with pytest.raises(InvalidCursorError):
+        mongodb.decode_cursor(cursor, mongodb._normalize_sort(NEWEST_FIRST))
@@ -0,0 +1,88 @@
+from bson import ObjectId
+import pytest
+from api.indexes import INDEXES
+from api.mongodb import mongodb
+from api.reports import MAX_REPORT_COMMENTS, REASON_WEIGHTS, REPORT_COLLECTION, REPORT_DATABASE, STAFF_REPORT_WEIGHT, ReportTriage
+from map import DATABASE, COLLECTION, ReportReason, ReportStatus, ReportTarget, UserRole
+from tests.conftest import run
+
+TARGET_ID = str(ObjectId())
+ANSWER = ReportTarget.ANSWER.value
+SPAM = ReportReason.SPAM.value
+ABUSE = ReportReason.ABUSE.value
+
+@pytest.fixture(autouse=True)
+def pending_unique_index():
+    # 合併依賴 pending_target_reason_unique: 重複檢舉的 upsert 以 DuplicateKeyError 回報
+    collection = mongodb.get_collection(REPORT_DATABASE, REPORT_COLLECTION)
+    for model in INDEXES[(DATABASE.REPORT, COLLECTION.REPORT)]:
+        document = dict(model.document)
+        if document.get("unique"):
+            collection.create_index(list(document.pop("key").items()), **document)
+
+def _reporter(role=UserRole.USER.value):
+    return {"user_id": str(ObjectId()), "role": role}
+
+def _reports():
+    return mongodb.get_data(REPORT_DATABASE, REPORT_COLLECTION, sort_list=[("created_at", 1)])
+
+def test_reports_on_the_same_target_and_reason_merge():
+    triage = ReportTriage()
+    first, second = _reporter(), _reporter()
+
+    report, duplicate = run(triage.submit(ANSWER, TARGET_ID, SPAM, first))
+    merged, merged_duplicate = run(triage.submit(ANSWER, TARGET_ID, SPAM, second))
+
+    assert not duplicate and not merged_duplicate
+    assert merged["_id"] == report["_id"]
+    assert merged["count"] == 2
+    assert merged["weight"] == 2 * REASON_WEIGHTS[SPAM]
+    stored, = _reports()
+    assert sorted(stored["reporters"]) == sorted([first["user_id"], second["user_id"]])
+    assert stored["status"] == ReportStatus.PENDING.value
+
+def test_repeated_report_from_the_same_user_is_not_counted():
+    triage = ReportTriage()
+    reporter = _reporter()
+    run(triage.submit(ANSWER, TARGET_ID, SPAM, reporter))
+
+    report, duplicate = run(triage.submit(ANSWER, TARGET_ID, SPAM, reporter))
+
+    assert duplicate
+    assert report["count"] == 1
+    stored, = _reports()
+    assert stored["count"] == 1
+    assert stored["reporters"] == [reporter["user_id"]]
+
+def test_staff_reports_weigh_more():
+    triage = ReportTriage()
+
+    run(triage.submit(ANSWER, TARGET_ID, ABUSE, _reporter()))
+    report, _ = run(triage.submit(ANSWER, TARGET_ID, ABUSE, _reporter(UserRole.STAFF.value)))
+
+    assert report["weight"] == REASON_WEIGHTS[ABUSE] * (1 + STAFF_REPORT_WEIGHT)
+
+def test_different_reasons_and_closed_reports_are_kept_apart():
+    triage = ReportTriage()
+    spam, _ = run(triage.submit(ANSWER, TARGET_ID, SPAM, _reporter()))
+    abuse, _ = run(triage.submit(ANSWER, TARGET_ID, ABUSE, _reporter()))
+    assert spam["_id"] != abuse["_id"]
+
+    mongodb.update_data(REPORT_DATABASE, REPORT_COLLECTION, {"_id": spam["_id"]}, {"status": ReportStatus.RESOLVED.value})
+    reopened, duplicate = run(triage.submit(ANSWER, TARGET_ID, SPAM, _reporter()))
+
+    assert not duplicate
+    assert reopened["_id"] not in (spam["_id"], abuse["_id"])
+    assert reopened["count"] == 1
+    assert len(_reports()) == 3
+
+def test_comments_keep_only_the_latest():
+    triage = ReportTriage()
+    for index in range(MAX_REPORT_COMMENTS + 5):
+        run(triage.submit(ANSWER, TARGET_ID, SPAM, _reporter(), comment=f"comment {index}"))
+
+    stored, = _reports()
+    assert stored["count"] == MAX_REPORT_COMMENTS + 5
+    assert [comment["comment"] for comment in stored["comments"]] == [
+        f"comment {index}" for index in range(5, MAX_REPORT_COMMENTS + 5)
+    ]
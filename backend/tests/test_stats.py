@@ -0,0 +1,70 @@
+from bson import ObjectId
+from api.mongodb import mongodb
+from api.stats import StatsService, STATS_DATABASE, QUESTION_STATS, USER_STATS
+from map import DATABASE, COLLECTION, Verdict
+
+ACCEPTED = Verdict.ACCEPTED.value
+WRONG_ANSWER = Verdict.WRONG_ANSWER.value
+QUESTION_ID = str(ObjectId())
+USER_ID = str(ObjectId())
+
+def _answer():
+    return mongodb.add_data(DATABASE.ANSWER.value, COLLECTION.ANSWER.value, {
+        "question_id": QUESTION_ID, "author_id": USER_ID, "verdict": Verdict.PENDING.value,
+    })
+
+def _stats(collection_name, _id):
+    documents = mongodb.get_data(STATS_DATABASE, collection_name, {"_id": _id})
+    return documents[0] if documents else {}
+
+def test_record_verdict_counts_a_repeated_verdict_once():
+    stats = StatsService()
+    answer_id = _answer()
+
+    stats.record_verdict(answer_id, ACCEPTED)
+    stats.record_verdict(answer_id, ACCEPTED)
+
+    question = _stats(QUESTION_STATS, QUESTION_ID)
+    user = _stats(USER_STATS, USER_ID)
+    assert question["attempts"] == 1
+    assert question["accepted"] == 1
+    assert question["verdicts"] == {ACCEPTED: 1}
+    assert question["solvers"] == 1
+    assert user["attempts"] == 1
+    assert user["solved"] == [QUESTION_ID]
+    assert user["solved_count"] == 1
+
+def test_rejudge_moves_the_verdict_instead_of_adding_an_attempt():
+    stats = StatsService()
+    answer_id = _answer()
+    stats.record_verdict(answer_id, ACCEPTED)
+
+    stats.record_verdict(answer_id, WRONG_ANSWER)
+    stats.record_verdict(answer_id, WRONG_ANSWER)
+
+    question = _stats(QUESTION_STATS, QUESTION_ID)
+    user = _stats(USER_STATS, USER_ID)
+    assert question["attempts"] == 1
+    assert question["accepted"] == 0
+    assert question["verdicts"] == {ACCEPTED: 0, WRONG_ANSWER: 1}
+    assert question["solvers"] == 0
+    assert user["accepted"] == 0
+    assert user["solved"] == []
+    assert user["solved_count"] == 0
+
+def test_rejudge_keeps_a_question_solved_by_another_answer():
+    stats = StatsService()
+    first, second = _answer(), _answer()
+    stats.record_verdict(first, ACCEPTED)
+    stats.record_verdict(second, ACCEPTED)
+
+    stats.record_verdict(first, WRONG_ANSWER)
+
+    assert _stats(USER_STATS, USER_ID)["solved"] == [QUESTION_ID]
+    assert _stats(QUESTION_STATS, QUESTION_ID)["solvers"] == 1
+
+def test_pending_verdict_is_not_counted():
+    stats = StatsService()
+    stats.record_verdict(_answer(), Verdict.PENDING.value)
+
+    assert _stats(QUESTION_STATS, QUESTION_ID) == {}
@@ -0,0 +1,235 @@
+"""
+背景工作 worker
+
+從 MongoDB 工作佇列領取工作並執行，可在多台機器上同時執行多個 worker。
+執行 (於 backend/ 目錄下):
+    python worker.py --processes 4
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bson import ObjectId
+from datetime import datetime
+from typing import Any, Callable, Dict
+from api.changefeed import install_change_log
+from api.jobqueue import JobQueue
+from api.judge import judge
+from api.metrics import render_metrics
+from api.mongodb import mongodb
+from api.question_detail import question_details
+from api.stats import stats_service
+from api.submission_cache import REUSE_PROJECTION, record_reuse, reusable_filter, reused_result, submission_hash
+from config import config
+from map import DATABASE, COLLECTION
+
+logger = logging.getLogger("worker")
+
+def judge_answer(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    評測一份答案並將結果寫回答案文件
+
+    Args:
+        payload: {"answer_id": 答案 ID, "short_circuit": 是否在第一個失敗的測資後停止,
+                  "reuse": 是否可重用相同提交已儲存的結果 (重新評測時為 False)}
+
+    Returns:
+        評測結果摘要
+    """
+    answers = mongodb.get_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"_id": payload["answer_id"]},
+        projection={"question_id": 1, "language": 1, "code": 1},
+        limit=1
+    )
+    if not answers:
+        raise LookupError(f"Answer {payload['answer_id']} not found")
+    answer = answers[0]
+
+    questions = mongodb.get_data(
+        DATABASE.QUESTION.value,
+        COLLECTION.QUESTION.value,
+        {"_id": answer["question_id"]},
+        projection={"test_cases": 1, "time_limit": 1, "memory_limit": 1},
+        limit=1
+    )
+    if not questions:
+        raise LookupError(f"Question {answer['question_id']} not found")
+    question = questions[0]
+    language = answer.get("language", "python")
+    short_circuit = payload.get("short_circuit", True)
+
+    # 題目的測資可能在提交後變更 (重新評測)，因此以目前的題目重新計算雜湊
+    digest = submission_hash(question, language, answer["code"], short_circuit)
+    update = {"submission_hash": digest, "reused_from": None}
+    previous = []
+    if payload.get("reuse", True) and config.JUDGE_REUSE_VERDICTS:
+        # 同時送出的相同提交：排在後面的工作直接使用先完成者的結果
+        previous = mongodb.get_data(
+            DATABASE.ANSWER.value,
+            COLLECTION.ANSWER.value,
+            {**reusable_filter(digest), "_id": {"$ne": ObjectId(payload["answer_id"])}},
+            projection=REUSE_PROJECTION,
+            limit=1
+        )
+        record_reuse("worker", bool(previous))
+    if previous:
+        result = reused_result(previous[0]["judge"])
+        update["reused_from"] = previous[0]["_id"]
+    else:
+        result = judge.judge(
+            answer["code"],
+            question.get("test_cases", []),
+            language,
+            question.get("time_limit", 2.0),
+            question.get("memory_limit", 256),
+            short_circuit
+        )
+
+    update.update({"verdict": result["verdict"], "judge": result, "updated_at": datetime.utcnow()})
+    mongodb.update_data(
+        DATABASE.ANSWER.value,
+        COLLECTION.ANSWER.value,
+        {"_id": payload["answer_id"]},
+        update
+    )
+    stats_service.record_verdict(payload["answer_id"], result["verdict"])
+    question_details.record_verdict(payload["answer_id"], answer["question_id"], result["verdict"])
+    return {
+        "answer_id": payload["answer_id"],
+        "verdict": result["verdict"],
+        "passed": result["passed"],
+        "total": result["total"],
+        "time": result["time"],
+    }
+
+# 工作種類 -> 處理函式
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "judge": judge_answer,
+}
+
+class Worker:
+    def __init__(self, queue: JobQueue = None, handlers: Dict[str, Callable] = HANDLERS):
+        """
+        單一 process 的 worker 迴圈
+
+        Args:
+            queue: 工作佇列
+            handlers: 工作種類對應的處理函式
+        """
+        self.queue = queue or JobQueue()
+        self.handlers = handlers
+        self._stopping = threading.Event()
+
+    def stop(self, *args) -> None:
+        """
+        收到 SIGTERM/SIGINT 時在目前的工作完成後結束
+        """
+        self._stopping.set()
+
+    def run_once(self) -> bool:
+        """
+        領取並執行一個工作
+
+        Returns:
+            是否有執行工作
+        """
+        job = self.queue.claim(list(self.handlers))
+        if job is None:
+            return False
+
+        # 執行期間定期延長租約，避免長時間的工作被其他 worker 重複領取
+        finished = threading.Event()
+        def heartbeat():
+            while not finished.wait(self.queue.visibility_timeout / 3):
+                if not self.queue.extend(job):
+                    logger.warning(f"Lost lease on job {job['_id']}")
+                    return
+        threading.Thread(target=heartbeat, daemon=True).start()
+
+        try:
+            result = self.handlers[job["kind"]](job["payload"])
+        except Exception as e:
+            logger.error(f"Job {job['_id']} ({job['kind']}) failed: {traceback.format_exc()}")
+            self.queue.fail(job, f"{type(e).__name__}: {str(e)}")
+        else:
+            self.queue.complete(job, result)
+        finally:
+            finished.set()
+        return True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info(f"Worker {self.queue.worker_id} started")
+        while not self._stopping.is_set():
+            try:
+                if not self.run_once():
+                    self._stopping.wait(config.JOB_POLL_INTERVAL)
+            except Exception as e:
+                # 資料庫暫時無法連線等錯誤：稍後再試
+                logger.error(f"Worker loop error: {str(e)}")
+                self._stopping.wait(config.JOB_POLL_INTERVAL * 10)
+        judge.shutdown()
+        mongodb.close()
+        logger.info(f"Worker {self.queue.worker_id} stopped")
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def run_worker(metrics_port: int = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    if metrics_port:
+        # 評測結果重用與 bytecode 快取的命中率等指標 (Prometheus text format)
+        server = ThreadingHTTPServer(("0.0.0.0", metrics_port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    # 領取工作前先開啟連線 (client 在第一次使用時才建立)
+    mongodb.warm_up()
+    # standalone mongod 上記錄答案與統計的變更，讓 API process 輪詢
+    install_change_log(mongodb)
+    Worker().run()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes on this node")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on this port (the i-th process uses port + i)")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(args.metrics_port)
+        return
+
+    # spawn 讓每個 process 建立自己的 MongoClient 與評測 thread pool
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(args.metrics_port + index if args.metrics_port else None,),
+            name=f"worker-{index}"
+        )
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Ctrl+C 會送到整個 process group；SIGTERM 則轉送給子 process，由各自在目前的工作完成後結束
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: [process.terminate() for process in processes])
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
@@ -59,6 +59,50 @@ export const apiFetch = async (endpoint, options = {}) => {
   }
 };
 
+/**
+ * 訂閱後端的 Server-Sent Events 串流
+ * @param {string} endpoint - 事件串流路徑 (例如: '/answer/jobs/<job_id>/events')
+ * @param {Object} handlers - 事件名稱對應的處理函數，資料會先解析為 JSON (例如: { status: (job) => {} })
+ * @param {Function} onError - 連線錯誤時呼叫，可選
+ * @returns {Function} - 呼叫後關閉連線
+ */
+export const subscribe = (endpoint, handlers = {}, onError) => {
+  const cleanEndpoint = endpoint.startsWith('/') ? endpoint : `/${endpoint}`;
+  const source = new EventSource(`${BASE_URL}${cleanEndpoint}`);
+
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+
+  source.onerror = (error) => {
+    // 伺服器結束串流後 EventSource 會自動重新連線，由呼叫端決定是否關閉
+    if (onError) onError(error);
+  };
+
+  return () => source.close();
+};
+
+/**
+ * 等待評測工作完成，取代輪詢 GET /answer/jobs/<job_id>
+ * @param {string} jobId - POST /answer/create 回傳的 job_id
+ * @param {Function} onUpdate - 每次狀態改變時呼叫，可選
+ * @returns {Promise<Object>} - 完成 (done) 或失敗 (failed) 時的工作資料
+ */
+export const watchJob = (jobId, onUpdate) => new Promise((resolve, reject) => {
+  const close = subscribe(`/answer/jobs/${jobId}/events`, {
+    status: (job) => {
+      if (onUpdate) onUpdate(job);
+      if (job.status === 'done' || job.status === 'failed') {
+        close();
+        resolve(job);
+      }
+    },
+  }, (error) => {
+    close();
+    reject(error);
+  });
+});
+
 /**
  * RESTful API 通用方法
  */